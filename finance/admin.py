@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, Notification, Payment, ResidentStatus, Depense, OverdueNotificationLog, ChatbotFAQ, ChatbotConversation, ChatbotMessage
+from .models import Document, Notification, Payment, ResidentStatus, Depense, OverdueNotificationLog, ChatbotFAQ, ChatbotConversation, ChatbotMessage, ScheduledJob, QueuedEmail, ImageDerivative, LedgerEntry, LedgerCheckpoint, BankStatementImport, BankTransaction, PDFBatch, GeneratedPDF, StoredBlob
 
 
 @admin.register(Document)
@@ -42,7 +42,8 @@ class ResidentStatusAdmin(admin.ModelAdmin):
     list_display = ['resident', 'total_due', 'total_paid', 'balance', 'status_category', 'last_updated']
     list_filter = ['last_updated']
     search_fields = ['resident__username', 'resident__first_name', 'resident__last_name']
-    readonly_fields = ['last_updated']
+    # Totaux tenus par le grand livre
+    readonly_fields = ['total_due', 'total_paid', 'last_updated']
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('resident')
@@ -103,10 +104,10 @@ class OverdueNotificationLogAdmin(admin.ModelAdmin):
 
 @admin.register(ChatbotFAQ)
 class ChatbotFAQAdmin(admin.ModelAdmin):
-    list_display = ['question', 'category', 'usage_count', 'is_active', 'created_by', 'created_at']
+    list_display = ['question', 'category', 'usage_count', 'helpful_count', 'not_helpful_count', 'is_active', 'created_by', 'created_at']
     list_filter = ['category', 'is_active', 'created_at']
     search_fields = ['question', 'keywords', 'answer']
-    readonly_fields = ['usage_count', 'created_at', 'updated_at']
+    readonly_fields = ['usage_count', 'helpful_count', 'not_helpful_count', 'created_at', 'updated_at']
     ordering = ['-usage_count', '-created_at']
     
     fieldsets = (
@@ -117,7 +118,7 @@ class ChatbotFAQAdmin(admin.ModelAdmin):
             'fields': ('is_active', 'created_by')
         }),
         ('Statistiques', {
-            'fields': ('usage_count', 'created_at', 'updated_at'),
+            'fields': ('usage_count', 'helpful_count', 'not_helpful_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -151,4 +152,118 @@ class ChatbotMessageAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Contenu'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('conversation__user', 'faq_used')
\ No newline at end of file
+        return super().get_queryset(request).select_related('conversation__user', 'faq_used')
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'is_enabled', 'interval_seconds', 'misfire_policy', 'last_status', 'last_run_at', 'next_run_at', 'run_count', 'failure_count', 'last_duration_ms', 'max_duration_ms']
+    list_filter = ['is_enabled', 'last_status', 'misfire_policy']
+    search_fields = ['name']
+    readonly_fields = ['last_run_at', 'last_status', 'last_error', 'last_node', 'run_count', 'failure_count', 'last_duration_ms', 'max_duration_ms', 'total_duration_ms']
+    ordering = ['name']
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to_email', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to_email']
+    readonly_fields = ['created_at', 'sent_at', 'attempts', 'last_error']
+    ordering = ['-created_at']
+
+
+@admin.register(ImageDerivative)
+class ImageDerivativeAdmin(admin.ModelAdmin):
+    list_display = ['source', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['source']
+    readonly_fields = ['variants', 'created_at', 'processed_at', 'attempts', 'last_error']
+    ordering = ['-created_at']
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'entry_date', 'resident', 'kind', 'debit_account', 'credit_account', 'amount', 'balance_after', 'description']
+    list_filter = ['kind', 'debit_account', 'credit_account', 'entry_date']
+    search_fields = ['description', 'resident__username', 'resident__first_name', 'resident__last_name']
+    ordering = ['-pk']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('resident')
+
+    # Grand livre en ajout seul : consultation uniquement
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerCheckpoint)
+class LedgerCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['resident', 'as_of', 'total_debit', 'total_credit', 'balance', 'created_at']
+    list_filter = ['as_of']
+    search_fields = ['resident__username']
+    ordering = ['-as_of']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BankStatementImport)
+class BankStatementImportAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'file_format', 'status', 'row_count', 'matched_count', 'review_count', 'duplicate_count', 'match_rate', 'rows_per_second', 'started_at']
+    list_filter = ['file_format', 'status', 'started_at']
+    search_fields = ['file_name']
+    readonly_fields = ['started_at', 'finished_at', 'duration_ms']
+    ordering = ['-started_at']
+
+
+@admin.register(BankTransaction)
+class BankTransactionAdmin(admin.ModelAdmin):
+    list_display = ['booking_date', 'amount', 'reference', 'counterparty', 'status', 'match_method', 'document', 'payment']
+    list_filter = ['status', 'match_method', 'booking_date']
+    search_fields = ['reference', 'counterparty', 'description']
+    raw_id_fields = ['document', 'payment', 'statement_import']
+    readonly_fields = ['fingerprint', 'reviewed_by', 'reviewed_at']
+    ordering = ['-booking_date']
+
+
+@admin.register(PDFBatch)
+class PDFBatchAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'total_count', 'generated_count', 'failed_count', 'workers', 'duration_ms', 'documents_per_second', 'requested_by', 'started_at']
+    list_filter = ['kind', 'status', 'started_at']
+    readonly_fields = ['started_at', 'finished_at', 'duration_ms', 'error']
+    ordering = ['-started_at']
+
+
+@admin.register(GeneratedPDF)
+class GeneratedPDFAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'document', 'payment', 'size', 'render_ms', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['document__title', 'document__resident__username']
+    raw_id_fields = ['document', 'payment', 'batch']
+    readonly_fields = ['size', 'render_ms', 'created_at']
+    ordering = ['-created_at']
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['name', 'sha256']
+    readonly_fields = ['name', 'sha256', 'size', 'ref_count', 'created_at', 'updated_at']
+    ordering = ['-created_at']
+
+    # Compteurs tenus par l'application : consultation uniquement
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
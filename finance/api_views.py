@@ -1,10 +1,15 @@
+import json
+
 from django.http import JsonResponse
 from django.views import View
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-from django.db.models import Sum, Count
 from django.utils import timezone
-from .models import User, Document, Depense, Notification, Payment, ResidentReport
+from django.core.exceptions import ValidationError
+from .models import Payment, PaymentProofUpload
+from . import stats
+from .bulk_payments import submit_payments
+from .proof_uploads import ProofUploadError, append_chunk, can_upload, chunk_size, start_upload, upload_whole_file
 
 
 @method_decorator(login_required, name='dispatch')
@@ -16,70 +21,144 @@ class NavigationStatsAPI(View):
             return JsonResponse({'error': 'Accès non autorisé'}, status=403)
         
         try:
-            # Statistiques de base
-            total_residents = User.objects.filter(role='RESIDENT').count()
-            total_documents = Document.objects.filter(is_archived=False).count()
-            total_expenses = Depense.objects.count()
-            
-            # Documents en retard
-            from django.utils import timezone
-            today = timezone.now().date()
-            overdue_documents = Document.objects.filter(
-                is_paid=False,
-                is_archived=False
-            )
-            overdue_count = sum(1 for doc in overdue_documents if doc.is_overdue)
-            
-            # Notifications non lues
-            unread_notifications = Notification.objects.filter(
-                is_read=False,
-                is_active=True,
-                recipients=request.user
-            ).count()
-            
-            # Signalements de problèmes
-            issue_reports = ResidentReport.objects.filter(
-                status='NEW'
-            ).count()
-            
-            # Statistiques avancées
-            current_month = today.replace(day=1)
-            
-            # Documents ce mois
-            documents_this_month = Document.objects.filter(
-                created_at__gte=current_month,
-                is_archived=False
-            ).count()
-            
-            # Paiements ce mois
-            payments_this_month = Payment.objects.filter(
-                payment_date__gte=current_month
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Dépenses ce mois
-            expenses_this_month = Depense.objects.filter(
-                date_depense__gte=current_month
-            ).aggregate(total=Sum('montant'))['total'] or 0
-            
-            # Nouveaux résidents ce mois
-            recent_residents = User.objects.filter(
-                role='RESIDENT',
-                date_joined__gte=current_month
-            ).count()
-            
+            today = timezone.localdate()
+            residents = stats.resident_counts(today)
+            documents = stats.document_counts(today)
+            expenses = stats.expense_totals(today=today)
+
             return JsonResponse({
-                'total_residents': total_residents,
-                'total_documents': total_documents,
-                'total_expenses': total_expenses,
-                'overdue_count': overdue_count,
-                'unread_notifications': unread_notifications,
-                'issue_reports': issue_reports,
-                'documents_this_month': documents_this_month,
-                'payments_this_month': float(payments_this_month),
-                'expenses_this_month': float(expenses_this_month),
-                'recent_residents': recent_residents,
+                'total_residents': residents['total'],
+                'total_documents': documents['total'],
+                'total_expenses': expenses['count'],
+                'overdue_count': documents['overdue'],
+                'unread_notifications': stats.notification_counts(request.user)['unread'],
+                'issue_reports': stats.report_counts(today)['new'],
+                'documents_this_month': documents['this_month'],
+                'payments_this_month': float(stats.payment_totals(today)['this_month']),
+                'expenses_this_month': float(expenses['this_month']),
+                'recent_residents': residents['this_month'],
                 'timestamp': timezone.now().isoformat()
             })
             
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+
+@method_decorator(login_required, name='dispatch')
+class BulkPaymentAPI(View):
+    """API de saisie groupée des paiements (syndic)
+
+    Corps JSON : {"payments": [{"document_id", "amount", "payment_method",
+    "payment_date", "reference", "notes"}, ...]}. Le lot est refusé en entier
+    si une ligne est invalide.
+    """
+
+    def post(self, request):
+        if request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            return JsonResponse({'error': 'Accès non autorisé'}, status=403)
+
+        try:
+            data = json.loads(request.body)
+        except (ValueError, UnicodeDecodeError):
+            return JsonResponse({'error': 'JSON invalide'}, status=400)
+        rows = data.get('payments') if isinstance(data, dict) else None
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return JsonResponse({'error': 'Le champ "payments" doit être une liste d\'objets'}, status=400)
+
+        payments, errors = submit_payments(rows, request.user)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+
+        return JsonResponse({
+            'created': len(payments),
+            'total': float(sum(payment.amount for payment in payments)),
+            'payment_ids': [payment.pk for payment in payments],
+        }, status=201)
+
+
+@method_decorator(login_required, name='dispatch')
+class PaymentUploadAPI(View):
+    """Envoi du justificatif d'un paiement, par morceaux et reprenable
+
+    - POST payment_id + payment_proof : envoi en une requête ;
+    - POST payment_id, file_name, content_type, total_size : ouverture (ou
+      reprise) d'une session, renvoie upload_id et le décalage à reprendre ;
+    - POST upload_id, offset + chunk : morceau suivant ;
+    - GET ?upload_id= : état de la session.
+    """
+
+    def get(self, request):
+        upload = self.get_upload(request, request.GET.get('upload_id'))
+        if upload is None:
+            return JsonResponse({'success': False, 'error': 'Envoi introuvable'}, status=404)
+        return JsonResponse(self.describe(upload))
+
+    def post(self, request):
+        try:
+            if request.POST.get('upload_id'):
+                return self.receive_chunk(request)
+            payment = self.get_payment(request)
+            if payment is None:
+                return JsonResponse({'success': False, 'error': 'Paiement introuvable'}, status=404)
+            if 'payment_proof' in request.FILES:
+                upload = upload_whole_file(payment, request.user, request.FILES['payment_proof'])
+                return JsonResponse(self.describe(upload))
+            try:
+                total_size = int(request.POST.get('total_size', ''))
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'Taille du fichier manquante'}, status=400)
+            upload = start_upload(
+                payment, request.user, request.POST.get('file_name'),
+                request.POST.get('content_type'), total_size,
+            )
+            return JsonResponse(self.describe(upload))
+        except ProofUploadError as error:
+            return JsonResponse({'success': False, 'error': str(error), **error.extra}, status=error.status)
+
+    def receive_chunk(self, request):
+        upload = self.get_upload(request, request.POST.get('upload_id'))
+        if upload is None:
+            return JsonResponse({'success': False, 'error': 'Envoi introuvable'}, status=404)
+        chunk = request.FILES.get('chunk')
+        if chunk is None:
+            return JsonResponse({'success': False, 'error': 'Morceau manquant'}, status=400)
+        if chunk.size > chunk_size():
+            return JsonResponse({'success': False, 'error': 'Morceau trop volumineux'}, status=413)
+        try:
+            offset = int(request.POST.get('offset', ''))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Décalage manquant'}, status=400)
+        upload = append_chunk(upload, offset, chunk.chunks())
+        return JsonResponse(self.describe(upload))
+
+    def get_payment(self, request):
+        payment_id = request.POST.get('payment_id', '')
+        if not payment_id.isdigit():
+            return None
+        payment = Payment.objects.select_related('document').filter(pk=payment_id).first()
+        if payment is None or not can_upload(request.user, payment):
+            return None
+        return payment
+
+    def get_upload(self, request, upload_id):
+        try:
+            return (
+                PaymentProofUpload.objects.select_related('payment')
+                .filter(upload_id=upload_id, user=request.user)
+                .first()
+            )
+        except ValidationError:
+            return None
+
+    def describe(self, upload):
+        data = {
+            'success': True,
+            'upload_id': str(upload.upload_id),
+            'offset': upload.received_size,
+            'total_size': upload.total_size,
+            'chunk_size': chunk_size(),
+            'complete': upload.status == 'COMPLETE',
+        }
+        if upload.status == 'COMPLETE':
+            data['url'] = upload.payment.payment_proof.url
+        return data
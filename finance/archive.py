@@ -0,0 +1,112 @@
+"""Archivage des documents soldés anciens.
+
+Les documents payés depuis plus de ``DOCUMENT_ARCHIVE_AFTER_DAYS`` jours
+(hors documents dont un paiement attend encore la vérification) sont
+marqués archivés par lots bornés, un ``UPDATE`` par lot. Les listes et
+tableaux de bord ne lisent que les documents actifs, servis par des index
+partiels (``condition=Q(is_archived=False)``) qui ne grossissent plus avec
+l'historique. Les lignes restent dans la table : paiements, grand livre et
+relevés continuent de les désigner.
+
+Le fichier d'un document archivé est copié sous le préfixe froid
+``ARCHIVE_STORAGE_PREFIX`` dès qu'aucun objet actif ne le désigne plus
+(un même fichier peut être partagé par plusieurs documents) ; l'original est
+laissé au ramassage des fichiers sans référence.
+"""
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import stats
+from .blobs import FILE_FIELDS, change_refs
+from .models import Document, Payment
+from .storage import archive_prefix, blob_storage, is_blob
+
+CHUNK_SIZE = 500
+
+
+def archive_after_days():
+    return getattr(settings, 'DOCUMENT_ARCHIVE_AFTER_DAYS', 730)
+
+
+def archivable_documents(today=None):
+    """Documents soldés, plus anciens que le délai, sans paiement en attente de vérification"""
+    today = today or timezone.localdate()
+    pending = Payment.objects.filter(document=OuterRef('pk'), is_verified=False, is_rejected=False)
+    return (
+        Document.objects.filter(
+            is_archived=False, is_paid=True, date__lt=today - timedelta(days=archive_after_days())
+        )
+        .exclude(Exists(pending))
+    )
+
+
+def cold_name(name):
+    return f"{archive_prefix()}/{name}"
+
+
+def relocate_files(names):
+    """Copier vers le préfixe froid les fichiers que seuls des documents archivés désignent
+
+    Le fichier d'origine n'est pas déplacé : un envoi du même contenu peut le
+    réutiliser à tout moment (stockage adressé par contenu). Son compteur
+    passe à zéro et ``collect_garbage`` le supprime après le délai de grâce,
+    sauf s'il a été réutilisé entre-temps.
+    """
+    storage = blob_storage()
+    moved = 0
+    for name in names:
+        if not name or name.startswith(archive_prefix() + '/'):
+            continue
+        still_active = Document.objects.filter(file=name, is_archived=False).exists() or any(
+            model.objects.filter(**{field: name}).exists()
+            for model, field in FILE_FIELDS.items() if model is not Document
+        )
+        if still_active or not storage.exists(name):
+            continue
+        target = cold_name(name)
+        # Copie avant la mise à jour des lignes : un document archivé ne désigne jamais un fichier absent
+        os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+        shutil.copyfile(storage.path(name), storage.path(target))
+        with transaction.atomic():
+            count = Document.objects.filter(file=name, is_archived=True).update(file=target)
+            change_refs({target: count, name: -count})
+            if not is_blob(name):
+                # Ancien fichier sous son nom d'origine : jamais réutilisé, il peut partir tout de suite
+                transaction.on_commit(lambda source=name: storage.delete(source))
+        moved += 1
+    return moved
+
+
+def archive_documents(chunk_size=CHUNK_SIZE, max_chunks=None, dry_run=False, today=None):
+    """Archiver par lots. Retourne ``(documents archivés, fichiers déplacés)``."""
+    archived = moved = chunks = 0
+    last_pk = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(
+            archivable_documents(today).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        chunks += 1
+        last_pk = ids[-1]
+        if dry_run:
+            archived += len(ids)
+            continue
+        with transaction.atomic():
+            # Le filtre est rejoué : un paiement a pu arriver entre la lecture et l'écriture
+            archived += archivable_documents(today).filter(pk__in=ids).update(
+                is_archived=True, archived_at=timezone.now()
+            )
+        stats.invalidate('documents')
+        names = set(
+            Document.objects.filter(pk__in=ids, is_archived=True).exclude(file='').values_list('file', flat=True)
+        )
+        moved += relocate_files(names)
+    return archived, moved
+
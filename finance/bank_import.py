@@ -0,0 +1,625 @@
+"""Import des relevés bancaires et rapprochement automatique des paiements.
+
+Les lecteurs (CSV, OFX, CAMT.053, MT940) lisent le fichier en flux et
+produisent des ``StatementLine`` une par une : un relevé de plusieurs comptes
+sur douze mois n'est jamais chargé entièrement en mémoire.
+
+Le rapprochement s'appuie sur un index en mémoire construit une seule fois
+(paiements non vérifiés par référence et par montant, documents ouverts par
+numéro et par montant / résident). Les lignes sont traitées par lots :
+dédoublonnage en une requête, puis écriture des paiements, des vérifications
+et des lignes de relevé en ``bulk_create`` / ``bulk_update``. Les lignes non
+rapprochées restent dans la file de revue (statut ``REVIEW``).
+"""
+import csv
+import hashlib
+import io
+import re
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+from .bulk import bulk_insert
+from .ledger import record_payments
+from .models import BankStatementImport, BankTransaction, Document, Payment
+from .verification import pending_payments
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+DATE_WINDOW_DAYS = 5
+
+StatementLine = namedtuple(
+    'StatementLine', 'account booking_date amount currency reference counterparty description'
+)
+
+
+class StatementFormatError(ValueError):
+    """Fichier de relevé illisible ou format non reconnu"""
+
+
+# ==================== OUTILS ====================
+
+def fold(value):
+    """Majuscules sans accents"""
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(char for char in value if not unicodedata.combining(char)).upper()
+
+
+def normalize_reference(value):
+    return re.sub(r'[^A-Z0-9]', '', fold(value))
+
+
+def parse_amount(value):
+    """Montant au format français ou anglais ('1 234,56', '1,234.56', '-12.00')"""
+    value = (value or '').strip().replace('\xa0', '').replace(' ', '').replace("'", '')
+    if not value:
+        return None
+    if ',' in value and '.' in value:
+        if value.rfind(',') > value.rfind('.'):
+            value = value.replace('.', '').replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    else:
+        value = value.replace(',', '.')
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%Y%m%d']
+
+
+def parse_date(value):
+    value = (value or '').strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def detect_format(file_name, head):
+    """Deviner le format à partir de l'extension puis du début du fichier"""
+    extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+    if extension in ('ofx', 'qfx'):
+        return 'OFX'
+    if extension in ('sta', 'mt940', '940'):
+        return 'MT940'
+    text = head.decode('utf-8', 'ignore')
+    if 'OFXHEADER' in text or '<OFX>' in text:
+        return 'OFX'
+    if 'camt.053' in text or '<BkToCstmrStmt>' in text:
+        return 'CAMT'
+    if ':20:' in text and (':25:' in text or ':60F:' in text):
+        return 'MT940'
+    if extension in ('xml',):
+        return 'CAMT'
+    return 'CSV'
+
+
+# ==================== LECTEURS ====================
+
+CSV_COLUMNS = {
+    'date': ['date', 'date operation', 'date comptable', 'booking date', 'date de valeur', 'date valeur'],
+    'amount': ['montant', 'amount', 'montant (mad)', 'montant (dh)'],
+    'credit': ['credit'],
+    'debit': ['debit'],
+    'reference': ['reference', 'ref', 'ref.', 'numero'],
+    'description': ['libelle', 'description', 'label', 'memo', 'motif'],
+    'counterparty': ['tiers', 'beneficiaire', 'emetteur', 'donneur d\'ordre', 'counterparty', 'nom'],
+    'account': ['compte', 'iban', 'account', 'rib'],
+    'currency': ['devise', 'currency'],
+}
+
+
+def read_csv(stream, encoding='utf-8-sig'):
+    text = io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+    header_line = text.readline()
+    if not header_line:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=';,\t|')
+    except csv.Error:
+        dialect = csv.excel
+    header = next(csv.reader([header_line], dialect))
+
+    columns = {}
+    for index, name in enumerate(header):
+        key = fold(name).strip().lower()
+        for field, aliases in CSV_COLUMNS.items():
+            if key in aliases and field not in columns:
+                columns[field] = index
+    if 'date' not in columns or not ({'amount', 'credit'} & set(columns)):
+        raise StatementFormatError("Colonnes 'date' et 'montant' (ou 'crédit') introuvables dans l'en-tête CSV")
+
+    def cell(row, field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for row in csv.reader(text, dialect):
+        if not any(row):
+            continue
+        booking_date = parse_date(cell(row, 'date'))
+        if 'amount' in columns:
+            amount = parse_amount(cell(row, 'amount'))
+        else:
+            amount = (parse_amount(cell(row, 'credit')) or Decimal('0')) - abs(parse_amount(cell(row, 'debit')) or Decimal('0'))
+        if booking_date is None or amount is None:
+            continue
+        yield StatementLine(
+            cell(row, 'account'), booking_date, amount, cell(row, 'currency'),
+            cell(row, 'reference'), cell(row, 'counterparty'), cell(row, 'description'),
+        )
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def ofx_tokens(stream):
+    """Balises OFX (SGML ou XML) lues par blocs"""
+    text = io.TextIOWrapper(stream, encoding='latin-1', newline='')
+    buffer = ''
+    while True:
+        chunk = text.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        cut = buffer.rfind('<')
+        complete, buffer = buffer[:cut], buffer[cut:]
+        for closing, tag, value in OFX_TAG.findall(complete):
+            yield closing, tag.upper(), value.strip()
+    for closing, tag, value in OFX_TAG.findall(buffer):
+        yield closing, tag.upper(), value.strip()
+
+
+def read_ofx(stream):
+    account, currency, current = '', '', None
+    for closing, tag, value in ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            if closing and current is not None:
+                line = ofx_line(current, account, currency)
+                if line:
+                    yield line
+            current = None if closing else {}
+        elif closing:
+            continue
+        elif current is not None:
+            current[tag] = value
+        elif tag == 'ACCTID':
+            account = value
+        elif tag == 'CURDEF':
+            currency = value
+
+
+def ofx_line(fields, account, currency):
+    booking_date = parse_date(fields.get('DTPOSTED', '')[:8])
+    amount = parse_amount(fields.get('TRNAMT'))
+    if booking_date is None or amount is None:
+        return None
+    return StatementLine(
+        account, booking_date, amount, currency,
+        fields.get('REFNUM') or fields.get('CHECKNUM') or fields.get('FITID', ''),
+        fields.get('NAME', ''), fields.get('MEMO', ''),
+    )
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_camt(stream):
+    account, currency = '', ''
+    path = []
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        name = local_name(element.tag)
+        if event == 'start':
+            path.append(name)
+            continue
+        path.pop()
+        if name == 'IBAN' and path[-3:] == ['Stmt', 'Acct', 'Id']:
+            account = (element.text or '').strip()
+        elif name == 'Ccy' and path[-2:] == ['Stmt', 'Acct']:
+            currency = (element.text or '').strip()
+        elif name == 'Ntry':
+            line = camt_line(element, account, currency)
+            element.clear()
+            if line:
+                yield line
+        elif name == 'Stmt':
+            element.clear()
+
+
+def camt_line(entry, account, currency):
+    def find_text(*names):
+        for name in names:
+            for element in entry.iter():
+                if local_name(element.tag) == name and (element.text or '').strip():
+                    return element.text.strip()
+        return ''
+
+    amount_element = next((e for e in entry if local_name(e.tag) == 'Amt'), None)
+    amount = parse_amount(amount_element.text if amount_element is not None else '')
+    booking = next((e for e in entry if local_name(e.tag) == 'BookgDt'), None)
+    booking_date = None
+    if booking is not None:
+        booking_date = parse_date(''.join(text.strip() for text in booking.itertext()))
+    if amount is None or booking_date is None:
+        return None
+
+    credit = find_text('CdtDbtInd') != 'DBIT'
+    if not credit:
+        amount = -amount
+    counterparty = ''
+    for element in entry.iter():
+        if local_name(element.tag) == ('Dbtr' if credit else 'Cdtr'):
+            counterparty = next(
+                ((e.text or '').strip() for e in element.iter() if local_name(e.tag) == 'Nm'), ''
+            )
+            break
+    reference = find_text('EndToEndId', 'AcctSvcrRef', 'TxId')
+    if reference == 'NOTPROVIDED':
+        reference = find_text('AcctSvcrRef', 'TxId')
+    return StatementLine(
+        account,
+        booking_date,
+        amount,
+        amount_element.get('Ccy', currency) if amount_element is not None else currency,
+        reference,
+        counterparty,
+        find_text('Ustrd', 'AddtlNtryInf'),
+    )
+
+
+MT940_LINE = re.compile(
+    r'^(?P<value_date>\d{6})(?P<entry_date>\d{4})?(?P<mark>R?[CD])[A-Z]?'
+    r'(?P<amount>\d+,\d*)(?P<type>[A-Z0-9]{4})(?P<reference>[^/]*)(?://(?P<bank_reference>.*))?'
+)
+
+
+def read_mt940(stream):
+    text = io.TextIOWrapper(stream, encoding='latin-1', newline=None)
+    account, currency = '', ''
+    pending, info = None, []
+
+    def emit():
+        details = ' '.join(info).strip()
+        reference = pending['reference'].strip()
+        if not reference or reference.upper() == 'NONREF':
+            match = re.search(r'/EREF/([^/]+)', details)
+            reference = match.group(1).strip() if match else ''
+        name = re.search(r'/NAME/([^/]+)', details) or re.search(r'\?32([^?]*)', details)
+        return StatementLine(
+            account, pending['date'], pending['amount'], currency,
+            reference, name.group(1).strip() if name else '', details[:255],
+        )
+
+    tag = None
+    for raw in text:
+        line = raw.rstrip('\r\n')
+        match = re.match(r'^:(\d{2}[A-Z]?):(.*)$', line)
+        if match:
+            tag, value = match.groups()
+        elif line.startswith('-'):
+            tag, value = None, ''
+        else:
+            if tag == '86':
+                info.append(line)
+            continue
+
+        if tag in ('61', '62F', '62M', None) and pending:
+            yield emit()
+            pending, info = None, []
+
+        if tag == '25':
+            account = value.strip()
+        elif tag in ('60F', '60M'):
+            currency = value[7:10]
+        elif tag == '61':
+            parsed = MT940_LINE.match(value)
+            if parsed:
+                value_date = datetime.strptime(parsed['value_date'], '%y%m%d').date()
+                amount = parse_amount(parsed['amount'])
+                if parsed['mark'].endswith('D'):
+                    amount = -amount
+                if parsed['mark'].startswith('R'):
+                    amount = -amount
+                pending = {'date': value_date, 'amount': amount, 'reference': parsed['reference']}
+        elif tag == '86' and pending:
+            info.append(value)
+    if pending:
+        yield emit()
+
+
+READERS = {
+    'CSV': read_csv,
+    'OFX': read_ofx,
+    'CAMT': read_camt,
+    'MT940': read_mt940,
+}
+
+
+# ==================== RAPPROCHEMENT ====================
+
+DOCUMENT_REFERENCE = re.compile(r'\b(?:DOC|DOCUMENT|FACT|FACTURE|FAC)\s*[#:N°\-/ ]*\s*(\d{1,9})\b')
+
+
+def cents(amount):
+    return int((amount * 100).to_integral_value())
+
+
+class MatchIndex:
+    """Index en mémoire des paiements à vérifier et des documents ouverts"""
+
+    def __init__(self, window_days=DATE_WINDOW_DAYS):
+        self.window_days = window_days
+        self.payments_by_reference = defaultdict(list)
+        self.payments_by_amount = defaultdict(list)
+        self.used_payments = set()
+        self.documents = {}
+        self.documents_by_amount = defaultdict(list)
+        self.residents_by_name = defaultdict(set)
+
+    def build(self):
+        rows = pending_payments().filter(document__isnull=False).values_list(
+            'pk', 'document_id', 'document__resident_id', 'amount', 'payment_date', 'reference'
+        )
+        for pk, document_id, resident_id, amount, payment_date, reference in rows.iterator(chunk_size=BATCH_SIZE):
+            candidate = (pk, document_id, resident_id, payment_date.toordinal())
+            self.payments_by_amount[cents(amount)].append(candidate)
+            if normalize_reference(reference):
+                self.payments_by_reference[normalize_reference(reference)].append((cents(amount),) + candidate)
+
+        rows = Document.objects.filter(is_paid=False, is_archived=False).values_list(
+            'pk', 'resident_id', 'amount', 'paid_amount', 'due_date'
+        )
+        for pk, resident_id, amount, paid_amount, due_date in rows.iterator(chunk_size=BATCH_SIZE):
+            remaining = cents(amount - paid_amount)
+            if remaining <= 0:
+                continue
+            due = due_date.toordinal() if due_date else 0
+            self.documents[pk] = [resident_id, remaining, due]
+            self.documents_by_amount[(remaining, resident_id)].append((due, pk))
+        for candidates in self.documents_by_amount.values():
+            candidates.sort()
+
+        for pk, last_name, username in User.objects.filter(role='RESIDENT').values_list('pk', 'last_name', 'username'):
+            for token in re.findall(r'[A-Z]{3,}', fold(last_name)):
+                self.residents_by_name[token].add(pk)
+        return self
+
+    def match(self, line):
+        """Retourne (méthode, payment_id, document_id) ou None"""
+        amount = cents(line.amount)
+        day = line.booking_date.toordinal()
+
+        # 1. Paiement déclaré avec la même référence et le même montant
+        reference = normalize_reference(line.reference)
+        if reference:
+            candidates = [
+                candidate for candidate in self.payments_by_reference.get(reference, ())
+                if candidate[0] == amount and candidate[1] not in self.used_payments
+            ]
+            if candidates:
+                _, payment_id, document_id, _, _ = min(candidates, key=lambda c: abs(c[4] - day))
+                self.used_payments.add(payment_id)
+                return 'PAYMENT_REFERENCE', payment_id, document_id
+
+        # 2. Numéro de document cité dans le libellé
+        text = fold(f"{line.reference} {line.description}")
+        for number in DOCUMENT_REFERENCE.findall(text):
+            document = self.documents.get(int(number))
+            if document and 0 < amount <= document[1]:
+                self.consume_document(int(number), amount)
+                return 'DOCUMENT_REFERENCE', None, int(number)
+
+        # Résident nommé dans le libellé (un seul, sinon ambigu)
+        words = set(re.findall(r'[A-Z]{3,}', fold(f"{line.counterparty} {line.description}")))
+        residents = set()
+        for word in words:
+            residents |= self.residents_by_name.get(word, set())
+        resident_id = residents.pop() if len(residents) == 1 else None
+
+        # 3. Paiement déclaré unique de même montant dans la fenêtre de dates
+        candidates = [
+            candidate for candidate in self.payments_by_amount.get(amount, ())
+            if candidate[0] not in self.used_payments
+            and abs(candidate[3] - day) <= self.window_days
+            and resident_id in (None, candidate[2])
+        ]
+        if len(candidates) == 1:
+            payment_id, document_id, _, _ = candidates[0]
+            self.used_payments.add(payment_id)
+            return 'PAYMENT_AMOUNT', payment_id, document_id
+
+        # 4. Document ouvert du même montant pour le résident nommé (le plus ancien)
+        if resident_id is not None:
+            candidates = self.documents_by_amount.get((amount, resident_id))
+            if candidates:
+                _, document_id = candidates[0]
+                self.consume_document(document_id, amount)
+                return 'DOCUMENT_RESIDENT', None, document_id
+        return None
+
+    def consume_document(self, document_id, amount):
+        """Retirer le montant rapproché du reste à payer indexé"""
+        resident_id, remaining, due = self.documents[document_id]
+        key = (remaining, resident_id)
+        self.documents_by_amount[key] = [c for c in self.documents_by_amount[key] if c[1] != document_id]
+        remaining -= amount
+        if remaining <= 0:
+            del self.documents[document_id]
+        else:
+            self.documents[document_id][1] = remaining
+            self.documents_by_amount[(remaining, resident_id)].append((due, document_id))
+            self.documents_by_amount[(remaining, resident_id)].sort()
+
+
+class BankStatementImporter:
+    """Importer un relevé en flux et rapprocher ses lignes par lots"""
+
+    def __init__(self, user=None, window_days=DATE_WINDOW_DAYS, batch_size=BATCH_SIZE, dry_run=False):
+        self.user = user
+        self.window_days = window_days
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.counts = Counter()
+        self.occurrences = Counter()
+
+    def run(self, stream, file_name, file_format=None):
+        """Importer ``stream`` (fichier binaire). Retourne le BankStatementImport."""
+        if not file_format:
+            head = stream.read(4096)
+            stream.seek(0)
+            file_format = detect_format(file_name, head)
+        reader = READERS.get(file_format)
+        if reader is None:
+            raise StatementFormatError(f"Format de relevé inconnu: {file_format}")
+
+        record = BankStatementImport(file_name=file_name[:255], file_format=file_format, imported_by=self.user)
+        if not self.dry_run:
+            record.save()
+
+        started = time.monotonic()
+        self.index = MatchIndex(self.window_days).build()
+        try:
+            batch = []
+            for line in reader(stream):
+                self.counts['rows'] += 1
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    self.process_batch(batch, record)
+                    batch = []
+            if batch:
+                self.process_batch(batch, record)
+            record.status = 'DONE'
+        except (ET.ParseError, UnicodeDecodeError, csv.Error) as e:
+            record.status = 'FAILED'
+            record.error = f"Fichier illisible: {e}"
+        except StatementFormatError as e:
+            record.status = 'FAILED'
+            record.error = str(e)
+
+        record.duration_ms = int((time.monotonic() - started) * 1000)
+        record.row_count = self.counts['rows']
+        record.matched_count = self.counts['matched']
+        record.review_count = self.counts['review']
+        record.duplicate_count = self.counts['duplicate']
+        record.ignored_count = self.counts['ignored']
+        record.finished_at = timezone.now()
+        if not self.dry_run:
+            record.save()
+        return record
+
+    def fingerprint(self, line):
+        """Empreinte stable d'une ligne ; les lignes identiques d'un même fichier sont numérotées"""
+        key = '|'.join([
+            line.account, line.booking_date.isoformat(), str(line.amount),
+            normalize_reference(line.reference), fold(line.description)[:100],
+        ])
+        self.occurrences[key] += 1
+        return hashlib.sha256(f"{key}|{self.occurrences[key]}".encode()).hexdigest()
+
+    def process_batch(self, lines, record):
+        # Les débits (dépenses, frais) ne concernent pas les paiements des résidents
+        credits = [line for line in lines if line.amount > 0]
+        self.counts['ignored'] += len(lines) - len(credits)
+        lines = credits
+        fingerprints = [self.fingerprint(line) for line in lines]
+        existing = set(
+            BankTransaction.objects.filter(fingerprint__in=fingerprints).values_list('fingerprint', flat=True)
+        )
+
+        now = timezone.now()
+        transactions = []
+        new_payments = []
+        verified_payment_ids = []
+        for line, fingerprint in zip(lines, fingerprints):
+            if fingerprint in existing:
+                self.counts['duplicate'] += 1
+                continue
+            transaction_row = BankTransaction(
+                statement_import=record if record.pk else None,
+                account=line.account[:64],
+                booking_date=line.booking_date,
+                amount=line.amount,
+                currency=line.currency[:3],
+                reference=line.reference[:140],
+                counterparty=line.counterparty[:140],
+                description=line.description[:255],
+                fingerprint=fingerprint,
+            )
+            transactions.append(transaction_row)
+
+            match = self.index.match(line)
+            if match is None:
+                transaction_row.status = 'REVIEW'
+                self.counts['review'] += 1
+                continue
+
+            method, payment_id, document_id = match
+            transaction_row.status = 'MATCHED'
+            transaction_row.match_method = method
+            transaction_row.document_id = document_id
+            self.counts['matched'] += 1
+            if payment_id:
+                transaction_row.payment_id = payment_id
+                verified_payment_ids.append(payment_id)
+            else:
+                payment = Payment(
+                    document_id=document_id,
+                    amount=line.amount,
+                    payment_method='BANK_TRANSFER',
+                    payment_date=line.booking_date,
+                    reference=(line.reference or line.description)[:100],
+                    notes=f"Rapprochement bancaire automatique ({record.file_name})",
+                    is_verified=True,
+                    verified_by=self.user,
+                    verified_at=now,
+                )
+                new_payments.append(payment)
+                transaction_row._new_payment = payment
+
+        if self.dry_run:
+            return
+        with transaction.atomic():
+            self.commit(transactions, new_payments, verified_payment_ids, now)
+
+    def commit(self, transactions, new_payments, verified_payment_ids, now):
+        if new_payments:
+            bulk_insert(new_payments, key=['document', 'amount'], batch_size=self.batch_size)
+            deltas = defaultdict(Decimal)
+            for payment in new_payments:
+                deltas[payment.document_id] += payment.amount
+            Document.apply_payment_deltas(deltas)
+            record_payments(new_payments)
+
+        # Un paiement rejeté entre-temps n'est pas vérifié par l'import
+        for start in range(0, len(verified_payment_ids), self.batch_size):
+            pending_payments().filter(pk__in=verified_payment_ids[start:start + self.batch_size]).update(
+                is_verified=True, verified_by=self.user, verified_at=now,
+            )
+
+        for transaction_row in transactions:
+            payment = getattr(transaction_row, '_new_payment', None)
+            if payment is not None:
+                transaction_row.payment_id = payment.pk
+        BankTransaction.objects.bulk_create(transactions, batch_size=self.batch_size)
+        if new_payments or verified_payment_ids:
+            stats.invalidate('payments', 'documents')
+
+
+def import_statement(stream, file_name, file_format=None, **options):
+    """Raccourci : importer un relevé et retourner le BankStatementImport"""
+    return BankStatementImporter(**options).run(stream, file_name, file_format)
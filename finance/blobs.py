@@ -0,0 +1,256 @@
+"""Références et ramassage des fichiers du stockage adressé par contenu.
+
+Chaque fichier ``blobs/...`` a une ligne ``StoredBlob`` dont le compteur suit
+les champs qui le désignent (``Document.file``, ``Payment.payment_proof``,
+``ResidentReport.photo``) : les signaux ajustent le compteur à chaque
+enregistrement ou suppression, les traitements par lots (``bulk_create``,
+``update``) l'ajustent eux-mêmes. Le compteur ne sert qu'à repérer les
+candidats : avant de supprimer un fichier, ``collect_garbage`` vérifie par
+``EXISTS`` qu'aucune ligne ne le désigne et qu'il n'a pas été réutilisé
+pendant le délai de grâce.
+"""
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import images
+from .models import Document, Payment, ResidentReport, StoredBlob
+from .storage import archive_prefix, blob_prefix, blob_storage, is_blob, sha256_of
+
+FILE_FIELDS = {
+    Document: 'file',
+    Payment: 'payment_proof',
+    ResidentReport: 'photo',
+}
+
+
+def file_name(value):
+    return str(getattr(value, 'name', value) or '')
+
+
+def grace_period():
+    return timedelta(hours=getattr(settings, 'BLOB_GC_GRACE_HOURS', 24))
+
+
+# ==================== COMPTEURS ====================
+
+def change_refs(deltas):
+    """Ajuster les compteurs : ``deltas`` est un dictionnaire {nom: variation}"""
+    deltas = {name: delta for name, delta in deltas.items() if delta and is_blob(name)}
+    if not deltas:
+        return
+    storage = blob_storage()
+    created = [name for name, delta in deltas.items() if delta > 0]
+    if created:
+        known = set(StoredBlob.objects.filter(name__in=created).values_list('name', flat=True))
+        StoredBlob.objects.bulk_create(
+            [
+                StoredBlob(name=name, sha256=sha256_of(name), size=storage.size(name) if storage.exists(name) else 0)
+                for name in created if name not in known
+            ],
+            ignore_conflicts=True,
+        )
+    # Une requête par valeur de variation (en pratique +1, -1 ou la taille d'un lot)
+    by_delta = defaultdict(list)
+    for name, delta in deltas.items():
+        by_delta[delta].append(name)
+    now = timezone.now()
+    for delta, names in by_delta.items():
+        StoredBlob.objects.filter(name__in=names).update(ref_count=F('ref_count') + delta, updated_at=now)
+
+
+def sync_file_refs(instance, deleted=False):
+    """Ajuster les références après l'enregistrement ou la suppression d'un objet (signaux)"""
+    field = FILE_FIELDS[type(instance)]
+    if field not in instance.__dict__:
+        # Champ différé : il n'a pas pu être modifié
+        return
+    current = '' if deleted else file_name(instance.__dict__[field])
+    loaded = getattr(instance, '_loaded_file', '')
+    if loaded is None:
+        return
+    previous = file_name(loaded)
+    if current != previous:
+        deltas = Counter()
+        deltas[current] += 1
+        deltas[previous] -= 1
+        change_refs(deltas)
+    instance._loaded_file = current
+
+
+def references(names):
+    """Nombre de lignes qui désignent chacun des fichiers donnés"""
+    counts = Counter()
+    for model, field in FILE_FIELDS.items():
+        rows = (
+            model.objects.filter(**{f"{field}__in": names})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values_list(field, 'count')
+        )
+        counts.update(dict(rows))
+    return counts
+
+
+def is_referenced(name):
+    return any(model.objects.filter(**{field: name}).exists() for model, field in FILE_FIELDS.items())
+
+
+def recount():
+    """Recalculer tous les compteurs à partir des tables (après une restauration, par exemple)"""
+    counts = Counter()
+    for model, field in FILE_FIELDS.items():
+        rows = (
+            model.objects.filter(
+                Q(**{f"{field}__startswith": blob_prefix() + '/'})
+                | Q(**{f"{field}__startswith": f"{archive_prefix()}/{blob_prefix()}/"})
+            )
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values_list(field, 'count')
+        )
+        counts.update(dict(rows))
+    counts = Counter({name: count for name, count in counts.items() if is_blob(name)})
+
+    storage = blob_storage()
+    with transaction.atomic():
+        known = set(StoredBlob.objects.values_list('name', flat=True))
+        StoredBlob.objects.bulk_create(
+            [
+                StoredBlob(name=name, sha256=sha256_of(name), size=storage.size(name) if storage.exists(name) else 0)
+                for name in counts if name not in known
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        blobs = list(StoredBlob.objects.only('pk', 'name', 'ref_count'))
+        changed = [blob for blob in blobs if blob.ref_count != counts.get(blob.name, 0)]
+        for blob in changed:
+            blob.ref_count = counts.get(blob.name, 0)
+        StoredBlob.objects.bulk_update(changed, ['ref_count'], batch_size=1000)
+    return len(changed)
+
+
+# ==================== RAMASSAGE ====================
+
+def file_age(storage, name):
+    try:
+        return time.time() - os.path.getmtime(storage.path(name))
+    except OSError:
+        return None
+
+
+def remove_blob(storage, name):
+    storage.delete(name)
+    images.discard(name)
+
+
+def collect_garbage(dry_run=False):
+    """Supprimer les fichiers sans référence. Retourne les statistiques du passage."""
+    storage = blob_storage()
+    grace = grace_period()
+    stats = {'removed': 0, 'freed_bytes': 0, 'repaired': 0, 'orphans': 0, 'temporary': 0}
+
+    # 1. Compteurs à zéro depuis le délai de grâce, revérifiés ligne par ligne
+    candidates = StoredBlob.objects.filter(ref_count__lte=0, updated_at__lt=timezone.now() - grace)
+    for pk in list(candidates.values_list('pk', flat=True)[:10000]):
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(pk=pk, ref_count__lte=0).first()
+            if blob is None:
+                continue
+            if is_referenced(blob.name):
+                # Compteur faux (mise à jour hors signaux) : on le corrige au lieu de supprimer
+                StoredBlob.objects.filter(pk=pk).update(ref_count=references([blob.name])[blob.name])
+                stats['repaired'] += 1
+                continue
+            age = file_age(storage, blob.name)
+            if age is not None and age < grace.total_seconds():
+                # Contenu réutilisé récemment par un envoi pas encore enregistré
+                continue
+            stats['removed'] += 1
+            stats['freed_bytes'] += blob.size
+            if not dry_run:
+                blob.delete()
+                transaction.on_commit(lambda name=blob.name: remove_blob(storage, name))
+
+    # 2. Fichiers sans ligne (envoi interrompu avant l'enregistrement de l'objet)
+    known = set(StoredBlob.objects.values_list('name', flat=True))
+    roots = [storage.path(blob_prefix()), storage.path(f"{archive_prefix()}/{blob_prefix()}")]
+    for directory, _, files in (entry for root in roots for entry in os.walk(root)):
+        for base in files:
+            path = os.path.join(directory, base)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            age = file_age(storage, name) or 0
+            if base.endswith('.part'):
+                if age > grace.total_seconds():
+                    stats['temporary'] += 1
+                    if not dry_run:
+                        storage.delete(name)
+                continue
+            if not is_blob(name) or name in known or age < grace.total_seconds():
+                continue
+            if is_referenced(name):
+                change_refs(references([name]))
+                stats['repaired'] += 1
+                continue
+            stats['orphans'] += 1
+            stats['freed_bytes'] += os.path.getsize(path)
+            if not dry_run:
+                remove_blob(storage, name)
+    return stats
+
+
+# ==================== REPRISE DES ANCIENS FICHIERS ====================
+
+def import_legacy_files(dry_run=False):
+    """Déplacer les fichiers stockés sous leur nom d'origine vers le stockage adressé par contenu.
+
+    Les fichiers identiques n'occupent plus qu'une place ; les lignes qui les
+    désignent sont mises à jour par nom, en un ``UPDATE`` par fichier.
+    Retourne ``(fichiers repris, octets libérés)``.
+    """
+    storage = blob_storage()
+    imported = freed = 0
+    for model, field in FILE_FIELDS.items():
+        names = (
+            model.objects.exclude(**{f"{field}__startswith": blob_prefix() + '/'})
+            .exclude(**{f"{field}__startswith": archive_prefix() + '/'})
+            .exclude(**{field: ''})
+            .exclude(**{f"{field}__isnull": True})
+            .order_by()
+            .values_list(field, flat=True)
+            .distinct()
+        )
+        for name in list(names):
+            if not storage.exists(name):
+                continue
+            imported += 1
+            size = storage.size(name)
+            if dry_run:
+                continue
+            with storage.open(name, 'rb') as source:
+                new_name = storage.save(name, File(source, name=name))
+            duplicate = StoredBlob.objects.filter(name=new_name).exists()
+            with transaction.atomic():
+                updates = {field: new_name}
+                if model is Payment:
+                    updates['payment_proof_sha256'] = sha256_of(new_name)
+                count = model.objects.filter(**{field: name}).update(**updates)
+                change_refs({new_name: count})
+            if not is_referenced(name):
+                images.discard(name)
+                if model is not Document:
+                    images.enqueue(new_name)
+                storage.delete(name)
+                if duplicate:
+                    freed += size
+    return imported, freed
@@ -0,0 +1,44 @@
+"""Insertion groupée qui renseigne toujours les clés primaires.
+
+Les traitements par lots (appels de charges, paiements groupés, import
+bancaire, notifications) ont besoin des clés des lignes créées pour les
+écritures du grand livre, l'index de recherche ou les destinataires.
+``bulk_create`` ne les renvoie que sur les bases qui savent le faire
+(PostgreSQL, SQLite, MariaDB) ; ailleurs (MySQL), les lignes créées sont
+relues dans la même transaction, parmi celles dont la clé dépasse la plus
+grande clé d'avant l'insertion, et rattachées aux instances par une clé
+naturelle (``key``) puis par ordre d'insertion.
+"""
+from collections import defaultdict, deque
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+
+def bulk_insert(instances, key, batch_size=None):
+    """Insérer des instances d'un même modèle ; retourne la liste, clés renseignées.
+
+    ``key`` : noms des champs qui identifient une ligne créée (les doublons
+    sont départagés par l'ordre d'insertion).
+    """
+    if not instances:
+        return instances
+    model = type(instances[0])
+    using = router.db_for_write(model)
+    manager = model._base_manager.db_manager(using)
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        return manager.bulk_create(instances, batch_size=batch_size)
+
+    attnames = [model._meta.get_field(name).attname for name in key]
+    with transaction.atomic(using=using):
+        last_pk = manager.aggregate(last=Max('pk'))['last'] or 0
+        manager.bulk_create(instances, batch_size=batch_size)
+        waiting = defaultdict(deque)
+        for instance in instances:
+            waiting[tuple(getattr(instance, name) for name in attnames)].append(instance)
+        rows = manager.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *attnames)
+        for pk, *values in rows.iterator(chunk_size=batch_size or 2000):
+            pending = waiting.get(tuple(values))
+            if pending:
+                pending.popleft().pk = pk
+    return instances
@@ -0,0 +1,214 @@
+"""Saisie groupée des paiements encaissés par le syndic (espèces, chèques...).
+
+Toutes les lignes sont validées ensemble (une requête pour charger les
+documents concernés) et rien n'est enregistré si l'une d'elles est invalide.
+``submit_payments`` valide et enregistre dans la même transaction, documents
+verrouillés : deux saisies simultanées ne peuvent pas dépasser le reste à
+payer d'un document.
+L'enregistrement se fait en une transaction : ``bulk_create`` des paiements,
+un seul ``UPDATE`` groupé pour le montant payé des documents, écritures du
+grand livre en bloc et une notification récapitulative unique.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+from .bulk import bulk_insert
+from .ledger import record_payments
+from .models import Document, Notification, OperationLog, Payment
+from .notifications import bulk_notify
+
+User = get_user_model()
+
+MAX_BULK_PAYMENTS = 500
+
+PAYMENT_METHODS = dict(Payment.PAYMENT_METHODS)
+
+# Libellés acceptés dans la saisie texte, en plus des codes
+METHOD_ALIASES = {
+    'especes': 'CASH',
+    'espèces': 'CASH',
+    'cheque': 'CHECK',
+    'chèque': 'CHECK',
+    'virement': 'BANK_TRANSFER',
+    'carte': 'CARD',
+    'autre': 'OTHER',
+}
+
+TEXT_COLUMNS = ['document_id', 'amount', 'payment_method', 'payment_date', 'reference', 'notes']
+
+
+def parse_text(text):
+    """Lignes 'N° document ; montant ; méthode ; date ; référence ; notes' -> liste de dictionnaires
+
+    Chaque dictionnaire garde sous ``line`` son numéro de ligne dans le texte
+    (les lignes vides et les commentaires sont ignorés mais comptés).
+    """
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        values = [value.strip() for value in line.split(';')]
+        rows.append({**dict(zip(TEXT_COLUMNS, values)), 'line': number})
+    return rows
+
+
+def clean_amount(value):
+    try:
+        amount = Decimal(str(value).replace(' ', '').replace(',', '.'))
+    except (InvalidOperation, ValueError):
+        return None
+    return amount.quantize(Decimal('0.01')) if amount.is_finite() else None
+
+
+def clean_date(value, today):
+    if not value:
+        return today
+    if isinstance(value, date):
+        return value
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(str(value), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def validate_payments(rows, lock=False):
+    """Valider un lot de paiements.
+
+    Retourne ``(paiements, erreurs)`` : les paiements non enregistrés si tout
+    est valide, sinon une liste d'erreurs ``{'index', 'field', 'message'}``.
+    Avec ``lock``, les documents sont verrouillés (``SELECT ... FOR UPDATE``)
+    jusqu'à la fin de la transaction en cours.
+    """
+    errors = []
+    if not rows:
+        return [], [{'index': None, 'field': None, 'message': "Aucun paiement à enregistrer."}]
+    if len(rows) > MAX_BULK_PAYMENTS:
+        return [], [{'index': None, 'field': None,
+                     'message': f"Au maximum {MAX_BULK_PAYMENTS} paiements par envoi."}]
+
+    document_ids = set()
+    for row in rows:
+        try:
+            document_ids.add(int(row.get('document_id')))
+        except (TypeError, ValueError):
+            pass
+    documents = Document.objects.only('id', 'amount', 'paid_amount', 'is_archived').order_by('pk')
+    if lock:
+        documents = documents.select_for_update()
+    documents = documents.in_bulk(document_ids)
+
+    today = timezone.localdate()
+    payments = []
+    batch_totals = defaultdict(Decimal)
+    for index, row in enumerate(rows):
+        def error(field, message):
+            errors.append({'index': index, 'field': field, 'message': message})
+
+        try:
+            document = documents.get(int(row.get('document_id')))
+        except (TypeError, ValueError):
+            document = None
+        if document is None:
+            error('document_id', "Document introuvable.")
+        elif document.is_archived:
+            error('document_id', "Document archivé.")
+
+        amount = clean_amount(row.get('amount'))
+        if amount is None or amount <= 0:
+            error('amount', "Montant invalide.")
+
+        method = row.get('payment_method') or 'CASH'
+        method = METHOD_ALIASES.get(str(method).lower(), str(method).upper())
+        if method not in PAYMENT_METHODS:
+            error('payment_method', "Méthode de paiement inconnue.")
+
+        payment_date = clean_date(row.get('payment_date'), today)
+        if payment_date is None:
+            error('payment_date', "Date invalide (AAAA-MM-JJ ou JJ/MM/AAAA).")
+        elif payment_date > today:
+            error('payment_date', "La date de paiement ne peut pas être dans le futur.")
+
+        if errors and errors[-1]['index'] == index:
+            continue
+
+        batch_totals[document.pk] += amount
+        if document.paid_amount + batch_totals[document.pk] > document.amount:
+            error('amount', "Le total dépasse le reste à payer du document "
+                            f"({document.amount - document.paid_amount} DH).")
+            continue
+
+        payments.append(Payment(
+            document_id=document.pk,
+            amount=amount,
+            payment_method=method,
+            payment_date=payment_date,
+            reference=str(row.get('reference') or '')[:100],
+            notes=str(row.get('notes') or ''),
+        ))
+
+    return ([], errors) if errors else (payments, [])
+
+
+def submit_payments(rows, user):
+    """Valider puis enregistrer un lot, documents verrouillés. Retourne ``(paiements créés, erreurs)``."""
+    with transaction.atomic():
+        payments, errors = validate_payments(rows, lock=True)
+        if errors:
+            return [], errors
+        return record_bulk_payments(payments, user), []
+
+
+def record_bulk_payments(payments, user):
+    """Enregistrer des paiements validés. Retourne la liste des paiements créés."""
+    now = timezone.now()
+    for payment in payments:
+        payment.is_verified = True
+        payment.verified_by = user
+        payment.verified_at = now
+
+    with transaction.atomic():
+        bulk_insert(payments, key=['document', 'amount'], batch_size=MAX_BULK_PAYMENTS)
+
+        deltas = defaultdict(Decimal)
+        for payment in payments:
+            deltas[payment.document_id] += payment.amount
+        Document.apply_payment_deltas(deltas)
+        record_payments(payments)
+        stats.invalidate('payments', 'documents')
+
+        total = sum((payment.amount for payment in payments), Decimal('0'))
+        residents = set(
+            Document.objects.filter(pk__in=list(deltas)).values_list('resident_id', flat=True)
+        )
+        OperationLog.objects.create(
+            action='PAYMENT_CREATED',
+            actor=user,
+            target_type='Payment',
+            target_id=f"{payments[0].pk}-{payments[-1].pk}" if payments else '',
+            meta={'count': len(payments), 'total': str(total), 'documents': len(deltas)},
+        )
+        staff_ids = list(User.objects.filter(role__in=['SYNDIC', 'SUPERADMIN'], is_active=True).values_list('pk', flat=True))
+        bulk_notify([(
+            Notification(
+                title=f"{len(payments)} paiements enregistrés",
+                message=(
+                    f"Saisie groupée par {user.get_full_name() or user.username} : "
+                    f"{len(payments)} paiements, {total} DH, {len(deltas)} documents, "
+                    f"{len(residents)} résidents."
+                ),
+                notification_type='GENERAL_ANNOUNCEMENT',
+                priority='MEDIUM',
+                sender=user,
+                is_active=True,
+            ),
+            staff_ids,
+        )])
+    return payments
@@ -0,0 +1,153 @@
+"""Émission groupée des appels de fonds (un document par résident).
+
+Les documents d'une période sont créés en un ``bulk_create`` : les signaux
+``post_save`` de ``Document`` (email SMTP synchrone, notification et journal
+par ligne) ne sont donc pas déclenchés. L'échéance est calculée ici, le fichier
+joint éventuel est enregistré une seule fois et partagé par tous les
+documents, puis le grand livre, les notifications et les emails (mis en file)
+ainsi que l'index de recherche sont produits en bloc.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+
+from .blobs import change_refs
+from .bulk import bulk_insert
+from .bulk_payments import clean_amount
+from .emails import render_templated_email
+from .ledger import record_documents
+from .models import Document, Notification, OperationLog
+from .notifications import bulk_notify, queue_emails
+from . import stats
+from .search import index_objects
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def parse_overrides(text):
+    """Lignes 'appartement ; montant' -> ({appartement: montant}, erreurs)"""
+    overrides, errors = {}, []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        apartment, _, value = line.partition(';')
+        amount = clean_amount(value)
+        if not apartment.strip() or amount is None or amount <= 0:
+            errors.append(f"Ligne {number} : format attendu 'appartement ; montant'.")
+            continue
+        overrides[apartment.strip().upper()] = amount
+    return overrides, errors
+
+
+def already_issued(resident_ids, title, date):
+    """Résidents ayant déjà un document de même titre à cette date (nouvel envoi du formulaire)"""
+    return set(
+        Document.objects.filter(resident_id__in=resident_ids, title=title, date=date)
+        .values_list('resident_id', flat=True)
+    )
+
+
+def issue_charges(residents, *, title, amount, date, user, document_type='INVOICE',
+                  description='', file=None, overrides=None):
+    """Créer les documents d'un appel de fonds.
+
+    ``residents`` est un queryset de résidents ; ``overrides`` associe un
+    numéro d'appartement à un montant propre. Retourne ``(documents créés,
+    nombre de résidents ignorés car déjà appelés)``.
+    """
+    overrides = overrides or {}
+    residents = list(residents.only('id', 'username', 'first_name', 'last_name', 'email', 'apartment'))
+    skipped = already_issued([resident.pk for resident in residents], title, date)
+    residents = [resident for resident in residents if resident.pk not in skipped]
+    if not residents:
+        return [], len(skipped)
+
+    file_name = ''
+    if file:
+        # Un seul fichier en stockage, référencé par tous les documents de l'appel
+        field = Document._meta.get_field('file')
+        file_name = field.storage.save(field.generate_filename(None, file.name), file)
+
+    due_date = Document.compute_due_date(date, document_type)
+    documents = [
+        Document(
+            title=title,
+            file=file_name,
+            amount=overrides.get((resident.apartment or '').upper(), amount),
+            date=date,
+            due_date=due_date,
+            document_type=document_type,
+            resident=resident,
+            uploaded_by=user,
+            description=description,
+        )
+        for resident in residents
+    ]
+
+    with transaction.atomic():
+        bulk_insert(documents, key=['resident', 'title'], batch_size=BATCH_SIZE)
+        record_documents(documents)
+        change_refs({file_name: len(documents)})
+        index_objects(documents)
+        stats.invalidate('documents')
+
+        total = sum(document.amount for document in documents)
+        OperationLog.objects.create(
+            action='DOCUMENT_CREATED',
+            actor=user,
+            target_type='Document',
+            target_id=f"{documents[0].pk}-{documents[-1].pk}",
+            meta={'title': title, 'count': len(documents), 'total': str(total), 'bulk': True},
+        )
+        notify_residents(documents, user)
+    return documents, len(skipped)
+
+
+def notify_residents(documents, user):
+    """Une notification par montant (partagée par ses destinataires) et un email en file par résident"""
+    by_amount = defaultdict(list)
+    for document in documents:
+        by_amount[document.amount].append(document.resident_id)
+    first = documents[0]
+    bulk_notify([
+        (
+            Notification(
+                title=f"Nouveau document: {first.title}",
+                message=f"Type: {first.get_document_type_display()} • Montant: {amount} DH • Date: {first.date}",
+                notification_type='DOCUMENT_UPLOADED',
+                priority='MEDIUM',
+                sender=user,
+                is_active=True,
+            ),
+            resident_ids,
+        )
+        for amount, resident_ids in by_amount.items()
+    ])
+
+    base_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
+    subject = f"Nouveau document: {first.title}"
+    emails = []
+    for document in documents:
+        resident = document.resident
+        if not resident.email:
+            continue
+        body, html_body = render_templated_email(
+            template_name='emails/document_added.html',
+            context={
+                'subject': subject,
+                'resident_name': resident.get_full_name() or resident.username,
+                'document_type': document.get_document_type_display(),
+                'amount': document.amount,
+                'date': document.date,
+                'message': document.description,
+                'link': base_url + reverse('finance:document_detail', args=[document.pk]),
+                'intro_text': "Un nouveau document a été ajouté à votre espace.",
+            },
+        )
+        emails.append({'to_email': resident.email, 'subject': subject, 'body': body, 'html_body': html_body})
+    queue_emails(emails)
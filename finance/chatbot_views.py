@@ -4,13 +4,16 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from django.utils import timezone
 from decimal import Decimal
 import json
 import uuid
 
+from . import faq_retrieval
+from .faq_counters import popular, record as record_faq_event
+from .faq_matcher import find_answer
 from .models import ChatbotFAQ, ChatbotConversation, ChatbotMessage, Notification
+from .search import SearchResults
 
 User = get_user_model()
 
@@ -46,7 +49,7 @@ class ChatbotView(TemplateView):
         faq_categories = ChatbotFAQ.CATEGORIES
         
         # Questions populaires
-        popular_faqs = ChatbotFAQ.objects.filter(is_active=True).order_by('-usage_count')[:6]
+        popular_faqs = popular()
         
         context.update({
             'conversation': conversation,
@@ -109,6 +112,7 @@ class ChatbotMessageAPI(View):
                         'content': bot_response['answer'],
                         'category': bot_response['faq'].get_category_display(),
                         'timestamp': bot_message.created_at.strftime('%H:%M'),
+                        'message_id': bot_message.pk,
                         'helpful_buttons': True
                     }
                 }
@@ -119,7 +123,7 @@ class ChatbotMessageAPI(View):
                     'response': {
                         'type': 'no_match',
                         'content': "Je n'ai pas trouvé de réponse automatique à votre question. Un syndic vous répondra bientôt.",
-                        'suggestions': self.get_suggestions(),
+                        'suggestions': self.get_suggestions(message_content),
                         'timestamp': timezone.now().strftime('%H:%M'),
                         'helpful_buttons': False
                     }
@@ -134,42 +138,14 @@ class ChatbotMessageAPI(View):
             return JsonResponse({'error': str(e)}, status=500)
     
     def find_automatic_response(self, message):
-        """Rechercher une réponse automatique basée sur les mots-clés"""
-        message_lower = message.lower()
-        
-        # Rechercher dans les FAQs actives
-        faqs = ChatbotFAQ.objects.filter(is_active=True)
-        
-        best_match = None
-        best_score = 0
-        
-        for faq in faqs:
-            keywords = [kw.strip().lower() for kw in faq.keywords.split(',')]
-            score = 0
-            
-            for keyword in keywords:
-                if keyword in message_lower:
-                    score += len(keyword)
-            
-            if score > best_score:
-                best_score = score
-                best_match = faq
-        
-        # Seuil minimum pour considérer une correspondance
-        if best_score >= 3:
-            return {
-                'faq': best_match,
-                'answer': best_match.answer,
-                'score': best_score
-            }
-        
-        return None
+        """Rechercher une réponse automatique : mots-clés, puis recherche approchée"""
+        return find_answer(message) or faq_retrieval.find_answer(message)
     
-    def get_suggestions(self):
-        """Obtenir des suggestions de questions populaires"""
-        suggestions = ChatbotFAQ.objects.filter(
-            is_active=True
-        ).order_by('-usage_count')[:3]
+    def get_suggestions(self, message=''):
+        """Obtenir des suggestions : les FAQ les plus proches du message, sinon les plus populaires"""
+        suggestions = [faq for faq, score in faq_retrieval.search(message, top_k=3) if score >= faq_retrieval.min_score() / 2]
+        if not suggestions:
+            suggestions = popular(3)
         
         return [
             {
@@ -198,6 +174,38 @@ class ChatbotMessageAPI(View):
             pass
 
 
+class ChatbotFeedbackAPI(View):
+    """Avis utile / pas utile sur une réponse automatique de l'assistant"""
+
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Requête invalide'}, status=400)
+        is_helpful = data.get('is_helpful')
+        if not isinstance(is_helpful, bool):
+            return JsonResponse({'error': 'Avis manquant'}, status=400)
+        message_id = data.get('message_id')
+        if not isinstance(message_id, int) or isinstance(message_id, bool):
+            return JsonResponse({'error': 'Message manquant'}, status=400)
+
+        messages_qs = ChatbotMessage.objects.filter(
+            pk=message_id,
+            conversation__user=request.user,
+            message_type='FAQ',
+        )
+        faq_id = messages_qs.values_list('faq_used_id', flat=True).first()
+        if faq_id is None:
+            return JsonResponse({'error': 'Message introuvable'}, status=404)
+
+        # Un seul avis par réponse
+        if messages_qs.filter(is_helpful__isnull=True).update(is_helpful=is_helpful):
+            record_faq_event(faq_id, 'helpful_count' if is_helpful else 'not_helpful_count')
+        return JsonResponse({'success': True})
+
+
 class ChatbotFAQManagementView(ListView):
     """Gestion des FAQ du chatbot - syndics seulement"""
     model = ChatbotFAQ
@@ -223,11 +231,8 @@ class ChatbotFAQManagementView(ListView):
         
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(question__icontains=search) | 
-                Q(keywords__icontains=search) |
-                Q(answer__icontains=search)
-            )
+            # Index plein texte (question, mots-clés, réponse) au lieu de trois icontains
+            queryset = queryset.filter(pk__in=SearchResults(self.request.user, search, ['FAQ']).object_ids())
         
         return queryset.order_by('-usage_count', '-created_at')
     
@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
@@ -9,13 +9,8 @@ def get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
     return getattr(settings, name, default)
 
 
-def send_templated_email(
-    *,
-    subject: str,
-    to_email: str,
-    template_name: str,
-    context: Dict,
-) -> int:
+def render_templated_email(*, template_name: str, context: Dict) -> Tuple[str, str]:
+    """Render an email template, returning (text_content, html_content)."""
     from_email = (
         get_setting("DEFAULT_FROM_EMAIL")
         or get_setting("EMAIL_HOST_USER")
@@ -35,6 +30,22 @@ def send_templated_email(
         "emails/text_fallback.txt",
         email_context,
     )
+    return text_content, html_content
+
+
+def send_templated_email(
+    *,
+    subject: str,
+    to_email: str,
+    template_name: str,
+    context: Dict,
+) -> int:
+    from_email = (
+        get_setting("DEFAULT_FROM_EMAIL")
+        or get_setting("EMAIL_HOST_USER")
+        or "no-reply@syndic.local"
+    )
+    text_content, html_content = render_templated_email(template_name=template_name, context=context)
 
     msg = EmailMultiAlternatives(subject=subject, body=text_content, from_email=from_email, to=[to_email])
     msg.attach_alternative(html_content, "text/html")
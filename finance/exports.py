@@ -0,0 +1,299 @@
+"""Exports CSV et XLSX en flux, à mémoire constante.
+
+Les lignes sont lues par ``values_list(...).iterator(chunk_size=...)`` (aucun
+objet modèle instancié) et envoyées au fur et à mesure par une
+``StreamingHttpResponse`` : le premier octet part avant la fin de la requête
+et la mémoire ne dépend pas du nombre de lignes.
+
+Le XLSX est écrit en flux lui aussi : l'archive zip est produite par
+``zipfile`` sur une sortie non positionnable (descripteurs de données après
+chaque membre) et la feuille n'utilise que des chaînes en ligne, sans table
+de chaînes partagées à garder en mémoire.
+"""
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Depense, Document, Payment, ResidentReport
+
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024
+
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class Column:
+    """Colonne d'export : en-tête, champs lus par ``values_list`` et mise en forme éventuelle"""
+
+    def __init__(self, header, *fields, format=None):
+        self.header = header
+        self.fields = fields
+        self.format = format
+
+    def value(self, values):
+        if self.format is not None:
+            return self.format(*values)
+        return values[0]
+
+
+def choice(choices):
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+def yes_no(value):
+    return 'Oui' if value else 'Non'
+
+
+def full_name(first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def rows(queryset, columns):
+    """Lignes mises en forme, lues par lots sans instancier de modèle"""
+    fields = [field for column in columns for field in column.fields]
+    slices = []
+    position = 0
+    for column in columns:
+        slices.append((column, position, position + len(column.fields)))
+        position += len(column.fields)
+    for values in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        yield [column.value(values[start:end]) for column, start, end in slices]
+
+
+# Colonnes de chaque export, par nom de fichier
+COLUMNS = {
+    'documents': [
+        Column('N°', 'pk'),
+        Column('Titre', 'title'),
+        Column('Type', 'document_type', format=choice(Document.DOCUMENT_TYPES)),
+        Column('Résident', 'resident__first_name', 'resident__last_name', format=full_name),
+        Column('Appartement', 'resident__apartment'),
+        Column('Montant (DH)', 'amount'),
+        Column('Montant payé (DH)', 'paid_amount'),
+        Column('Payé', 'is_paid', format=yes_no),
+        Column('Date', 'date'),
+        Column('Échéance', 'due_date'),
+        Column('Archivé', 'is_archived', format=yes_no),
+    ],
+    'paiements': [
+        Column('N°', 'pk'),
+        Column('Document', 'document__title'),
+        Column('Résident', 'document__resident__first_name', 'document__resident__last_name', format=full_name),
+        Column('Appartement', 'document__resident__apartment'),
+        Column('Montant (DH)', 'amount'),
+        Column('Méthode', 'payment_method', format=choice(Payment.PAYMENT_METHODS)),
+        Column('Date', 'payment_date'),
+        Column('Référence', 'reference'),
+        Column('Vérifié', 'is_verified', format=yes_no),
+        Column('Rejeté', 'is_rejected', format=yes_no),
+    ],
+    'depenses': [
+        Column('N°', 'pk'),
+        Column('Titre', 'titre'),
+        Column('Catégorie', 'categorie', format=choice(Depense.CATEGORIES)),
+        Column('Montant (DH)', 'montant'),
+        Column('Date', 'date_depense'),
+        Column('Ajoutée par', 'ajoute_par__username'),
+    ],
+    'residents': [
+        Column('N°', 'pk'),
+        Column('Identifiant', 'username'),
+        Column('Nom', 'first_name', 'last_name', format=full_name),
+        Column('Email', 'email'),
+        Column('Téléphone', 'phone'),
+        Column('Appartement', 'apartment'),
+        Column('Actif', 'is_active', format=yes_no),
+        Column('Inscrit le', 'date_joined'),
+        Column('Total dû (DH)', 'status__total_due'),
+        Column('Total payé (DH)', 'status__total_paid'),
+    ],
+    'rapports': [
+        Column('N°', 'pk'),
+        Column('Titre', 'title'),
+        Column('Catégorie', 'category', format=choice(ResidentReport.REPORT_CATEGORIES)),
+        Column('Statut', 'status', format=choice(ResidentReport.STATUS)),
+        Column('Résident', 'resident__first_name', 'resident__last_name', format=full_name),
+        Column('Appartement', 'resident__apartment'),
+        Column('Localisation', 'location'),
+        Column('Créé le', 'created_at'),
+    ],
+}
+
+
+# ==================== CSV ====================
+
+class Echo:
+    """Pseudo-fichier : ``csv.writer`` renvoie la ligne écrite au lieu de la garder"""
+
+    def write(self, value):
+        return value
+
+
+def csv_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%d/%m/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, Decimal):
+        # Virgule décimale, comme l'attend un tableur français
+        return str(value).replace('.', ',')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Texte saisi par un utilisateur : jamais interprété comme une formule par le tableur
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, records):
+    writer = csv.writer(Echo(), delimiter=';')
+    # BOM : Excel reconnaît alors l'UTF-8
+    yield '\ufeff' + writer.writerow([column.header for column in columns])
+    for record in records:
+        yield writer.writerow([csv_text(value) for value in record])
+
+
+# ==================== XLSX ====================
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# Styles : 0 normal, 1 en-tête en gras, 2 date, 3 date et heure
+STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+</cellXfs>
+</styleSheet>"""
+
+SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+SHEET_END = "</sheetData></worksheet>"
+
+EPOCH = datetime(1899, 12, 30)
+
+# Caractères de contrôle interdits en XML 1.0
+INVALID_XML = dict.fromkeys(code for code in range(32) if code not in (9, 10, 13))
+
+
+def xlsx_cell(value, style=0):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        serial = (value - EPOCH).total_seconds() / 86400
+        return f'<c s="3"><v>{serial:.6f}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="2"><v>{(value - EPOCH.date()).days}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(str(value).translate(INVALID_XML))
+    style = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class Pipe:
+    """Sortie non positionnable : ``zipfile`` y écrit, le générateur vide ce qui a été écrit"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def stream_xlsx(columns, records, sheet_name='Export'):
+    pipe = Pipe()
+    with zipfile.ZipFile(pipe, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', STYLES)
+        yield pipe.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(SHEET_START.encode())
+            header = ''.join(xlsx_cell(column.header, style=1) for column in columns)
+            sheet.write(f'<row>{header}</row>'.encode())
+            for record in records:
+                sheet.write(('<row>' + ''.join(xlsx_cell(value) for value in record) + '</row>').encode())
+                if pipe.size >= FLUSH_SIZE:
+                    yield pipe.drain()
+            sheet.write(SHEET_END.encode())
+    yield pipe.drain()
+
+
+# ==================== RÉPONSE ====================
+
+def export_response(queryset, columns, name, file_format):
+    """Réponse en flux ; ``file_format`` vaut 'csv' ou 'xlsx'"""
+    records = rows(queryset, columns)
+    if file_format == 'xlsx':
+        content = stream_xlsx(columns, records, sheet_name=name.capitalize())
+    else:
+        file_format = 'csv'
+        content = stream_csv(columns, records)
+    response = StreamingHttpResponse(content, content_type=FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{name}_{timezone.localdate():%Y%m%d}.{file_format}"'
+    # Pas de tampon côté proxy : les octets partent dès qu'ils sont produits
+    response['X-Accel-Buffering'] = 'no'
+    return response
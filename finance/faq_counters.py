@@ -0,0 +1,115 @@
+"""Compteurs des FAQ de l'assistant (utilisations, avis utile / pas utile), écrits en différé.
+
+Avec un cache partagé entre processus (Redis, Memcached, base de données),
+chaque réponse automatique ou avis incrémente un compteur dans le cache
+(``cache.incr``, atomique) au lieu de réécrire la ligne de la FAQ, très
+sollicitée. ``flush`` reporte les compteurs en attente en base, un
+``UPDATE ... SET usage_count = usage_count + n`` par FAQ ; elle est lancée par
+le planificateur (``flush_faq_counters``) et, au plus une fois par
+``CHATBOT_FAQ_COUNTER_FLUSH_SECONDS``, par les requêtes qui comptent.
+
+Avec un cache propre à chaque processus (``LocMemCache``, cache par défaut de
+Django) ou sans cache, le planificateur ne verrait jamais les compteurs des
+processus web : chaque événement est alors écrit directement en base et la
+tâche ``flush_faq_counters`` n'est pas planifiée.
+
+Les compteurs en attente sont perdus si le cache est vidé avant le report :
+ce sont des statistiques d'usage, pas des données comptables.
+
+La liste des FAQ populaires (chips de l'assistant, suggestions) est servie
+depuis le cache, recalculée après chaque report et au plus tard après
+``CHATBOT_FAQ_COUNTER_FLUSH_SECONDS`` (FAQ modifiée ou désactivée).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import ChatbotFAQ
+
+FIELDS = ['usage_count', 'helpful_count', 'not_helpful_count']
+
+FLUSH_LOCK_KEY = 'chatbot:faq:flush-lock'
+FLUSH_DUE_KEY = 'chatbot:faq:flush-due'
+POPULAR_KEY = 'chatbot:faq:popular'
+POPULAR_LIMIT = 6
+
+# Caches propres à chaque processus : les compteurs n'y seraient pas vus par le planificateur
+LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def flush_seconds():
+    return getattr(settings, 'CHATBOT_FAQ_COUNTER_FLUSH_SECONDS', 60)
+
+
+def buffered():
+    """Compteurs tenus dans le cache : seulement si le cache par défaut est partagé entre processus"""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES
+
+
+def counter_key(field, faq_id):
+    return f"chatbot:faq:{field}:{faq_id}"
+
+
+def record(faq_id, field):
+    """Compter un événement pour la FAQ (``field`` : un des ``FIELDS``)"""
+    if not buffered():
+        ChatbotFAQ.objects.filter(pk=faq_id).update(**{field: F(field) + 1})
+        return
+    key = counter_key(field, faq_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+    if cache.add(FLUSH_DUE_KEY, 1, flush_seconds()):
+        flush()
+
+
+def pending():
+    """{(pk, champ): nombre} des compteurs pas encore reportés"""
+    keys = {
+        counter_key(field, pk): (pk, field)
+        for pk in ChatbotFAQ.objects.values_list('pk', flat=True)
+        for field in FIELDS
+    }
+    return {keys[key]: count for key, count in cache.get_many(list(keys)).items() if count}
+
+
+def flush():
+    """Reporter les compteurs en attente en base. Retourne le nombre de FAQ mises à jour."""
+    if not cache.add(FLUSH_LOCK_KEY, 1, 300):
+        return 0
+    try:
+        taken = pending()
+        # Les incréments arrivés entre la lecture et la décrémentation restent en attente
+        for (pk, field), count in taken.items():
+            cache.decr(counter_key(field, pk), count)
+        updates = {}
+        for (pk, field), count in taken.items():
+            updates.setdefault(pk, {})[field] = F(field) + count
+        try:
+            with transaction.atomic():
+                for pk, values in updates.items():
+                    ChatbotFAQ.objects.filter(pk=pk).update(**values)
+        except Exception:
+            for (pk, field), count in taken.items():
+                cache.incr(counter_key(field, pk), count)
+            raise
+        if updates:
+            cache.delete(POPULAR_KEY)
+        return len(updates)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def popular(limit=POPULAR_LIMIT):
+    """FAQ actives les plus utilisées (au plus ``POPULAR_LIMIT``), depuis le cache"""
+    faqs = cache.get(POPULAR_KEY)
+    if faqs is None:
+        faqs = list(ChatbotFAQ.objects.filter(is_active=True).order_by('-usage_count', '-created_at')[:POPULAR_LIMIT])
+        cache.set(POPULAR_KEY, faqs, flush_seconds())
+    return faqs[:limit]
@@ -0,0 +1,155 @@
+"""Détection de la FAQ qui répond à un message de l'assistant virtuel.
+
+Règle de score : pour chaque FAQ active, somme des longueurs de ses mots-clés
+(séparés par des virgules, sans tenir compte de la casse) présents dans le
+message ; la meilleure FAQ l'emporte à partir de ``MIN_SCORE``, la première
+dans l'ordre du modèle en cas d'égalité.
+
+Tous les mots-clés sont compilés en un automate d'Aho–Corasick, construit une
+fois par processus : un message est parcouru une seule fois, quel que soit le
+nombre de FAQ, sans requête. L'automate est reconstruit quand la version des
+FAQ change, c'est-à-dire à chaque création, modification ou suppression d'une
+FAQ (hors compteurs d'utilisation et d'avis). La version est lue en base
+(nombre de FAQ, plus grande clé, dernière modification), au plus une fois par
+``CHATBOT_FAQ_REFRESH_SECONDS`` et par processus : une modification faite par
+un autre processus est prise en compte après ce délai au plus, sans dépendre
+d'un cache partagé.
+
+L'ordre des égalités est figé à la construction : une FAQ qui gagne des
+utilisations ne passe devant une autre de même score qu'à la reconstruction
+suivante.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import ChatbotFAQ
+
+MIN_SCORE = 3
+
+_lock = threading.Lock()
+_matcher = (None, None)  # (version, FAQMatcher)
+_version = (None, 0.0)  # (version, instant de la lecture)
+
+
+def refresh_seconds():
+    return getattr(settings, 'CHATBOT_FAQ_REFRESH_SECONDS', 10)
+
+
+class KeywordAutomaton:
+    """Automate d'Aho–Corasick : indices des motifs présents dans un texte"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = child
+                node = child
+            self.output[node].append(index)
+
+        # Liens d'échec en largeur : le plus long suffixe propre qui est aussi un préfixe
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            if self.output[node]:
+                found.update(self.output[node])
+        return found
+
+
+class FAQMatcher:
+    """FAQ actives et leurs mots-clés compilés"""
+
+    def __init__(self, faqs):
+        self.faqs = list(faqs)
+        # mot-clé -> {rang de la FAQ: poids} ; un mot-clé répété dans une FAQ compte autant de fois
+        weights = {}
+        for rank, faq in enumerate(self.faqs):
+            for keyword in faq.keywords.split(','):
+                keyword = keyword.strip().lower()
+                if keyword:
+                    by_faq = weights.setdefault(keyword, {})
+                    by_faq[rank] = by_faq.get(rank, 0) + len(keyword)
+        self.weights = list(weights.values())
+        self.automaton = KeywordAutomaton(weights)
+
+    def match(self, message):
+        """(FAQ, score) la mieux notée pour ce message, ou None"""
+        scores = defaultdict(int)
+        for index in self.automaton.find(message.lower()):
+            for rank, weight in self.weights[index].items():
+                scores[rank] += weight
+        if not scores:
+            return None
+        rank = min(scores, key=lambda rank: (-scores[rank], rank))
+        return self.faqs[rank], scores[rank]
+
+
+def current_version():
+    """Version des FAQ en base, relue au plus une fois par ``CHATBOT_FAQ_REFRESH_SECONDS``"""
+    global _version
+    version, read_at = _version
+    now = time.monotonic()
+    if version is None or now - read_at >= refresh_seconds():
+        row = ChatbotFAQ.objects.aggregate(count=Count('pk'), last_pk=Max('pk'), last_update=Max('updated_at'))
+        last_update = row['last_update'].timestamp() if row['last_update'] else 0
+        version = f"{row['count']}-{row['last_pk'] or 0}-{last_update}"
+        _version = (version, now)
+    return version
+
+
+def invalidate():
+    """Relire la version des FAQ dès la prochaine demande de ce processus (après validation de la transaction)"""
+    def expire():
+        global _version
+        _version = (None, 0.0)
+    transaction.on_commit(expire)
+
+
+def get_matcher():
+    global _matcher
+    version = current_version()
+    built, matcher = _matcher
+    if matcher is None or built != version:
+        with _lock:
+            built, matcher = _matcher
+            if matcher is None or built != version:
+                matcher = FAQMatcher(ChatbotFAQ.objects.filter(is_active=True).order_by(*ChatbotFAQ._meta.ordering, 'pk'))
+                _matcher = (version, matcher)
+    return matcher
+
+
+def find_answer(message):
+    """Réponse automatique au message : {'faq', 'answer', 'score'} ou None"""
+    found = get_matcher().match(message)
+    if found is None or found[1] < MIN_SCORE:
+        return None
+    faq, score = found
+    return {'faq': faq, 'answer': faq.answer, 'score': score}
@@ -0,0 +1,173 @@
+"""Recherche approchée des FAQ de l'assistant, tolérante aux accents et aux fautes de frappe.
+
+Complète la détection par mots-clés (``faq_matcher``) quand aucun mot-clé
+n'apparaît dans le message : « paiment », « charges copro » ou une question
+formulée autrement que les mots-clés.
+
+Chaque champ des FAQ actives (question, mots-clés, réponse) a sa matrice
+TF-IDF de n-grammes de caractères (3 et 4 lettres, mots entourés d'espaces),
+en minuscules et sans accents, une ligne normalisée par FAQ. Un message est
+noté par un produit par champ avec ses n-grammes (vecteur creux) ; le score
+d'une FAQ est le meilleur cosinus de ses champs, pondéré selon
+``FIELD_WEIGHTS`` (0,6 pour la réponse). Noter les champs séparément évite
+qu'une longue réponse dilue la question et les mots-clés : « paiment en
+retard » obtient 0,23 avec « Comment effectuer un paiement ? » (mots-clés
+paiement, payer, virement), contre 0,13 avec un seul vecteur par FAQ.
+
+Les matrices sont reconstruites quand la version des FAQ change (la même que
+pour l'automate des mots-clés, lue en base) ; seules les FAQ modifiées
+depuis sont redécoupées en n-grammes.
+
+NumPy est facultatif : sans lui, ou avec ``CHATBOT_FAQ_RETRIEVAL = False``,
+seule la détection par mots-clés est utilisée.
+"""
+import math
+import threading
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from django.conf import settings
+
+from .faq_matcher import current_version
+from .models import ChatbotFAQ
+from .search import TERM, fold
+
+NGRAM_SIZES = (3, 4)
+
+# Champs notés séparément et poids de leur cosinus dans le score de la FAQ
+FIELD_WEIGHTS = [('question', 1.0), ('keywords', 1.0), ('answer', 0.6)]
+
+_lock = threading.Lock()
+_index = None
+_version = None
+
+
+def enabled():
+    return np is not None and getattr(settings, 'CHATBOT_FAQ_RETRIEVAL', True)
+
+
+def min_score():
+    return getattr(settings, 'CHATBOT_FAQ_MIN_SCORE', 0.2)
+
+
+def ngrams(text):
+    """n-grammes de caractères du texte plié, chaque mot entouré d'espaces"""
+    grams = Counter()
+    for word in TERM.findall(fold(text)):
+        padded = f' {word} '
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                grams[padded[start:start + size]] += 1
+    return grams
+
+
+def faq_ngrams(faq):
+    """{champ: n-grammes} de la FAQ"""
+    return {field: ngrams(getattr(faq, field).replace(',', ' ')) for field, _ in FIELD_WEIGHTS}
+
+
+class FieldMatrix:
+    """Matrice TF-IDF d'un champ des FAQ (une ligne normalisée par FAQ)"""
+
+    def __init__(self, counters):
+        self.size = len(counters)
+        self.vocabulary = {}
+        rows, columns, counts = [], [], []
+        for row, grams in enumerate(counters):
+            for gram, count in grams.items():
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(gram, len(self.vocabulary)))
+                counts.append(count)
+
+        tf = np.zeros((self.size, len(self.vocabulary)), dtype=np.float32)
+        tf[rows, columns] = 1 + np.log(np.asarray(counts, dtype=np.float32))
+        df = np.count_nonzero(tf, axis=0)
+        self.idf = (np.log((1 + self.size) / (1 + df)) + 1).astype(np.float32)
+        matrix = tf * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def scores(self, grams):
+        """Cosinus du message (ses n-grammes) avec chaque FAQ"""
+        columns, weights = [], []
+        unknown = 0.0
+        # n-gramme absent du champ dans toutes les FAQ : le plus rare possible, il ne compte que dans la norme
+        rarest = math.log(1 + self.size) + 1
+        for gram, count in grams.items():
+            weight = 1 + math.log(count)
+            column = self.vocabulary.get(gram)
+            if column is None:
+                unknown += (weight * rarest) ** 2
+            else:
+                columns.append(column)
+                weights.append(weight)
+        if not columns:
+            return np.zeros(self.size, dtype=np.float32)
+        weights = np.asarray(weights, dtype=np.float32) * self.idf[columns]
+        norm = math.sqrt(float(weights @ weights) + unknown)
+        return (self.matrix[:, columns] @ weights) / norm
+
+
+class FAQIndex:
+    """Matrices TF-IDF des champs des FAQ actives
+
+    ``previous`` : index précédent, dont les n-grammes des FAQ non modifiées
+    sont repris ; ``changed`` : nombre de FAQ redécoupées.
+    """
+
+    def __init__(self, faqs, previous=None):
+        self.faqs = list(faqs)
+        known_grams = previous.grams if previous is not None else {}
+        self.grams, self.changed = {}, 0  # pk -> (updated_at, {champ: Counter})
+        for faq in self.faqs:
+            known = known_grams.get(faq.pk)
+            if known is None or known[0] != faq.updated_at:
+                known = (faq.updated_at, faq_ngrams(faq))
+                self.changed += 1
+            self.grams[faq.pk] = known
+        self.fields = [
+            (FieldMatrix([self.grams[faq.pk][1][field] for faq in self.faqs]), weight)
+            for field, weight in FIELD_WEIGHTS
+        ]
+
+    @property
+    def size(self):
+        """Nombre de n-grammes distincts, tous champs confondus"""
+        return sum(len(matrix.vocabulary) for matrix, _ in self.fields)
+
+    def search(self, message, top_k=3):
+        """[(FAQ, score)] des ``top_k`` FAQ les plus proches du message, score décroissant (0 à 1)"""
+        grams = ngrams(message)
+        if not grams or not self.faqs:
+            return []
+        scores = np.max([matrix.scores(grams) * weight for matrix, weight in self.fields], axis=0)
+        best = np.argsort(-scores, kind='stable')[:top_k]
+        return [(self.faqs[row], float(scores[row])) for row in best if scores[row] > 0]
+
+
+def get_index():
+    global _index, _version
+    version = current_version()
+    if _index is None or _version != version:
+        with _lock:
+            if _index is None or _version != version:
+                faqs = ChatbotFAQ.objects.filter(is_active=True).order_by(*ChatbotFAQ._meta.ordering, 'pk')
+                _index, _version = FAQIndex(faqs, _index), version
+    return _index
+
+
+def search(message, top_k=3):
+    return get_index().search(message, top_k) if enabled() else []
+
+
+def find_answer(message):
+    """Réponse automatique au message : {'faq', 'answer', 'score'} ou None sous ``CHATBOT_FAQ_MIN_SCORE``"""
+    results = search(message, top_k=1)
+    if not results or results[0][1] < min_score():
+        return None
+    faq, score = results[0]
+    return {'faq': faq, 'answer': faq.answer, 'score': score}
@@ -0,0 +1,126 @@
+"""Variantes réduites des justificatifs de paiement et photos de signalement.
+
+Les originaux (photos de téléphone de plusieurs Mo) ne sont plus servis dans
+les listes : chaque image enregistrée est mise en file (``ImageDerivative``)
+et ``build_image_derivatives``, lancée par le planificateur, produit hors
+requête une miniature et une version moyenne en WebP et JPEG, sans
+métadonnées EXIF, à côté de l'original. Le gabarit ``{% picture %}`` sert
+la variante adaptée avec ``srcset`` / ``sizes`` et revient à l'original tant
+que les variantes ne sont pas prêtes.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImageDerivative
+
+# Largeur maximale (px) de chaque variante
+VARIANTS = {
+    'thumb': 320,
+    'medium': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+MAX_ATTEMPTS = 3
+
+
+def enqueue(*names):
+    """Mettre des images en file, une fois la transaction validée"""
+    names = {name for name in names if name}
+    if not names:
+        return
+    transaction.on_commit(lambda: ImageDerivative.objects.bulk_create(
+        [ImageDerivative(source=name) for name in names], ignore_conflicts=True
+    ))
+
+
+def derivative_name(source, variant, extension):
+    root, _ = os.path.splitext(source)
+    return f"{root}__{variant}.{extension}"
+
+
+def build(record, storage=default_storage):
+    """Produire les variantes d'une image et marquer l'entrée prête (ou en échec)"""
+    try:
+        with storage.open(record.source, 'rb') as source:
+            image = Image.open(source)
+            # Décodage JPEG réduit directement à la taille utile
+            image.draft('RGB', (max(VARIANTS.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+                image = background
+
+            variants = {}
+            for variant, width in VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((width, width), Image.LANCZOS)
+                entry = {'width': resized.width, 'height': resized.height}
+                for extension, (pil_format, options) in FORMATS.items():
+                    name = derivative_name(record.source, variant, extension)
+                    buffer = BytesIO()
+                    # Image neuve : aucune métadonnée EXIF n'est recopiée
+                    resized.save(buffer, pil_format, **options)
+                    if storage.exists(name):
+                        storage.delete(name)
+                    entry[extension] = storage.save(name, ContentFile(buffer.getvalue()))
+                variants[variant] = entry
+    except Exception as e:
+        attempts = record.attempts + 1
+        ImageDerivative.objects.filter(pk=record.pk).update(
+            attempts=F('attempts') + 1,
+            last_error=str(e)[:1000],
+            status='FAILED' if attempts >= MAX_ATTEMPTS else 'PENDING',
+        )
+        return False
+
+    ImageDerivative.objects.filter(pk=record.pk).update(
+        status='READY', variants=variants, attempts=F('attempts') + 1,
+        last_error='', processed_at=timezone.now(),
+    )
+    return True
+
+
+def attach_variants(objects, field_name):
+    """Charger en une requête les variantes des images d'une page d'objets"""
+    objects = list(objects)
+    names = {getattr(obj, field_name).name for obj in objects if getattr(obj, field_name)}
+    variants = dict(
+        ImageDerivative.objects.filter(source__in=names, status='READY').values_list('source', 'variants')
+    ) if names else {}
+    for obj in objects:
+        obj._image_variants = variants
+    return objects
+
+
+def variants_for(file):
+    """Variantes prêtes d'un fichier, depuis ``attach_variants`` ou la base"""
+    cache = getattr(file.instance, '_image_variants', None)
+    if cache is not None:
+        return cache.get(file.name)
+    return (
+        ImageDerivative.objects.filter(source=file.name, status='READY')
+        .values_list('variants', flat=True)
+        .first()
+    )
+
+
+def discard(source, storage=default_storage):
+    """Supprimer les variantes d'une image qui n'existe plus"""
+    for record in ImageDerivative.objects.filter(source=source):
+        for entry in (record.variants or {}).values():
+            for extension in FORMATS:
+                if entry.get(extension):
+                    storage.delete(entry[extension])
+        record.delete()
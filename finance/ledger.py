@@ -0,0 +1,332 @@
+"""Grand livre des comptes résidents (partie double, en ajout seul).
+
+Les documents débitent le compte copropriétaire (411) par le crédit des
+charges appelées (701) ; les paiements le créditent par le débit de la
+banque / caisse (512). Les modifications et suppressions de pièces ne
+réécrivent jamais une écriture : elles passent une écriture d'ajustement ou
+d'extourne pour la différence.
+
+Le solde courant de chaque résident est tenu dans ``ResidentStatus`` à chaque
+écriture ; les soldes à une date passée partent du dernier arrêté mensuel
+(``LedgerCheckpoint``) et n'additionnent que les écritures postérieures.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Document, LedgerCheckpoint, LedgerEntry, ResidentStatus
+
+RECEIVABLE = LedgerEntry.RECEIVABLE
+
+
+def post_entry(resident_id, kind, debit_account, credit_account, amount, entry_date=None,
+               description='', document_id=None, payment_id=None, reversal_of=None, created_by=None):
+    """Passer une écriture et mettre à jour le solde courant du résident"""
+    amount = Decimal(amount)
+    if not amount:
+        return None
+    if amount < 0:
+        debit_account, credit_account, amount = credit_account, debit_account, -amount
+    entry_date = entry_date or timezone.localdate()
+
+    debit = amount if debit_account == RECEIVABLE else Decimal('0')
+    credit = amount if credit_account == RECEIVABLE else Decimal('0')
+
+    with transaction.atomic():
+        ResidentStatus.objects.get_or_create(resident_id=resident_id)
+        status = ResidentStatus.objects.select_for_update().get(resident_id=resident_id)
+        status.total_due += debit
+        status.total_paid += credit
+        ResidentStatus.objects.filter(pk=status.pk).update(
+            total_due=status.total_due, total_paid=status.total_paid, last_updated=timezone.now()
+        )
+
+        entry = LedgerEntry.objects.create(
+            resident_id=resident_id,
+            kind=kind,
+            debit_account=debit_account,
+            credit_account=credit_account,
+            amount=amount,
+            entry_date=entry_date,
+            description=description[:255],
+            document_id=document_id,
+            payment_id=payment_id,
+            reversal_of=reversal_of,
+            balance_after=status.balance,
+            created_by=created_by,
+        )
+
+        # Une écriture antidatée invalide les arrêtés qui la suivent
+        if debit or credit:
+            LedgerCheckpoint.objects.filter(resident_id=resident_id, as_of__gte=entry_date).delete()
+    return entry
+
+
+def reverse_entry(entry, description='', created_by=None):
+    """Extourner une écriture (écriture inverse du même montant)"""
+    return post_entry(
+        entry.resident_id, 'REVERSAL', entry.credit_account, entry.debit_account, entry.amount,
+        description=description or f"Extourne de l'écriture #{entry.pk}",
+        document_id=entry.document_id, payment_id=entry.payment_id,
+        reversal_of=entry, created_by=created_by,
+    )
+
+
+def post_adjustment(resident_id, amount, description, created_by=None):
+    """Ajustement manuel du solde (montant positif = le résident doit plus)"""
+    return post_entry(
+        resident_id, 'ADJUSTMENT', RECEIVABLE, LedgerEntry.ADJUSTMENTS, amount,
+        description=description, created_by=created_by,
+    )
+
+
+def posted_balances(**link):
+    """Effet net déjà comptabilisé pour une pièce, par résident"""
+    rows = (
+        LedgerEntry.objects.filter(**link)
+        .order_by()
+        .values('resident_id')
+        .annotate(
+            debit=Sum('amount', filter=Q(debit_account=RECEIVABLE)),
+            credit=Sum('amount', filter=Q(credit_account=RECEIVABLE)),
+        )
+    )
+    return {row['resident_id']: (row['debit'] or 0) - (row['credit'] or 0) for row in rows}
+
+
+def sync_postings(kind, counter_account, desired, entry_date, description, **link):
+    """Passer les écritures qui amènent le net comptabilisé d'une pièce à ``desired``.
+
+    ``desired`` est un dictionnaire {resident_id: effet sur le solde}.
+    """
+    posted = posted_balances(**link)
+    entries = []
+    for resident_id in set(desired) | set(posted):
+        target = desired.get(resident_id, Decimal('0'))
+        current = posted.get(resident_id, Decimal('0'))
+        difference = target - current
+        if not difference:
+            continue
+        if not current:
+            entry_kind, when, label = kind, entry_date, description
+        elif not target:
+            entry_kind, when, label = 'REVERSAL', None, f"Extourne - {description}"
+        else:
+            entry_kind, when, label = 'ADJUSTMENT', None, f"Ajustement - {description}"
+        entries.append(post_entry(
+            resident_id, entry_kind, RECEIVABLE, counter_account, difference,
+            entry_date=when, description=label, **link
+        ))
+    return entries
+
+
+def sync_document(document, deleted=False):
+    """Comptabiliser l'émission (ou la modification / suppression) d'un document"""
+    desired = {}
+    if not deleted and document.payment_term_days(document.document_type) is not None:
+        desired[document.resident_id] = document.amount
+    return sync_postings(
+        'DOCUMENT', LedgerEntry.INCOME, desired, document.date,
+        f"Document #{document.pk}: {document.title}", document_id=document.pk,
+    )
+
+
+def sync_payment(payment, deleted=False):
+    """Comptabiliser un paiement (ou sa modification / suppression)"""
+    desired = {}
+    if not deleted and payment.document_id and not payment.is_rejected:
+        desired[payment.document.resident_id] = -payment.amount
+    return sync_postings(
+        'PAYMENT', LedgerEntry.CASH, desired, payment.payment_date,
+        f"Paiement #{payment.pk}", payment_id=payment.pk,
+    )
+
+
+def post_entries(entries):
+    """Passer en une fois des écritures non sauvegardées (pièces créées par ``bulk_create``).
+
+    Verrouille les comptes concernés, crée les écritures en un ``bulk_create``
+    et met à jour les soldes courants en un ``bulk_update``.
+    """
+    if not entries:
+        return []
+    resident_ids = {entry.resident_id for entry in entries}
+
+    with transaction.atomic():
+        ResidentStatus.objects.bulk_create(
+            [ResidentStatus(resident_id=resident_id) for resident_id in resident_ids], ignore_conflicts=True
+        )
+        statuses = {
+            status.resident_id: status
+            for status in ResidentStatus.objects.select_for_update().filter(resident_id__in=resident_ids)
+        }
+
+        earliest = {}
+        for entry in entries:
+            status = statuses[entry.resident_id]
+            if entry.debit_account == RECEIVABLE:
+                status.total_due += Decimal(entry.amount)
+            if entry.credit_account == RECEIVABLE:
+                status.total_paid += Decimal(entry.amount)
+            entry.balance_after = status.balance
+            earliest[entry.resident_id] = min(earliest.get(entry.resident_id, entry.entry_date), entry.entry_date)
+
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+        now = timezone.now()
+        for status in statuses.values():
+            status.last_updated = now
+        ResidentStatus.objects.bulk_update(
+            list(statuses.values()), ['total_due', 'total_paid', 'last_updated'], batch_size=1000
+        )
+
+        stale = Q()
+        for resident_id, day in earliest.items():
+            stale |= Q(resident_id=resident_id, as_of__gte=day)
+        LedgerCheckpoint.objects.filter(stale).delete()
+    return entries
+
+
+def record_payments(payments, reverse=False):
+    """Comptabiliser en une fois des paiements créés par ``bulk_create`` (sans signaux).
+
+    Avec ``reverse``, passe au jour même l'extourne de paiements refusés à la
+    vérification.
+    """
+    payments = [payment for payment in payments if payment.document_id and payment.amount]
+    if not payments:
+        return []
+    residents = dict(
+        Document.objects.filter(pk__in={payment.document_id for payment in payments}).values_list('pk', 'resident_id')
+    )
+
+    today = timezone.localdate()
+    entries = []
+    for payment in payments:
+        if reverse:
+            kind, debit_account, credit_account = 'REVERSAL', RECEIVABLE, LedgerEntry.CASH
+            entry_date, description = today, f"Rejet du paiement #{payment.pk}"
+        else:
+            kind, debit_account, credit_account = 'PAYMENT', LedgerEntry.CASH, RECEIVABLE
+            entry_date, description = payment.payment_date, f"Paiement #{payment.pk}"
+        entries.append(LedgerEntry(
+            resident_id=residents[payment.document_id],
+            kind=kind,
+            debit_account=debit_account,
+            credit_account=credit_account,
+            amount=payment.amount,
+            entry_date=entry_date,
+            description=description,
+            payment_id=payment.pk,
+        ))
+    return post_entries(entries)
+
+
+def record_documents(documents):
+    """Comptabiliser en une fois des documents créés par ``bulk_create`` (sans signaux)"""
+    entries = [
+        LedgerEntry(
+            resident_id=document.resident_id,
+            kind='DOCUMENT',
+            debit_account=RECEIVABLE,
+            credit_account=LedgerEntry.INCOME,
+            amount=document.amount,
+            entry_date=document.date,
+            description=f"Document #{document.pk}: {document.title}"[:255],
+            document_id=document.pk,
+        )
+        for document in documents
+        if document.amount > 0 and Document.payment_term_days(document.document_type) is not None
+    ]
+    return post_entries(entries)
+
+
+# ==================== SOLDES À DATE ====================
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def balance_as_of(resident_id, as_of):
+    """Solde du résident à la fin de la journée ``as_of``"""
+    checkpoint = (
+        LedgerCheckpoint.objects.filter(resident_id=resident_id, as_of__lte=as_of)
+        .order_by('-as_of')
+        .first()
+    )
+    entries = LedgerEntry.objects.filter(resident_id=resident_id, entry_date__lte=as_of)
+    balance = Decimal('0')
+    if checkpoint:
+        entries = entries.filter(entry_date__gt=checkpoint.as_of)
+        balance = checkpoint.balance
+    totals = entries.aggregate(
+        debit=Sum('amount', filter=Q(debit_account=RECEIVABLE)),
+        credit=Sum('amount', filter=Q(credit_account=RECEIVABLE)),
+    )
+    return balance + (totals['debit'] or 0) - (totals['credit'] or 0)
+
+
+def build_checkpoints(until=None):
+    """Créer les arrêtés mensuels manquants jusqu'au dernier mois clos.
+
+    Retourne le nombre d'arrêtés créés.
+    """
+    until = until or timezone.localdate()
+    last_closed = until.replace(day=1) - timedelta(days=1)
+
+    # Reprendre au premier mois sans arrêté, tous résidents confondus
+    latest = dict(
+        LedgerCheckpoint.objects.order_by().values('resident_id').annotate(last=Max('as_of')).values_list('resident_id', 'last')
+    )
+    first_entries = dict(
+        LedgerEntry.objects.order_by().values('resident_id').annotate(first=Min('entry_date')).values_list('resident_id', 'first')
+    )
+    starts = []
+    for resident_id, first in first_entries.items():
+        if resident_id in latest:
+            starts.append(latest[resident_id] + timedelta(days=1))
+        else:
+            starts.append(first.replace(day=1))
+    if not starts:
+        return 0
+    start = min(starts).replace(day=1)
+    if start > last_closed:
+        return 0
+
+    # Soldes de départ : arrêtés du mois précédent
+    totals = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    for resident_id, debit, credit in LedgerCheckpoint.objects.filter(
+        as_of=start - timedelta(days=1)
+    ).values_list('resident_id', 'total_debit', 'total_credit'):
+        totals[resident_id] = [debit, credit]
+
+    created = 0
+    month_start = start
+    while month_start <= last_closed:
+        as_of = month_end(month_start)
+        rows = (
+            LedgerEntry.objects.filter(entry_date__gte=month_start, entry_date__lte=as_of)
+            .order_by()
+            .values('resident_id')
+            .annotate(
+                debit=Sum('amount', filter=Q(debit_account=RECEIVABLE)),
+                credit=Sum('amount', filter=Q(credit_account=RECEIVABLE)),
+            )
+        )
+        for row in rows:
+            totals[row['resident_id']][0] += row['debit'] or 0
+            totals[row['resident_id']][1] += row['credit'] or 0
+
+        checkpoints = [
+            LedgerCheckpoint(resident_id=resident_id, as_of=as_of, total_debit=debit, total_credit=credit)
+            for resident_id, (debit, credit) in totals.items()
+            if not (resident_id in latest and latest[resident_id] >= as_of)
+        ]
+        LedgerCheckpoint.objects.bulk_create(checkpoints, batch_size=1000, ignore_conflicts=True)
+        created += len(checkpoints)
+        month_start = as_of + timedelta(days=1)
+    return created
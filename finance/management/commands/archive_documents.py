@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from finance.archive import CHUNK_SIZE, archive_after_days, archive_documents
+
+
+class Command(BaseCommand):
+    help = 'Archive par lots les documents soldés anciens et déplace leurs fichiers vers le stockage froid'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mode test - affiche les volumes sans archiver',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Nombre de documents archivés par lot',
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            default=20,
+            help='Nombre maximum de lots par exécution (0 : sans limite)',
+        )
+
+    def handle(self, *args, **options):
+        archived, moved = archive_documents(
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks'] or None,
+            dry_run=options['dry_run'],
+        )
+        prefix = "[TEST] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"🗄  {prefix}{archived} document(s) soldé(s) depuis plus de {archive_after_days()} jours archivé(s), "
+            f"{moved} fichier(s) déplacé(s) vers le stockage froid"
+        ))
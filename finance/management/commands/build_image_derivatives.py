@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from finance.images import MAX_ATTEMPTS, build
+from finance.models import ImageDerivative, Payment, ResidentReport
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Produit les variantes réduites (miniature, moyenne) des images en file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Nombre maximum d\'images traitées par exécution',
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Mettre d\'abord en file les images existantes sans variantes',
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill()
+
+        pending = ImageDerivative.objects.filter(
+            status='PENDING', attempts__lt=MAX_ATTEMPTS
+        ).order_by('created_at')[:options['limit']]
+
+        built = failed = 0
+        for record in pending:
+            if build(record):
+                built += 1
+            else:
+                failed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"🖼  {built} image(s) traitée(s), {failed} échec(s)")
+        )
+
+    def backfill(self):
+        """Mettre en file, par lots, les justificatifs et photos existants"""
+        queued = 0
+        sources = [
+            Payment.objects.exclude(payment_proof='').exclude(payment_proof__isnull=True).values_list('payment_proof', flat=True),
+            ResidentReport.objects.exclude(photo='').exclude(photo__isnull=True).values_list('photo', flat=True),
+        ]
+        for names in sources:
+            batch = []
+            for name in names.iterator(chunk_size=CHUNK_SIZE):
+                batch.append(ImageDerivative(source=name))
+                if len(batch) >= CHUNK_SIZE:
+                    queued += len(ImageDerivative.objects.bulk_create(batch, ignore_conflicts=True))
+                    batch = []
+            queued += len(ImageDerivative.objects.bulk_create(batch, ignore_conflicts=True))
+        self.stdout.write(f"📥 {queued} image(s) examinée(s) pour la file")
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from finance.ledger import build_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Crée les arrêtés de solde mensuels manquants du grand livre'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help="Date de référence (AAAA-MM-JJ) : arrêtés jusqu'au mois clos précédent",
+        )
+
+    def handle(self, *args, **options):
+        created = build_checkpoints(options['until'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {created} arrêtés de solde créés')
+        )
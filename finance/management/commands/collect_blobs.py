@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from finance.blobs import collect_garbage, import_legacy_files, recount
+
+
+class Command(BaseCommand):
+    help = 'Supprime les fichiers du stockage adressé par contenu qui ne sont plus référencés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mode test - affiche les volumes sans supprimer',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recalculer d\'abord tous les compteurs de références depuis les tables',
+        )
+        parser.add_argument(
+            '--import-legacy',
+            action='store_true',
+            help='Reprendre d\'abord les fichiers stockés sous leur nom d\'origine (dédoublonnage)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['import_legacy']:
+            imported, freed = import_legacy_files(dry_run=dry_run)
+            self.stdout.write(f"📦 {imported} ancien(s) fichier(s) repris, {filesizeformat(freed)} libéré(s) par dédoublonnage")
+        if options['recount'] and not dry_run:
+            self.stdout.write(f"🔢 {recount()} compteur(s) corrigé(s)")
+
+        stats = collect_garbage(dry_run=dry_run)
+        prefix = "[TEST] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 {prefix}{stats['removed'] + stats['orphans']} fichier(s) supprimé(s) "
+            f"({filesizeformat(stats['freed_bytes'])}), {stats['temporary']} fichier(s) temporaire(s), "
+            f"{stats['repaired']} compteur(s) corrigé(s)"
+        ))
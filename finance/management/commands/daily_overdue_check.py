@@ -17,6 +17,9 @@ class Command(BaseCommand):
         0 9 * * * cd /path/to/project && python manage.py daily_overdue_check
         
         Cela exécutera la vérification tous les jours à 9h du matin
+
+        La détection est aussi pilotée par le planificateur interne
+        (python manage.py run_scheduler), qui évite d'avoir à configurer cron.
         """
         
         self.stdout.write(
@@ -39,13 +39,15 @@ class Command(BaseCommand):
         
         today = timezone.now().date()
         
-        # Récupérer tous les documents non payés et non archivés
+        # Documents non payés dont l'échéance tombe dans les 7 jours ou est dépassée
+        # (les documents sans échéance, comme les avis, ne sont pas relancés)
         unpaid_documents = Document.objects.filter(
             is_paid=False,
-            is_archived=False
+            is_archived=False,
+            due_date__lte=today + timedelta(days=7)
         ).select_related('resident')
         
-        self.stdout.write(f"\n📋 {unpaid_documents.count()} documents non payés trouvés")
+        self.stdout.write(f"\n📋 {unpaid_documents.count()} documents non payés à échéance trouvés")
         
         notifications_sent = 0
         
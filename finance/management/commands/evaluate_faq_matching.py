@@ -0,0 +1,137 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import faq_retrieval
+from finance.faq_matcher import get_matcher, MIN_SCORE
+from finance.models import ChatbotFAQ, ChatbotMessage
+
+PERCENTILES = [50, 95]
+
+
+class Command(BaseCommand):
+    help = (
+        "Évalue la détection des FAQ de l'assistant (mots-clés, recherche approchée, les deux) "
+        "sur l'historique des conversations : précision, couverture et temps de réponse. Nécessite NumPy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=3, help="Rang maximal retenu pour la recherche approchée (défaut: 3)")
+        parser.add_argument('--min-score', type=float, help="Seuil de la recherche approchée (défaut: CHATBOT_FAQ_MIN_SCORE)")
+        parser.add_argument('--helpful-only', action='store_true', help="Ne garder que les réponses jugées utiles")
+        parser.add_argument('--limit', type=int, help="Nombre maximal de messages évalués")
+
+    def handle(self, *args, **options):
+        if faq_retrieval.np is None:
+            raise CommandError("NumPy est requis pour cette commande (pip install numpy)")
+        min_score = options['min_score'] if options['min_score'] is not None else faq_retrieval.min_score()
+        top_k = options['top_k']
+
+        active = set(ChatbotFAQ.objects.filter(is_active=True).values_list('pk', flat=True))
+        labelled, unanswered = self.load_history(active, options['helpful_only'], options['limit'])
+
+        self.stdout.write(self.style.SUCCESS("🤖 ÉVALUATION DE LA DÉTECTION DES FAQ"))
+        self.stdout.write('=' * 60)
+        self.stdout.write(
+            f"📋 {len(active)} FAQ actives, {len(labelled)} questions avec réponse FAQ, "
+            f"{len(unanswered)} questions sans réponse automatique"
+        )
+        if not labelled and not unanswered:
+            self.stdout.write("Aucune conversation à évaluer.")
+            return
+
+        started = time.monotonic()
+        matcher = get_matcher()
+        index = faq_retrieval.get_index()
+        self.stdout.write(f"⚙️  Automate et matrice ({index.size} n-grammes) prêts en {(time.monotonic() - started) * 1000:.0f} ms")
+
+        def keywords(message):
+            found = matcher.match(message)
+            return [found[0].pk] if found and found[1] >= MIN_SCORE else []
+
+        def retrieval(message):
+            return [faq.pk for faq, score in index.search(message, top_k) if score >= min_score]
+
+        def combined(message):
+            return keywords(message) or retrieval(message)[:1]
+
+        # Les réponses de l'historique viennent des mots-clés : leur précision est une borne haute
+        self.stdout.write("\n📊 Questions avec réponse FAQ (référence : la FAQ envoyée)")
+        for label, method in [('Mots-clés', keywords), ('Recherche approchée', retrieval), ('Combiné', combined)]:
+            self.report(label, method, labelled, top_k if method is retrieval else 1)
+
+        if unanswered:
+            self.stdout.write("\n📊 Questions restées sans réponse automatique")
+            for label, method in [('Mots-clés', keywords), ('Recherche approchée', retrieval)]:
+                answered, timings = self.run(method, unanswered)
+                self.stdout.write(
+                    f"  {label:<20} {answered:>6} / {len(unanswered)} auraient une réponse "
+                    f"({self.percent(answered, len(unanswered))}) {self.latency(timings)}"
+                )
+
+    def load_history(self, active, helpful_only, limit):
+        """([(question, FAQ envoyée)], [questions sans réponse FAQ]) à partir des conversations"""
+        labelled, unanswered = [], []
+        pending = None  # (conversation, question) en attente de la réponse suivante
+        messages = ChatbotMessage.objects.order_by('conversation_id', 'created_at', 'pk').values_list(
+            'conversation_id', 'message_type', 'content', 'faq_used_id', 'is_helpful',
+        )
+        for conversation_id, message_type, content, faq_id, is_helpful in messages.iterator(chunk_size=2000):
+            if pending and pending[0] != conversation_id:
+                unanswered.append(pending[1])
+                pending = None
+            if message_type == 'USER':
+                if pending:
+                    unanswered.append(pending[1])
+                pending = (conversation_id, content)
+            elif pending and message_type == 'FAQ':
+                useful = is_helpful if helpful_only else is_helpful is not False
+                if faq_id in active and useful:
+                    labelled.append((pending[1], faq_id))
+                pending = None
+            elif pending:
+                unanswered.append(pending[1])
+                pending = None
+            if limit and len(labelled) + len(unanswered) >= limit:
+                break
+        if pending and not (limit and len(labelled) + len(unanswered) >= limit):
+            unanswered.append(pending[1])
+        return labelled, unanswered
+
+    def run(self, method, messages):
+        answered, timings = 0, []
+        for message in messages:
+            started = time.perf_counter()
+            found = method(message)
+            timings.append(time.perf_counter() - started)
+            answered += bool(found)
+        return answered, timings
+
+    def report(self, label, method, labelled, rank):
+        if not labelled:
+            return
+        top1 = topk = answered = 0
+        timings = []
+        for message, expected in labelled:
+            started = time.perf_counter()
+            found = method(message)
+            timings.append(time.perf_counter() - started)
+            answered += bool(found)
+            top1 += found[:1] == [expected]
+            topk += expected in found[:rank]
+        total = len(labelled)
+        line = (
+            f"  {label:<20} exacte {self.percent(top1, total):>7}  réponse {self.percent(answered, total):>7}"
+        )
+        if rank > 1:
+            line += f"  top-{rank} {self.percent(topk, total):>7}"
+        self.stdout.write(f"{line}  {self.latency(timings)}")
+
+    def percent(self, count, total):
+        return f"{100 * count / total:.1f} %" if total else '-'
+
+    def latency(self, timings):
+        np = faq_retrieval.np
+        values = np.asarray(timings) * 1e6
+        parts = ', '.join(f"p{p} {np.percentile(values, p):.0f} µs" for p in PERCENTILES)
+        return f"[moy. {values.mean():.0f} µs, {parts}]"
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from finance.faq_counters import flush
+
+
+class Command(BaseCommand):
+    help = "Reporte en base les compteurs d'utilisation et d'avis des FAQ de l'assistant"
+
+    def handle(self, *args, **options):
+        updated = flush()
+        self.stdout.write(self.style.SUCCESS(f"✅ {updated} FAQ mise(s) à jour"))
@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finance.models import User
+from finance.pdf_engine import (
+    critical_documents, generate_formal_notices, generate_receipts, verified_payments_in_month,
+)
+
+
+class Command(BaseCommand):
+    help = 'Génère par lots les reçus des paiements vérifiés ou les mises en demeure des impayés critiques'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind',
+            choices=['receipts', 'notices'],
+            help='receipts : reçus des paiements vérifiés du mois ; notices : mises en demeure (90+ jours)',
+        )
+        parser.add_argument('--month', help='Mois des reçus (AAAA-MM, par défaut le mois en cours)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Nombre de processus de rendu',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénérer les reçus déjà produits',
+        )
+        parser.add_argument('--user', help='Nom d\'utilisateur du demandeur, enregistré sur le lot')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        if options['kind'] == 'receipts':
+            if options['month']:
+                try:
+                    month = datetime.strptime(options['month'], '%Y-%m').date()
+                except ValueError:
+                    raise CommandError('--month doit être au format AAAA-MM')
+            else:
+                month = timezone.localdate()
+            self.stdout.write(self.style.SUCCESS(f"🧾 REÇUS DES PAIEMENTS VÉRIFIÉS EN {month:%m/%Y}"))
+            batch = generate_receipts(
+                verified_payments_in_month(month.year, month.month),
+                user=user, workers=options['workers'], force=options['force'],
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("⚖️ MISES EN DEMEURE DES IMPAYÉS DE PLUS DE 90 JOURS"))
+            batch = generate_formal_notices(critical_documents(), user=user, workers=options['workers'])
+
+        if batch.status == 'FAILED':
+            raise CommandError(f"Échec du lot #{batch.pk} : {batch.error}")
+        for line in batch.error.splitlines():
+            self.stdout.write(self.style.ERROR(f"   ❌ {line}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Lot #{batch.pk} : {batch.generated_count}/{batch.total_count} PDF, "
+            f"{batch.failed_count} échec(s) en {batch.duration_ms / 1000:.1f} s "
+            f"({batch.documents_per_second} documents/s, {batch.workers} processus)"
+        ))
@@ -0,0 +1,82 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from finance.models import User
+from finance.pdf_engine import init_worker
+from finance.statements import generate_for_resident, year_bounds
+
+
+class Command(BaseCommand):
+    help = 'Génère (ou rafraîchit en cache) les relevés de compte PDF de tous les résidents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--year',
+            type=int,
+            help='Année du relevé de clôture (par défaut l\'année précédente)',
+        )
+        parser.add_argument('--start', help='Début de période (AAAA-MM-JJ), à la place de --year')
+        parser.add_argument('--end', help='Fin de période (AAAA-MM-JJ), à la place de --year')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Nombre de processus de génération',
+        )
+        parser.add_argument(
+            '--resident',
+            type=int,
+            action='append',
+            help='Limiter à ce(s) résident(s) (id, option répétable)',
+        )
+
+    def handle(self, *args, **options):
+        if options['start'] or options['end']:
+            try:
+                start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+                end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                raise CommandError('--start et --end doivent être fournis au format AAAA-MM-JJ')
+        else:
+            start, end = year_bounds(options['year'] or timezone.localdate().year - 1)
+
+        residents = User.objects.filter(role='RESIDENT').order_by('pk')
+        if options['resident']:
+            residents = residents.filter(pk__in=options['resident'])
+        resident_ids = list(residents.values_list('pk', flat=True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📄 RELEVÉS DU {start:%d/%m/%Y} AU {end:%d/%m/%Y} — {len(resident_ids)} résidents"
+        ))
+        started = time.monotonic()
+        generated = cached = failed = 0
+        render_ms = 0
+
+        # Les connexions ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=max(1, options['workers']), initializer=init_worker) as pool:
+            futures = [pool.submit(generate_for_resident, pk, start, end) for pk in resident_ids]
+            for future in as_completed(futures):
+                try:
+                    resident_id, path, from_cache, elapsed = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"   ❌ {e}"))
+                    continue
+                if from_cache:
+                    cached += 1
+                else:
+                    generated += 1
+                    render_ms += elapsed
+
+        duration = time.monotonic() - started
+        average = f", {render_ms // generated} ms/relevé" if generated else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {generated} générés, {cached} déjà à jour, {failed} échec(s) en {duration:.1f} s{average}"
+        ))
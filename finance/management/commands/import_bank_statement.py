@@ -0,0 +1,71 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.bank_import import DATE_WINDOW_DAYS, READERS, BankStatementImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Importe un relevé bancaire (CSV, OFX, CAMT.053, MT940) et rapproche les paiements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Chemin du fichier de relevé')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Format du relevé (détecté automatiquement par défaut)',
+        )
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            default=DATE_WINDOW_DAYS,
+            help='Écart maximal en jours entre la date du relevé et celle du paiement déclaré',
+        )
+        parser.add_argument(
+            '--user',
+            help='Identifiant du syndic enregistré comme vérificateur',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mode test - rapproche sans rien enregistrer',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"Fichier introuvable: {path}")
+
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user'], role__in=['SUPERADMIN', 'SYNDIC']).first()
+            if user is None:
+                raise CommandError(f"Syndic introuvable: {options['user']}")
+
+        self.stdout.write(self.style.SUCCESS('🏦 IMPORT DE RELEVÉ BANCAIRE'))
+        self.stdout.write('=' * 60)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('⚠️  MODE TEST ACTIVÉ - Aucune donnée ne sera enregistrée'))
+
+        importer = BankStatementImporter(
+            user=user, window_days=options['window_days'], dry_run=options['dry_run']
+        )
+        with open(path, 'rb') as stream:
+            record = importer.run(stream, os.path.basename(path), options['format'])
+
+        if record.status == 'FAILED':
+            raise CommandError(record.error)
+
+        self.stdout.write(f"\n📄 {record.file_name} ({record.get_file_format_display()})")
+        self.stdout.write(f"   Lignes lues: {record.row_count}")
+        self.stdout.write(f"   ✅ Rapprochées: {record.matched_count}")
+        self.stdout.write(f"   🔍 À vérifier: {record.review_count}")
+        self.stdout.write(f"   ↩️  Débits ignorés: {record.ignored_count}")
+        self.stdout.write(f"   ♻️  Déjà importées: {record.duplicate_count}")
+        self.stdout.write(
+            f"\n🎯 Taux de rapprochement: {record.match_rate}% — "
+            f"{record.rows_per_second} lignes/s ({record.duration_ms} ms)"
+        )
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+
+from finance.models import ChatbotConversation, Notification, PaymentProofUpload
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Supprime les données dont la durée de conservation est dépassée'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mode test - affiche les volumes sans supprimer',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        retention = settings.DATA_RETENTION_DAYS
+        now = timezone.now()
+
+        targets = [
+            (
+                'Conversations chatbot',
+                ChatbotConversation.objects.filter(
+                    last_activity__lt=now - timedelta(days=retention['chatbot_conversations'])
+                ),
+            ),
+            (
+                'Notifications désactivées',
+                Notification.objects.filter(
+                    is_active=False,
+                    created_at__lt=now - timedelta(days=retention['inactive_notifications']),
+                ),
+            ),
+            (
+                'Envois de justificatifs inachevés',
+                PaymentProofUpload.objects.filter(
+                    status='PENDING',
+                    updated_at__lt=now - timedelta(days=retention['proof_uploads']),
+                ),
+            ),
+        ]
+
+        for label, queryset in targets:
+            if dry_run:
+                self.stdout.write(f"🔍 [TEST] {label}: {queryset.count()} à supprimer")
+                continue
+            deleted = self.delete_in_chunks(queryset)
+            self.stdout.write(self.style.SUCCESS(f"🗑  {label}: {deleted} supprimé(e)s"))
+
+    def delete_in_chunks(self, queryset):
+        """Supprimer par lots pour limiter la durée des verrous"""
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[:CHUNK_SIZE])
+            if not ids:
+                return deleted
+            queryset.model.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
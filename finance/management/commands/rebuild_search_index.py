@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from finance.search import INDEXED, rebuild
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte (documents, rapports, notifications, FAQ)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=[kind for kind, _, _ in INDEXED.values()],
+            help='Ne réindexer que ce type (option répétable)',
+        )
+
+    def handle(self, *args, **options):
+        models = [model for model, (kind, _, _) in INDEXED.items() if not options['kind'] or kind in options['kind']]
+        started = time.monotonic()
+        counts = rebuild(models)
+        for kind, count in counts.items():
+            self.stdout.write(f"🔎 {kind}: {count} objet(s) indexé(s)")
+        self.stdout.write(self.style.SUCCESS(f"✅ Index reconstruit en {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from finance.models import Document, Payment
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Compare Document.paid_amount à la somme des paiements et corrige les écarts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Corriger les écarts détectés (sinon simple rapport)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Nombre maximum d\'écarts détaillés dans le rapport',
+        )
+
+    def handle(self, *args, **options):
+        fix = options['fix']
+        limit = options['limit']
+
+        self.stdout.write(self.style.SUCCESS('🔎 RAPPROCHEMENT DES MONTANTS PAYÉS'))
+        self.stdout.write('=' * 60)
+
+        payments_total = (
+            Payment.objects.filter(document=OuterRef('pk'), is_rejected=False)
+            .order_by()
+            .values('document')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        money = DecimalField(max_digits=12, decimal_places=2)
+        drifted = (
+            Document.objects.annotate(
+                actual_paid=Coalesce(Subquery(payments_total, output_field=money), Value(Decimal('0')), output_field=money)
+            )
+            .exclude(paid_amount=F('actual_paid'))
+            .order_by('pk')
+            .values_list('pk', 'title', 'amount', 'paid_amount', 'actual_paid')
+        )
+
+        count = 0
+        corrections = []
+        for pk, title, amount, paid_amount, actual_paid in drifted.iterator(chunk_size=CHUNK_SIZE):
+            count += 1
+            if count <= limit:
+                self.stdout.write(
+                    f"   #{pk} {title}: enregistré {paid_amount} DH, paiements {actual_paid} DH "
+                    f"(écart {actual_paid - paid_amount} DH)"
+                )
+            corrections.append((pk, amount, actual_paid))
+            if fix and len(corrections) >= CHUNK_SIZE:
+                self.apply(corrections)
+                corrections = []
+
+        if fix and corrections:
+            self.apply(corrections)
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS('✅ Aucun écart détecté'))
+        elif fix:
+            self.stdout.write(self.style.SUCCESS(f"✅ {count} documents corrigés"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {count} documents en écart. Exécutez avec --fix pour corriger"
+            ))
+
+    def apply(self, corrections):
+        """Réécrire paid_amount et is_paid à partir des paiements"""
+        documents = [
+            Document(pk=pk, paid_amount=actual_paid, is_paid=actual_paid >= amount)
+            for pk, amount, actual_paid in corrections
+        ]
+        Document.objects.bulk_update(documents, ['paid_amount', 'is_paid'])
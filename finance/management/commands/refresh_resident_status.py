@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from finance.models import ResidentStatus
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les totaux (dû / payé) de tous les résidents à partir du grand livre'
+
+    def handle(self, *args, **options):
+        residents = User.objects.filter(role='RESIDENT')
+        updated = 0
+        drifted = 0
+        for resident in residents.iterator():
+            status, created = ResidentStatus.objects.get_or_create(resident=resident)
+            previous = (status.total_due, status.total_paid)
+            status.update_totals()
+            if not created and previous != (status.total_due, status.total_paid):
+                drifted += 1
+            updated += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {updated} statuts de résidents mis à jour')
+        )
+        if drifted:
+            self.stdout.write(
+                self.style.WARNING(f'⚠️  {drifted} soldes différaient du grand livre et ont été corrigés')
+            )
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+import logging
+import random
+import time
+
+from finance import scheduler
+from finance.models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Planificateur interne des tâches périodiques (remplace la crontab)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exécuter un seul cycle puis quitter',
+        )
+        parser.add_argument(
+            '--node-id',
+            default=None,
+            help='Identifiant de ce nœud (par défaut: hôte:pid)',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Afficher l\'état et les métriques des tâches puis quitter',
+        )
+
+    def handle(self, *args, **options):
+        """
+        Boucle principale : à chaque cycle, le nœud tente de prendre (ou renouveler)
+        le bail de leader, puis exécute les tâches échues.
+
+        Lancer un processus par serveur d'application :
+        python manage.py run_scheduler
+        """
+        if options['list']:
+            self.list_jobs()
+            return
+
+        node_id = options['node_id'] or scheduler.get_node_id()
+        tick = scheduler.get_setting('SCHEDULER_TICK_SECONDS')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'🕘 PLANIFICATEUR DÉMARRÉ - nœud {node_id}')
+        )
+        scheduler.sync_jobs()
+
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    self.tick(node_id)
+                except Exception as e:
+                    # Une erreur de base de données ne doit pas arrêter la boucle
+                    logger.exception("Erreur du planificateur: %s", e)
+                    self.stdout.write(self.style.ERROR(f'❌ Erreur du planificateur: {e}'))
+
+                if options['once']:
+                    break
+                time.sleep(tick + random.uniform(0, tick / 10))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('⏹  Arrêt demandé'))
+        finally:
+            scheduler.release_leadership(node_id)
+
+    def tick(self, node_id):
+        if not scheduler.acquire_leadership(node_id):
+            return
+        scheduler.sync_jobs()
+        results = scheduler.run_pending(node_id)
+        for name, status in results.items():
+            style = self.style.SUCCESS if status == 'SUCCESS' else self.style.WARNING
+            self.stdout.write(style(f'{timezone.now():%Y-%m-%d %H:%M:%S} {name}: {status}'))
+
+    def list_jobs(self):
+        scheduler.sync_jobs()
+        self.stdout.write(f"{'Tâche':<30} {'Statut':<10} {'Prochaine':<17} {'Exéc.':>6} {'Échecs':>6} {'Moy. ms':>8} {'Max ms':>8}")
+        for job in ScheduledJob.objects.all():
+            next_run = timezone.localtime(job.next_run_at).strftime('%Y-%m-%d %H:%M')
+            enabled = '' if job.is_enabled else ' (désactivée)'
+            self.stdout.write(
+                f"{job.name:<30} {job.last_status:<10} {next_run:<17} {job.run_count:>6} "
+                f"{job.failure_count:>6} {job.avg_duration_ms:>8} {job.max_duration_ms:>8}{enabled}"
+            )
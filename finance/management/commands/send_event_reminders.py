@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from finance.reminders import BATCH_SIZE, dispatch_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Envoie les rappels des événements du calendrier arrivés à échéance'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Nombre d\'événements traités par lot',
+        )
+
+    def handle(self, *args, **options):
+        events, notifications, emails = dispatch_due_reminders(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🔔 {events} rappel(s) traité(s) - {notifications} notification(s), {emails} email(s) en file"
+            )
+        )
@@ -0,0 +1,65 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from finance.models import Notification, send_email
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Envoie un email récapitulatif des notifications non lues'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Fenêtre des notifications à inclure (en heures)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mode test - affiche les récapitulatifs sans les envoyer',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+
+        # Une seule requête sur la table de liaison destinataires
+        Recipient = Notification.recipients.through
+        rows = Recipient.objects.filter(
+            notification__created_at__gte=since,
+            notification__is_active=True,
+            notification__is_read=False,
+        ).exclude(user__email='').values_list(
+            'user_id', 'notification__title', 'notification__priority'
+        ).order_by('user_id', '-notification__created_at')
+
+        per_user = defaultdict(list)
+        for user_id, title, priority in rows:
+            per_user[user_id].append((title, priority))
+
+        users = User.objects.in_bulk(list(per_user.keys()))
+        sent = 0
+        for user_id, items in per_user.items():
+            user = users.get(user_id)
+            if not user or not user.email:
+                continue
+            lines = [f"- [{priority}] {title}" for title, priority in items]
+            subject = f"Récapitulatif: {len(items)} notification(s) non lue(s)"
+            message = (
+                f"Bonjour {user.get_full_name() or user.username},\n\n"
+                f"Vous avez {len(items)} notification(s) non lue(s) :\n\n"
+                + "\n".join(lines)
+                + "\n\nConnectez-vous pour les consulter."
+            )
+            if options['dry_run']:
+                self.stdout.write(f"🔍 [TEST] {user.email}: {len(items)} notification(s)")
+            elif send_email(user.email, subject, message):
+                sent += 1
+
+        self.stdout.write(self.style.SUCCESS(f"📧 {sent} récapitulatif(s) envoyé(s)"))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+from finance.models import QueuedEmail, send_email
+
+MAX_ATTEMPTS = 5
+
+
+class Command(BaseCommand):
+    help = 'Envoie les emails en file d\'attente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Nombre maximum d\'emails envoyés par exécution',
+        )
+
+    def handle(self, *args, **options):
+        pending = QueuedEmail.objects.filter(
+            status='PENDING', attempts__lt=MAX_ATTEMPTS
+        ).order_by('created_at')[:options['limit']]
+
+        sent_ids = []
+        failed = 0
+        for email in pending:
+            try:
+                ok = send_email(email.to_email, email.subject, email.body, html_message=email.html_body or None)
+                error = '' if ok else "Envoi refusé"
+            except Exception as e:
+                ok, error = False, str(e)
+
+            if ok:
+                sent_ids.append(email.pk)
+                continue
+            failed += 1
+            attempts = email.attempts + 1
+            QueuedEmail.objects.filter(pk=email.pk).update(
+                attempts=F('attempts') + 1,
+                last_error=error,
+                status='FAILED' if attempts >= MAX_ATTEMPTS else 'PENDING',
+            )
+
+        QueuedEmail.objects.filter(pk__in=sent_ids).update(
+            status='SENT', sent_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"📧 {len(sent_ids)} email(s) envoyé(s), {failed} échec(s)")
+        )
@@ -0,0 +1,272 @@
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from finance.models import Document, Payment
+
+User = get_user_model()
+
+# Politiques de relance, en jours par rapport à l'échéance (négatif = avant).
+# 'actuelle' reproduit les seuils de detect_overdue_payments.
+POLICIES = {
+    'actuelle': [-7, 30, 60, 90],
+    'allegee': [30, 90],
+    'precoce': [-7, 0, 15, 30, 60, 90],
+    'rapprochee': [-3, 10, 20, 30, 45, 60, 90],
+}
+
+# Fenêtre (jours) pour considérer qu'un paiement fait suite à une relance
+RESPONSE_WINDOW_DAYS = 14
+
+PERCENTILES = [25, 50, 75, 90]
+
+DELAY_BUCKETS = [
+    ('Avant échéance', None, 0),
+    ('0-29 jours', 0, 30),
+    ('30-59 jours', 30, 60),
+    ('60-89 jours', 60, 90),
+    ('90+ jours', 90, None),
+]
+
+
+def parse_policy(value):
+    """Analyser une politique 'nom=-7,30,60' ou un nom prédéfini"""
+    if '=' not in value:
+        if value not in POLICIES:
+            raise CommandError(f"Politique inconnue: {value} (disponibles: {', '.join(POLICIES)})")
+        return value, POLICIES[value]
+    name, offsets = value.split('=', 1)
+    try:
+        steps = sorted({int(offset) for offset in offsets.split(',') if offset.strip()})
+    except ValueError:
+        raise CommandError(f"Seuils invalides pour la politique {name}: {offsets}")
+    if not steps:
+        raise CommandError(f"Aucun seuil pour la politique {name}")
+    return name.strip(), steps
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule des politiques de relance des impayés sur l'historique "
+        "(nombre de relances, délais de paiement, volume de messages). Nécessite NumPy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--policy',
+            action='append',
+            dest='policies',
+            help=(
+                "Politique à simuler : nom prédéfini (%s) ou 'nom=-7,30,60'. "
+                "Peut être répété. Par défaut : toutes les politiques prédéfinies." % ', '.join(POLICIES)
+            ),
+        )
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help="Ne prendre que les documents émis à partir de cette date (AAAA-MM-JJ)",
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help="Date de fin de la simulation (par défaut : aujourd'hui)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+        except ImportError:
+            raise CommandError("NumPy est requis pour cette commande (pip install numpy)")
+
+        policies = [parse_policy(value) for value in options['policies'] or POLICIES]
+        until = options['until'] or timezone.now().date()
+        since = options['since']
+
+        self.stdout.write(self.style.SUCCESS('📊 SIMULATION DES POLITIQUES DE RELANCE'))
+        self.stdout.write('=' * 60)
+
+        started = time.monotonic()
+        data = self.load_history(np, since, until)
+        load_ms = (time.monotonic() - started) * 1000
+
+        count = len(data['doc_ids'])
+        self.stdout.write(
+            f"📋 {count} documents et {data['payment_count']} paiements chargés en {load_ms:.0f} ms "
+            f"(horizon: {until:%d/%m/%Y})"
+        )
+        if not count:
+            self.stdout.write(self.style.WARNING("Aucun document avec échéance sur la période"))
+            return
+
+        self.report_payment_delays(np, data)
+
+        for name, steps in policies:
+            started = time.monotonic()
+            result = self.simulate(np, data, steps)
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.report_policy(name, steps, result, elapsed_ms)
+
+    def load_history(self, np, since, until):
+        """Charger documents et paiements en tableaux NumPy (deux requêtes)"""
+        documents = Document.objects.filter(due_date__isnull=False, due_date__lte=until)
+        if since:
+            documents = documents.filter(date__gte=since)
+        rows = list(
+            documents.order_by('pk').values_list('pk', 'amount', 'date', 'due_date', 'resident__email')
+        )
+
+        doc_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        amounts = np.array([row[1] for row in rows], dtype=np.float64)
+        issued = np.array([self.day_number(row[2]) for row in rows], dtype=np.int64)
+        due = np.array([row[3].toordinal() for row in rows], dtype=np.int64)
+        has_email = np.array([bool(row[4]) for row in rows], dtype=bool)
+
+        payments = Payment.objects.filter(payment_date__lte=until, document__isnull=False)
+        if since:
+            payments = payments.filter(document__date__gte=since)
+        payment_rows = list(payments.values_list('document_id', 'amount', 'payment_date'))
+
+        pay_docs = np.array([row[0] for row in payment_rows], dtype=np.int64)
+        pay_amounts = np.array([row[1] for row in payment_rows], dtype=np.float64)
+        pay_days = np.array([self.day_number(row[2]) for row in payment_rows], dtype=np.int64)
+
+        syndics = list(User.objects.filter(role__in=['SUPERADMIN', 'SYNDIC']).values_list('email', flat=True))
+
+        return {
+            'doc_ids': doc_ids,
+            'amounts': amounts,
+            'issued': issued,
+            'due': due,
+            'has_email': has_email,
+            'settled': self.settlement_days(np, doc_ids, amounts, pay_docs, pay_amounts, pay_days),
+            'horizon': until.toordinal(),
+            'payment_count': len(payment_rows),
+            'syndic_count': len(syndics),
+            'syndic_email_count': sum(1 for email in syndics if email),
+        }
+
+    @staticmethod
+    def day_number(value):
+        if hasattr(value, 'date'):
+            value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+        return value.toordinal()
+
+    @staticmethod
+    def settlement_days(np, doc_ids, amounts, pay_docs, pay_amounts, pay_days):
+        """Jour où le cumul des paiements atteint le montant du document (sentinelle si jamais)"""
+        never = np.iinfo(np.int64).max
+        settled = np.full(len(doc_ids), never, dtype=np.int64)
+        if not len(pay_docs):
+            return settled
+
+        # Rattacher chaque paiement à l'indice de son document
+        index = np.searchsorted(doc_ids, pay_docs)
+        index = np.clip(index, 0, len(doc_ids) - 1)
+        known = doc_ids[index] == pay_docs
+        index, pay_amounts, pay_days = index[known], pay_amounts[known], pay_days[known]
+
+        # Cumul des paiements par document, dans l'ordre chronologique
+        order = np.lexsort((pay_days, index))
+        index, pay_amounts, pay_days = index[order], pay_amounts[order], pay_days[order]
+        cumulative = np.cumsum(pay_amounts)
+        group_start = np.r_[0, np.flatnonzero(np.diff(index)) + 1]
+        offsets = np.repeat(cumulative[group_start] - pay_amounts[group_start], np.diff(np.r_[group_start, len(index)]))
+        cumulative -= offsets
+
+        # Premier paiement qui solde le document (tolérance d'un centime)
+        covering = cumulative >= amounts[index] - 0.005
+        np.minimum.at(settled, index[covering], pay_days[covering])
+        return settled
+
+    def simulate(self, np, data, steps):
+        """Évaluer une politique pour tous les documents à la fois"""
+        offsets = np.array(steps, dtype=np.int64)
+        never = np.iinfo(np.int64).max
+
+        # Jour de chaque relance (documents x seuils), jamais avant l'émission
+        fire = np.maximum(data['due'][:, None] + offsets[None, :], data['issued'][:, None])
+        settled = data['settled'][:, None]
+        sent = (fire <= data['horizon']) & (settled > fire)
+
+        reminders_per_step = sent.sum(axis=0)
+        reminders = int(reminders_per_step.sum())
+        reminded = sent.any(axis=1)
+
+        # Paiements intervenus dans la fenêtre suivant chaque relance
+        answered = sent & (settled != never) & (settled - fire <= RESPONSE_WINDOW_DAYS)
+        answered_per_step = answered.sum(axis=0)
+
+        # Délai entre la dernière relance envoyée et le paiement
+        last_fire = np.where(sent, fire, np.iinfo(np.int64).min).max(axis=1)
+        paid_after = reminded & (data['settled'] != never)
+        delays_after_last = data['settled'][paid_after] - last_fire[paid_after]
+
+        per_document = sent.sum(axis=1)
+        resident_emails = int(per_document[data['has_email']].sum())
+
+        return {
+            'reminders': reminders,
+            'reminders_per_step': reminders_per_step,
+            'answered_per_step': answered_per_step,
+            'documents_reminded': int(reminded.sum()),
+            'unpaid_after_reminders': int((reminded & (data['settled'] == never)).sum()),
+            'recovered_amount': float(data['amounts'][paid_after].sum()),
+            'delay_after_last': (
+                np.percentile(delays_after_last, PERCENTILES) if len(delays_after_last) else None
+            ),
+            'max_per_document': int(per_document.max()) if len(per_document) else 0,
+            'channels': {
+                'Notifications résident': reminders,
+                'Emails résident': resident_emails,
+                'Notifications syndic (destinataires)': reminders * data['syndic_count'],
+                'Emails syndic': reminders * data['syndic_email_count'],
+            },
+        }
+
+    def report_payment_delays(self, np, data):
+        """Distribution historique des délais de paiement par rapport à l'échéance"""
+        never = np.iinfo(np.int64).max
+        paid = data['settled'] != never
+        delays = data['settled'][paid] - data['due'][paid]
+
+        self.stdout.write("\n⏱️  DÉLAIS DE PAIEMENT (jours après échéance)")
+        self.stdout.write(f"   Documents soldés: {int(paid.sum())} / {len(paid)}")
+        if len(delays):
+            values = np.percentile(delays, PERCENTILES)
+            self.stdout.write('   ' + '  '.join(f"p{p}={v:.0f}" for p, v in zip(PERCENTILES, values)))
+        for label, low, high in DELAY_BUCKETS:
+            mask = np.ones(len(delays), dtype=bool)
+            if low is not None:
+                mask &= delays >= low
+            if high is not None:
+                mask &= delays < high
+            self.stdout.write(f"   {label:<16} {int(mask.sum()):>8}")
+        self.stdout.write(f"   {'Non soldés':<16} {int((~paid).sum()):>8}")
+
+    def report_policy(self, name, steps, result, elapsed_ms):
+        self.stdout.write(f"\n📨 POLITIQUE '{name}' — seuils {', '.join(f'{s:+d}' for s in steps)} j")
+        self.stdout.write(f"   Simulée en {elapsed_ms:.1f} ms")
+        self.stdout.write(
+            f"   {result['reminders']} relances pour {result['documents_reminded']} documents "
+            f"(max {result['max_per_document']} par document)"
+        )
+        for step, sent, answered in zip(steps, result['reminders_per_step'], result['answered_per_step']):
+            rate = (answered / sent * 100) if sent else 0
+            self.stdout.write(
+                f"   J{step:+d}: {int(sent):>8} relances, {rate:5.1f}% payées sous {RESPONSE_WINDOW_DAYS} jours"
+            )
+        self.stdout.write(
+            f"   Encaissé après relance: {result['recovered_amount']:.2f} DH — "
+            f"toujours impayés: {result['unpaid_after_reminders']}"
+        )
+        if result['delay_after_last'] is not None:
+            self.stdout.write(
+                '   Délai après dernière relance: '
+                + '  '.join(f"p{p}={v:.0f}" for p, v in zip(PERCENTILES, result['delay_after_last']))
+            )
+        self.stdout.write('   Volume par canal:')
+        for channel, volume in result['channels'].items():
+            self.stdout.write(f"     {channel:<38} {volume:>8}")
@@ -0,0 +1,166 @@
+"""Téléchargement contrôlé des fichiers déposés (documents, justificatifs, photos, PDF générés).
+
+Un fichier n'est servi que si l'utilisateur a accès à l'un des objets qui le
+désignent, avec les règles de ``permissions`` : le résident concerné ou le
+syndic. Le transfert est ensuite confié au serveur web frontal
+(``X-Accel-Redirect`` pour nginx, ``X-Sendfile`` pour Apache / lighttpd) ;
+sans serveur frontal, la réponse gère elle-même les requêtes conditionnelles
+(``ETag``, ``Last-Modified``) et partielles (``Range``).
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.utils.text import slugify
+
+from .images import FORMATS, VARIANTS
+from .models import Document, GeneratedPDF, ImageDerivative, Payment, ResidentReport
+from .permissions import visible
+from .storage import is_blob, sha256_of
+
+# (modèle, champ fichier)
+PROTECTED_FIELDS = [
+    (Document, 'file'),
+    (Payment, 'payment_proof'),
+    (ResidentReport, 'photo'),
+    (GeneratedPDF, 'file'),
+]
+
+VARIANT_NAME = re.compile(
+    r'^(?P<root>.+)__(?:%s)\.(?:%s)$' % ('|'.join(VARIANTS), '|'.join(FORMATS))
+)
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+# ==================== ACCÈS ====================
+
+def accessible_object(user, name):
+    """Premier objet accessible à l'utilisateur qui désigne ce fichier, ou None"""
+    for model, field in PROTECTED_FIELDS:
+        obj = visible(user, model.objects.filter(**{field: name})).order_by().first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def variant_source(name):
+    """Image d'origine d'une variante réduite, ou None"""
+    match = VARIANT_NAME.match(name)
+    if not match:
+        return None
+    for source, variants in ImageDerivative.objects.filter(
+        source__startswith=match['root'] + '.'
+    ).values_list('source', 'variants'):
+        for entry in (variants or {}).values():
+            if name in entry.values():
+                return source
+    return None
+
+
+def download_name(obj, name):
+    """Nom proposé au navigateur (les fichiers stockés par contenu n'ont qu'une empreinte pour nom)"""
+    extension = os.path.splitext(name)[1]
+    if not is_blob(name):
+        return os.path.basename(name)
+    if isinstance(obj, (Document, ResidentReport)):
+        return f"{slugify(obj.title) or obj.pk}{extension}"
+    if isinstance(obj, Payment):
+        return f"justificatif_{obj.pk}{extension}"
+    return os.path.basename(name)
+
+
+# ==================== ENVOI ====================
+
+def parse_range(header, size):
+    """Plage ``bytes=début-fin`` -> (début, fin incluse) ; None si absente ou multiple, False si hors fichier"""
+    match = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', header or '')
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffixe : les N derniers octets
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            block = source.read(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def range_allowed(request, etag, last_modified):
+    """If-Range : la plage n'est servie que si le fichier n'a pas changé"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve(request, storage, name, filename, as_attachment=False):
+    """Réponse de téléchargement d'un fichier du stockage (accès déjà vérifié)"""
+    path = storage.path(name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    disposition = content_disposition_header(as_attachment, filename)
+    # Les fichiers stockés par contenu ne changent jamais sous le même nom
+    cache_control = 'private, max-age=31536000, immutable' if is_blob(name) else 'private, max-age=3600'
+
+    mode = getattr(settings, 'MEDIA_SENDFILE', '')
+    if mode in ('nginx', 'sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'nginx':
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        response['Content-Disposition'] = disposition
+        response['Cache-Control'] = cache_control
+        return response
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{sha256_of(name)}"' if is_blob(name) else f'"{size:x}-{last_modified:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size) if range_allowed(request, etag, last_modified) else None
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = disposition
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type,
+                                    as_attachment=as_attachment, filename=filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0031_remove_notification_amount_remove_notification_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('interval_seconds', models.PositiveIntegerField(help_text='Intervalle entre deux exécutions')),
+                ('misfire_policy', models.CharField(choices=[('RUN_ONCE', 'Exécuter une seule fois au rattrapage'), ('SKIP', 'Ignorer les exécutions manquées')], default='RUN_ONCE', max_length=20)),
+                ('is_enabled', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField(db_index=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(choices=[('NEVER', 'Jamais exécutée'), ('RUNNING', 'En cours'), ('SUCCESS', 'Succès'), ('FAILED', 'Échec'), ('SKIPPED', 'Ignorée (retard)')], default='NEVER', max_length=20)),
+                ('last_error', models.TextField(blank=True)),
+                ('last_node', models.CharField(blank=True, help_text='Nœud ayant exécuté la dernière fois', max_length=100)),
+                ('run_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('last_duration_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_duration_ms', models.PositiveIntegerField(default=0)),
+                ('total_duration_ms', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Tâche planifiée',
+                'verbose_name_plural': 'Tâches planifiées',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SchedulerLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('holder', models.CharField(blank=True, max_length=100)),
+                ('expires_at', models.DateTimeField()),
+                ('acquired_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
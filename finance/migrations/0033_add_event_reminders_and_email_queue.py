@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:23
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_upcoming_reminders(apps, schema_editor):
+    """Planifier le rappel des événements à venir, par lots"""
+    Event = apps.get_model('finance', 'Event')
+    now = timezone.now()
+    upcoming = Event.objects.filter(start_at__gt=now).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(upcoming.filter(pk__gt=last_pk)[:1000])
+        if not batch:
+            break
+        for event in batch:
+            event.next_reminder_at = event.start_at - timedelta(minutes=event.reminder_minutes_before)
+        Event.objects.bulk_update(batch, ['next_reminder_at'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0032_add_scheduler_system'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Prochain envoi du rappel (vide une fois le rappel envoyé)', null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='QueuedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('to_email', models.EmailField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('html_body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('SENT', 'Envoyé'), ('FAILED', 'Échec')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Email en attente',
+                'verbose_name_plural': 'Emails en attente',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='queuedemail_status_idx')],
+            },
+        ),
+        migrations.RunPython(schedule_upcoming_reminders, migrations.RunPython.noop),
+    ]
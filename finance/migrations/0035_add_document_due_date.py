@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:27
+
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+PAYMENT_TERMS_DAYS = {
+    'INVOICE': 30,
+    'REMINDER': 30,
+    'OTHER': 30,
+    'NOTICE': None,
+    'LEGAL': None,
+}
+
+
+def backfill_due_dates(apps, schema_editor):
+    """Calculer due_date pour les documents existants, par lots de clés primaires"""
+    Document = apps.get_model('finance', 'Document')
+    terms = {**PAYMENT_TERMS_DAYS, **getattr(settings, 'DOCUMENT_PAYMENT_TERMS_DAYS', {})}
+
+    last_pk = 0
+    while True:
+        rows = list(
+            Document.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'date', 'document_type')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        documents = []
+        for pk, date, document_type in rows:
+            days = terms.get(document_type, PAYMENT_TERMS_DAYS['INVOICE'])
+            if days is None or date is None:
+                continue
+            if hasattr(date, 'date'):
+                date = date.date()
+            documents.append(Document(pk=pk, due_date=date + timedelta(days=days)))
+        Document.objects.bulk_update(documents, ['due_date'])
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0033_add_event_reminders_and_email_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='due_date',
+            field=models.DateField(blank=True, editable=False, help_text="Date d'échéance (selon le type de document)", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['is_paid', 'is_archived', 'due_date', 'resident', 'amount'], name='document_unpaid_due_idx'),
+        ),
+        migrations.RunPython(backfill_due_dates, migrations.RunPython.noop),
+    ]
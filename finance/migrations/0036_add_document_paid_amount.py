@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:30
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+BATCH_SIZE = 2000
+
+
+def backfill_paid_amounts(apps, schema_editor):
+    """Initialiser paid_amount avec la somme des paiements de chaque document"""
+    Document = apps.get_model('finance', 'Document')
+    Payment = apps.get_model('finance', 'Payment')
+
+    totals = (
+        Payment.objects.filter(document__isnull=False)
+        .order_by()
+        .values_list('document_id')
+        .annotate(total=Sum('amount'))
+    )
+    batch = []
+    for document_id, total in totals.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Document(pk=document_id, paid_amount=total))
+        if len(batch) >= BATCH_SIZE:
+            Document.objects.bulk_update(batch, ['paid_amount'])
+            batch = []
+    if batch:
+        Document.objects.bulk_update(batch, ['paid_amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0035_add_document_due_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, help_text='Total des paiements enregistrés en DH', max_digits=10),
+        ),
+        migrations.RunPython(backfill_paid_amounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+RESIDENT_BATCH_SIZE = 200
+
+# Types de documents sans montant exigible (voir DEFAULT_PAYMENT_TERMS_DAYS)
+NON_PAYABLE_TYPES = {'NOTICE', 'LEGAL'}
+
+
+def open_ledger(apps, schema_editor):
+    """Reprendre l'historique : une écriture par document et par paiement existants"""
+    Document = apps.get_model('finance', 'Document')
+    Payment = apps.get_model('finance', 'Payment')
+    LedgerEntry = apps.get_model('finance', 'LedgerEntry')
+    ResidentStatus = apps.get_model('finance', 'ResidentStatus')
+
+    resident_ids = list(Document.objects.order_by().values_list('resident_id', flat=True).distinct())
+    for start in range(0, len(resident_ids), RESIDENT_BATCH_SIZE):
+        batch = resident_ids[start:start + RESIDENT_BATCH_SIZE]
+        movements = []
+        for pk, resident_id, amount, date, document_type, title in Document.objects.filter(
+            resident_id__in=batch
+        ).exclude(document_type__in=NON_PAYABLE_TYPES).values_list(
+            'pk', 'resident_id', 'amount', 'date', 'document_type', 'title'
+        ):
+            movements.append((resident_id, date, 0, pk, amount, title))
+        for pk, resident_id, amount, date in Payment.objects.filter(
+            document__resident_id__in=batch
+        ).values_list('pk', 'document__resident_id', 'amount', 'payment_date'):
+            movements.append((resident_id, date, 1, pk, -amount, ''))
+        movements.sort(key=lambda movement: movement[:4])
+
+        entries = []
+        totals = {}
+        for resident_id, date, is_payment, pk, amount, title in movements:
+            if not amount:
+                continue
+            debit, credit = totals.get(resident_id, (Decimal('0'), Decimal('0')))
+            if is_payment:
+                credit -= amount
+                entry = LedgerEntry(
+                    kind='PAYMENT', debit_account='512', credit_account='411', amount=-amount,
+                    payment_id=pk, description=f"Paiement #{pk}",
+                )
+            else:
+                debit += amount
+                entry = LedgerEntry(
+                    kind='DOCUMENT', debit_account='411', credit_account='701', amount=amount,
+                    document_id=pk, description=f"Document #{pk}: {title}"[:255],
+                )
+            entry.resident_id = resident_id
+            entry.entry_date = date
+            entry.balance_after = debit - credit
+            entries.append(entry)
+            totals[resident_id] = (debit, credit)
+        LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+        statuses = {status.resident_id: status for status in ResidentStatus.objects.filter(resident_id__in=batch)}
+        missing = []
+        for resident_id in batch:
+            debit, credit = totals.get(resident_id, (Decimal('0'), Decimal('0')))
+            status = statuses.get(resident_id)
+            if status is None:
+                missing.append(ResidentStatus(resident_id=resident_id, total_due=debit, total_paid=credit))
+            else:
+                status.total_due, status.total_paid = debit, credit
+        ResidentStatus.objects.bulk_update(list(statuses.values()), ['total_due', 'total_paid'], batch_size=1000)
+        ResidentStatus.objects.bulk_create(missing, batch_size=1000)
+
+    # Résidents sans document : solde nul
+    ResidentStatus.objects.exclude(resident_id__in=resident_ids).update(
+        total_due=Decimal('0'), total_paid=Decimal('0')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0036_add_document_paid_amount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('total_debit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('total_credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Arrêté de solde',
+                'verbose_name_plural': 'Arrêtés de solde',
+                'ordering': ['-as_of'],
+                'unique_together': {('resident', 'as_of')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('DOCUMENT', 'Émission de document'), ('PAYMENT', 'Paiement'), ('ADJUSTMENT', 'Ajustement'), ('REVERSAL', 'Extourne')], max_length=20)),
+                ('debit_account', models.CharField(choices=[('411', 'Copropriétaires'), ('701', 'Charges appelées'), ('512', 'Banque / caisse'), ('658', 'Ajustements')], max_length=10)),
+                ('credit_account', models.CharField(choices=[('411', 'Copropriétaires'), ('701', 'Charges appelées'), ('512', 'Banque / caisse'), ('658', 'Ajustements')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entry_date', models.DateField(default=django.utils.timezone.localdate)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('balance_after', models.DecimalField(decimal_places=2, help_text='Solde du résident après cette écriture', max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries_created', to=settings.AUTH_USER_MODEL)),
+                ('document', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='finance.document')),
+                ('payment', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ledger_entries', to='finance.payment')),
+                ('resident', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('reversal_of', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='reversals', to='finance.ledgerentry')),
+            ],
+            options={
+                'verbose_name': 'Écriture comptable',
+                'verbose_name_plural': 'Écritures comptables',
+                'ordering': ['-pk'],
+                'indexes': [models.Index(fields=['resident', 'entry_date'], name='ledger_resident_date_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
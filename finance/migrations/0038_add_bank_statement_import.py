@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0037_add_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatementImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('file_format', models.CharField(choices=[('CSV', 'CSV'), ('OFX', 'OFX'), ('CAMT', 'CAMT.053'), ('MT940', 'MT940')], max_length=10)),
+                ('status', models.CharField(choices=[('RUNNING', 'En cours'), ('DONE', 'Terminé'), ('FAILED', 'Échec')], default='RUNNING', max_length=10)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('matched_count', models.PositiveIntegerField(default=0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('duplicate_count', models.PositiveIntegerField(default=0)),
+                ('ignored_count', models.PositiveIntegerField(default=0)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('imported_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import de relevé bancaire',
+                'verbose_name_plural': 'Imports de relevés bancaires',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BankTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(blank=True, max_length=64)),
+                ('booking_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Positif = crédit', max_digits=12)),
+                ('currency', models.CharField(blank=True, max_length=3)),
+                ('reference', models.CharField(blank=True, max_length=140)),
+                ('counterparty', models.CharField(blank=True, max_length=140)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('fingerprint', models.CharField(help_text='Empreinte pour ignorer les lignes déjà importées', max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('MATCHED', 'Rapprochée'), ('REVIEW', 'À vérifier'), ('IGNORED', 'Ignorée')], default='REVIEW', max_length=10)),
+                ('match_method', models.CharField(blank=True, choices=[('PAYMENT_REFERENCE', 'Paiement (référence)'), ('PAYMENT_AMOUNT', 'Paiement (montant et date)'), ('DOCUMENT_REFERENCE', 'Document (référence)'), ('DOCUMENT_RESIDENT', 'Document (montant et nom)'), ('MANUAL', 'Manuel')], max_length=20)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_transactions', to='finance.document')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bank_transactions', to='finance.payment')),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_bank_transactions', to=settings.AUTH_USER_MODEL)),
+                ('statement_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='finance.bankstatementimport')),
+            ],
+            options={
+                'verbose_name': 'Ligne de relevé bancaire',
+                'verbose_name_plural': 'Lignes de relevés bancaires',
+                'ordering': ['-booking_date', '-pk'],
+                'indexes': [models.Index(fields=['status', 'booking_date'], name='banktx_status_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0038_add_bank_statement_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payment_proof_sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Empreinte du justificatif (déduplication)', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='PaymentProofUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('total_size', models.PositiveBigIntegerField()),
+                ('received_size', models.PositiveBigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('PENDING', 'En cours'), ('COMPLETE', 'Terminé')], default='PENDING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proof_uploads', to='finance.payment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proof_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Envoi de justificatif',
+                'verbose_name_plural': 'Envois de justificatifs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0039_add_payment_proof_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text="Nom de stockage de l'image originale", max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('READY', 'Prête'), ('FAILED', 'Échec')], default='PENDING', max_length=10)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': "Variante d'image",
+                'verbose_name_plural': "Variantes d'images",
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='imagederivative_status_idx')],
+            },
+        ),
+    ]
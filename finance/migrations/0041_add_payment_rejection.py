@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0040_add_image_derivative'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='is_rejected',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='rejection_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['is_verified', 'is_rejected', 'id'], name='payment_verification_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0041_add_payment_rejection'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RECEIPT', 'Reçu de paiement'), ('FORMAL_NOTICE', 'Mise en demeure')], max_length=20)),
+                ('status', models.CharField(choices=[('RUNNING', 'En cours'), ('DONE', 'Terminé'), ('FAILED', 'Échec')], default='RUNNING', max_length=10)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('generated_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('workers', models.PositiveSmallIntegerField(default=1)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pdf_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lot de PDF',
+                'verbose_name_plural': 'Lots de PDF',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GeneratedPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RECEIPT', 'Reçu de paiement'), ('FORMAL_NOTICE', 'Mise en demeure')], max_length=20)),
+                ('file', models.FileField(upload_to='generated/%Y/%m/')),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('render_ms', models.PositiveIntegerField(default=0, help_text='Durée de rendu du PDF (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generated_pdfs', to='finance.document')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='generated_pdfs', to='finance.payment')),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pdfs', to='finance.pdfbatch')),
+            ],
+            options={
+                'verbose_name': 'PDF généré',
+                'verbose_name_plural': 'PDF générés',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
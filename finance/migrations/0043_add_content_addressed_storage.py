@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:59
+
+import django.utils.timezone
+import finance.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0042_add_generated_pdfs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(help_text='Fichier du document', storage=finance.storage.blob_storage, upload_to='documents/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_proof',
+            field=models.ImageField(blank=True, null=True, storage=finance.storage.blob_storage, upload_to='payment_proofs/%Y/%m/'),
+        ),
+        migrations.AlterField(
+            model_name='residentreport',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=finance.storage.blob_storage, upload_to='reports/%Y/%m/', verbose_name='Photo (optionnelle)'),
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Dernière variation du nombre de références')),
+            ],
+            options={
+                'verbose_name': 'Fichier stocké',
+                'verbose_name_plural': 'Fichiers stockés',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='storedblob_gc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:01
+
+import finance.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0043_add_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generatedpdf',
+            name='file',
+            field=models.FileField(storage=finance.storage.protected_storage, upload_to='generated/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0044_protect_generated_pdfs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['-date'], name='document_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['resident', '-date'], name='document_active_resident_idx'),
+        ),
+    ]
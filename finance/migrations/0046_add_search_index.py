@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    # Index FTS5 adossé à la table (external content), tenu à jour par triggers
+    """CREATE VIRTUAL TABLE finance_searchentry_fts USING fts5(
+        title, content, content='finance_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE TRIGGER finance_searchentry_fts_ai AFTER INSERT ON finance_searchentry BEGIN
+        INSERT INTO finance_searchentry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER finance_searchentry_fts_ad AFTER DELETE ON finance_searchentry BEGIN
+        INSERT INTO finance_searchentry_fts(finance_searchentry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER finance_searchentry_fts_au AFTER UPDATE OF title, content ON finance_searchentry BEGIN
+        INSERT INTO finance_searchentry_fts(finance_searchentry_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO finance_searchentry_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS finance_searchentry_fts_au",
+    "DROP TRIGGER IF EXISTS finance_searchentry_fts_ad",
+    "DROP TRIGGER IF EXISTS finance_searchentry_fts_ai",
+    "DROP TABLE IF EXISTS finance_searchentry_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    # Le texte est déjà sans accents : la configuration 'french' n'apporte que la racinisation
+    """ALTER TABLE finance_searchentry ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('french'::regconfig, content)) STORED""",
+    "CREATE INDEX finance_searchentry_vector_idx ON finance_searchentry USING GIN (search_vector)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS finance_searchentry_vector_idx",
+    "ALTER TABLE finance_searchentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        # Les autres moteurs se contentent de la recherche par sous-chaîne (finance/search.py)
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0045_add_active_document_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('DOCUMENT', 'Document'), ('REPORT', 'Rapport'), ('NOTIFICATION', 'Notification'), ('FAQ', 'Question fréquente')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('title', models.CharField(max_length=300)),
+                ('excerpt', models.CharField(blank=True, max_length=300)),
+                ('content', models.TextField(help_text='Texte indexé, en minuscules et sans accents')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, help_text='Résident propriétaire (documents, rapports)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Index de recherche',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['owner', 'kind'], name='searchentry_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_object_uniq')],
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
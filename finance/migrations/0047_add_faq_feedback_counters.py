@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0046_add_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbotfaq',
+            name='helpful_count',
+            field=models.PositiveIntegerField(default=0, help_text='Réponses jugées utiles'),
+        ),
+        migrations.AddField(
+            model_name='chatbotfaq',
+            name='not_helpful_count',
+            field=models.PositiveIntegerField(default=0, help_text='Réponses jugées inutiles'),
+        ),
+        migrations.AddIndex(
+            model_name='chatbotfaq',
+            index=models.Index(fields=['-usage_count', '-created_at'], name='chatbotfaq_usage_idx'),
+        ),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.mail import send_mail
 import os
+import uuid
 from decimal import Decimal
-from datetime import timedelta
+from datetime import datetime, timedelta
+
+from .storage import blob_storage, protected_storage
 
 User = get_user_model()
 
@@ -53,6 +56,9 @@ class Event(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
         related_name="created_events", limit_choices_to={'role__in': ['SUPERADMIN', 'SYNDIC']})
     created_at = models.DateTimeField(auto_now_add=True)
+    next_reminder_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False,
+        help_text="Prochain envoi du rappel (vide une fois le rappel envoyé)")
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ["-start_at"]
@@ -60,6 +66,38 @@ class Event(models.Model):
     def __str__(self):
         return f"{self.title} - {self.start_at:%Y-%m-%d %H:%M}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule = (
+            instance.__dict__.get('start_at'),
+            instance.__dict__.get('reminder_minutes_before'),
+        )
+        return instance
+
+    @property
+    def reminder_fire_at(self):
+        """Date d'envoi du rappel"""
+        return self.start_at - timedelta(minutes=self.reminder_minutes_before)
+
+    def schedule_reminder(self):
+        """(Re)planifier le rappel ; aucun rappel pour un événement déjà commencé"""
+        if self.start_at and self.start_at > timezone.now():
+            self.next_reminder_at = self.reminder_fire_at
+        else:
+            self.next_reminder_at = None
+
+    def save(self, *args, **kwargs):
+        # Replanifier à la création ou si la date / le délai de rappel a changé
+        schedule = (self.start_at, self.reminder_minutes_before)
+        if self._state.adding or getattr(self, '_loaded_schedule', None) != schedule:
+            self.schedule_reminder()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'next_reminder_at'}
+        super().save(*args, **kwargs)
+        self._loaded_schedule = schedule
+
 class ResidentReport(models.Model):
     """General reports submitted by residents for various issues and feedback."""
     REPORT_CATEGORIES = [
@@ -88,7 +126,7 @@ class ResidentReport(models.Model):
     title = models.CharField(max_length=200, verbose_name="Titre du rapport")
     description = models.TextField(verbose_name="Description détaillée", default="Description non fournie")
     category = models.CharField(max_length=20, choices=REPORT_CATEGORIES, default="OTHER", verbose_name="Catégorie")
-    photo = models.ImageField(upload_to="reports/%Y/%m/", null=True, blank=True, verbose_name="Photo (optionnelle)")
+    photo = models.ImageField(upload_to="reports/%Y/%m/", storage=blob_storage, null=True, blank=True, verbose_name="Photo (optionnelle)")
     location = models.CharField(max_length=200, blank=True, null=True, verbose_name="Localisation (optionnelle)")
     status = models.CharField(max_length=20, choices=STATUS, default="NEW", verbose_name="Statut")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
@@ -111,6 +149,13 @@ class ResidentReport(models.Model):
     def __str__(self):
         return f"{self.title} - {self.resident.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Photo chargée, pour ajuster les références du stockage si elle change
+        instance._loaded_file = instance.__dict__.get('photo')
+        return instance
+
     def get_status_display_color(self):
         """Return Bootstrap color class for status."""
         colors = {
@@ -139,6 +184,17 @@ class ReportComment(models.Model):
         return f"Commentaire sur {self.report.title} par {self.author.username}"
 
 
+# Délai de paiement (en jours) par type de document ; None = aucun montant exigible.
+# Surchargeable via settings.DOCUMENT_PAYMENT_TERMS_DAYS.
+DEFAULT_PAYMENT_TERMS_DAYS = {
+    'INVOICE': 30,
+    'REMINDER': 30,
+    'OTHER': 30,
+    'NOTICE': None,
+    'LEGAL': None,
+}
+
+
 class Document(models.Model):
     """Documents uploaded by syndic for residents"""
     DOCUMENT_TYPES = [
@@ -150,7 +206,7 @@ class Document(models.Model):
     ]
     
     title = models.CharField(max_length=200, help_text="Titre du document")
-    file = models.FileField(upload_to='documents/%Y/%m/', help_text="Fichier du document")
+    file = models.FileField(upload_to='documents/%Y/%m/', storage=blob_storage, help_text="Fichier du document")
     amount = models.DecimalField(max_digits=10, decimal_places=2, help_text="Montant en DH")
     date = models.DateField(default=timezone.now, help_text="Date du document")
     document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES, default='INVOICE')
@@ -160,6 +216,10 @@ class Document(models.Model):
                                    limit_choices_to={'role__in': ['SUPERADMIN', 'SYNDIC']})
     description = models.TextField(blank=True, help_text="Description du document")
     is_paid = models.BooleanField(default=False, help_text="Document payé")
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'), editable=False,
+                                      help_text="Total des paiements enregistrés en DH")
+    due_date = models.DateField(null=True, blank=True, editable=False,
+                                help_text="Date d'échéance (selon le type de document)")
     is_archived = models.BooleanField(default=False)
     archived_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -167,23 +227,107 @@ class Document(models.Model):
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Impayés : index couvrant des documents ouverts par échéance
+            models.Index(fields=['is_paid', 'is_archived', 'due_date', 'resident', 'amount'], name='document_unpaid_due_idx'),
+            # Listes courantes : index partiels limités aux documents non archivés
+            models.Index(fields=['-date'], condition=models.Q(is_archived=False), name='document_active_date_idx'),
+            models.Index(fields=['resident', '-date'], condition=models.Q(is_archived=False), name='document_active_resident_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.resident.username} - {self.amount} DH"
 
+    @staticmethod
+    def payment_term_days(document_type):
+        """Délai de paiement du type de document, ou None s'il n'y a rien à payer"""
+        from django.conf import settings
+        terms = {**DEFAULT_PAYMENT_TERMS_DAYS, **getattr(settings, 'DOCUMENT_PAYMENT_TERMS_DAYS', {})}
+        return terms.get(document_type, DEFAULT_PAYMENT_TERMS_DAYS['INVOICE'])
+
+    @classmethod
+    def compute_due_date(cls, date, document_type):
+        """Date d'échéance selon le délai de paiement du type de document"""
+        term = cls.payment_term_days(document_type)
+        if term is None or date is None:
+            return None
+        if isinstance(date, datetime):
+            # Valeur par défaut du champ (timezone.now) avant enregistrement
+            date = timezone.localdate(date) if timezone.is_aware(date) else date.date()
+        return date + timedelta(days=term)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, pour ne recomptabiliser le document que s'il change
+        instance._loaded_ledger = instance.ledger_key
+        instance._loaded_file = instance.__dict__.get('file')
+        return instance
+
+    @property
+    def ledger_key(self):
+        """Champs qui déterminent l'écriture comptable du document"""
+        return (self.__dict__.get('resident_id'), self.__dict__.get('amount'), self.__dict__.get('document_type'))
+
+    def save(self, *args, **kwargs):
+        self.due_date = self.compute_due_date(self.date, self.document_type)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'due_date'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def apply_payment_delta(cls, document_id, delta):
+        """Ajouter ``delta`` au montant payé et recalculer is_paid, en un seul UPDATE sans lecture"""
+        if document_id is None or not delta:
+            return 0
+        new_paid_amount = models.F('paid_amount') + delta
+        # is_paid est assigné en premier : MySQL évalue les affectations dans l'ordre
+        return cls.objects.filter(pk=document_id).update(
+            is_paid=models.Case(
+                models.When(amount__lte=new_paid_amount, then=models.Value(True)),
+                default=models.Value(False),
+            ),
+            paid_amount=new_paid_amount,
+        )
+
+    @classmethod
+    def apply_payment_deltas(cls, deltas):
+        """Version groupée d'apply_payment_delta : {document_id: delta} en un seul UPDATE"""
+        deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+        if not deltas:
+            return 0
+        delta = models.Case(
+            *[models.When(pk=pk, then=models.Value(value)) for pk, value in deltas.items()],
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        new_paid_amount = models.F('paid_amount') + delta
+        return cls.objects.filter(pk__in=list(deltas)).update(
+            is_paid=models.Case(
+                models.When(amount__lte=new_paid_amount, then=models.Value(True)),
+                default=models.Value(False),
+            ),
+            paid_amount=new_paid_amount,
+        )
+
+    @property
+    def remaining_amount(self):
+        """Montant restant à payer"""
+        return max(self.amount - self.paid_amount, Decimal('0'))
+
     @property
     def is_overdue(self):
-        """Check if document is overdue (more than 30 days old and not paid)"""
-        if self.is_paid:
+        """Check if document is overdue (past its due date and not paid)"""
+        if self.is_paid or self.due_date is None:
             return False
-        return (timezone.now().date() - self.date).days > 30
+        return timezone.now().date() > self.due_date
 
     @property
     def days_overdue(self):
         """Number of days overdue"""
-        if self.is_paid:
+        if self.is_paid or self.due_date is None:
             return 0
-        return max(0, (timezone.now().date() - self.date).days - 30)
+        return max(0, (timezone.now().date() - self.due_date).days)
 
     @property
     def status(self):
@@ -203,15 +347,10 @@ class Document(models.Model):
         else:
             return 'pending'
 
-    @property
-    def due_date(self):
-        """Calculate due date (30 days after document date)"""
-        return self.date + timezone.timedelta(days=30)
-
     @property
     def is_due_soon(self):
         """Check if document is due within 7 days"""
-        if self.is_paid:
+        if self.is_paid or self.due_date is None:
             return False
         days_until_due = (self.due_date - timezone.now().date()).days
         return 0 <= days_until_due <= 7
@@ -314,28 +453,87 @@ class Payment(models.Model):
     payment_date = models.DateField(default=timezone.now)
     reference = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
-    payment_proof = models.ImageField(upload_to='payment_proofs/%Y/%m/', blank=True, null=True)
+    payment_proof = models.ImageField(upload_to='payment_proofs/%Y/%m/', storage=blob_storage, blank=True, null=True)
+    payment_proof_sha256 = models.CharField(max_length=64, blank=True, db_index=True, editable=False,
+                                            help_text="Empreinte du justificatif (déduplication)")
     is_verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, 
                                    related_name='verified_payments',
                                    limit_choices_to={'role__in': ['SUPERADMIN', 'SYNDIC']})
     verified_at = models.DateTimeField(null=True, blank=True)
+    # Paiement refusé à la vérification : il ne compte plus dans le montant payé
+    is_rejected = models.BooleanField(default=False)
+    rejection_reason = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['is_verified', 'is_rejected', 'id'], name='payment_verification_idx'),
+        ]
 
     def __str__(self):
         return f"Paiement {self.document.title} - {self.amount} DH - {self.payment_date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, pour appliquer la différence au document lors d'une modification
+        instance._loaded_document = instance.settlement
+        instance._loaded_file = instance.__dict__.get('payment_proof')
+        return instance
+
+    @property
+    def settlement(self):
+        """(document, montant) comptés dans le montant payé ; rien pour un paiement refusé"""
+        if self.__dict__.get('is_rejected'):
+            return (None, None)
+        return (self.__dict__.get('document_id'), self.__dict__.get('amount'))
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update document payment status
-        total_paid = self.document.payments.aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0')
-        self.document.is_paid = total_paid >= self.document.amount
-        self.document.save()
+        previous_document_id, previous_amount = getattr(self, '_loaded_document', (None, None))
+        document_id, amount = self.settlement
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Mise à jour incrémentale du montant payé du document
+            if previous_document_id == document_id:
+                Document.apply_payment_delta(document_id, (amount or 0) - (previous_amount or 0))
+            else:
+                Document.apply_payment_delta(previous_document_id, -(previous_amount or 0))
+                Document.apply_payment_delta(document_id, amount or 0)
+        self._loaded_document = self.settlement
+
+
+class PaymentProofUpload(models.Model):
+    """Envoi par morceaux (reprenable) d'un justificatif de paiement"""
+    STATUSES = [
+        ('PENDING', 'En cours'),
+        ('COMPLETE', 'Terminé'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='proof_uploads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='proof_uploads')
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Envoi de justificatif"
+        verbose_name_plural = "Envois de justificatifs"
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received_size}/{self.total_size} octets)"
+
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
 
 
 class Depense(models.Model):
@@ -373,7 +571,7 @@ class Depense(models.Model):
 
 
 class ResidentStatus(models.Model):
-    """Track resident payment status"""
+    """Compte du résident : totaux courants tenus à jour par le grand livre (LedgerEntry)"""
     resident = models.OneToOneField(User, on_delete=models.CASCADE, related_name='status',
                                    limit_choices_to={'role': 'RESIDENT'})
     total_due = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
@@ -405,18 +603,206 @@ class ResidentStatus(models.Model):
             return 'critical'
 
     def update_totals(self):
-        """Update totals from documents and payments"""
-        # Calculate total due from unpaid documents
-        unpaid_docs = self.resident.documents.filter(is_paid=False)
-        self.total_due = sum(doc.amount for doc in unpaid_docs)
-        
-        # Calculate total paid from all payments
-        all_payments = Payment.objects.filter(document__resident=self.resident)
-        self.total_paid = sum(payment.amount for payment in all_payments)
-        
+        """Recalculer les totaux à partir des écritures du grand livre"""
+        totals = LedgerEntry.objects.filter(resident=self.resident_id).aggregate(
+            debit=models.Sum('amount', filter=models.Q(debit_account=LedgerEntry.RECEIVABLE)),
+            credit=models.Sum('amount', filter=models.Q(credit_account=LedgerEntry.RECEIVABLE)),
+        )
+        self.total_due = totals['debit'] or Decimal('0')
+        self.total_paid = totals['credit'] or Decimal('0')
         self.save()
 
 
+class LedgerEntry(models.Model):
+    """Écriture du grand livre (en partie double, jamais modifiée ni supprimée).
+
+    Chaque écriture débite un compte et en crédite un autre. Le compte
+    copropriétaire (411) porte le solde du résident : débité à l'émission d'un
+    document, crédité par un paiement. Une correction passe par une nouvelle
+    écriture d'ajustement ou d'extourne.
+    """
+    RECEIVABLE = '411'
+    INCOME = '701'
+    CASH = '512'
+    ADJUSTMENTS = '658'
+    ACCOUNTS = [
+        (RECEIVABLE, 'Copropriétaires'),
+        (INCOME, 'Charges appelées'),
+        (CASH, 'Banque / caisse'),
+        (ADJUSTMENTS, 'Ajustements'),
+    ]
+    KINDS = [
+        ('DOCUMENT', 'Émission de document'),
+        ('PAYMENT', 'Paiement'),
+        ('ADJUSTMENT', 'Ajustement'),
+        ('REVERSAL', 'Extourne'),
+    ]
+
+    resident = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_entries')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    debit_account = models.CharField(max_length=10, choices=ACCOUNTS)
+    credit_account = models.CharField(max_length=10, choices=ACCOUNTS)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_date = models.DateField(default=timezone.localdate)
+    description = models.CharField(max_length=255, blank=True)
+    # Pas de contrainte : l'écriture garde la référence après suppression de la pièce
+    document = models.ForeignKey(Document, on_delete=models.DO_NOTHING, db_constraint=False,
+                                 null=True, blank=True, related_name='ledger_entries')
+    payment = models.ForeignKey(Payment, on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, blank=True, related_name='ledger_entries')
+    reversal_of = models.ForeignKey('self', on_delete=models.DO_NOTHING, db_constraint=False,
+                                    null=True, blank=True, related_name='reversals')
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2,
+                                        help_text="Solde du résident après cette écriture")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='ledger_entries_created')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-pk']
+        verbose_name = "Écriture comptable"
+        verbose_name_plural = "Écritures comptables"
+        indexes = [
+            models.Index(fields=['resident', 'entry_date'], name='ledger_resident_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.debit_account}/{self.credit_account} {self.amount} DH"
+
+    @property
+    def receivable_delta(self):
+        """Effet de l'écriture sur le solde du résident"""
+        if self.debit_account == self.RECEIVABLE:
+            return self.amount
+        if self.credit_account == self.RECEIVABLE:
+            return -self.amount
+        return Decimal('0')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Les écritures comptables ne peuvent pas être modifiées")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Les écritures comptables ne peuvent pas être supprimées")
+
+
+class LedgerCheckpoint(models.Model):
+    """Solde d'un résident arrêté en fin de mois, pour les soldes à date"""
+    resident = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    as_of = models.DateField()
+    total_debit = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    total_credit = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-as_of']
+        unique_together = ['resident', 'as_of']
+        verbose_name = "Arrêté de solde"
+        verbose_name_plural = "Arrêtés de solde"
+
+    def __str__(self):
+        return f"{self.resident.username} au {self.as_of} - {self.balance} DH"
+
+    @property
+    def balance(self):
+        return self.total_debit - self.total_credit
+
+
+class BankStatementImport(models.Model):
+    """Import d'un relevé bancaire et résultat du rapprochement"""
+    FORMATS = [
+        ('CSV', 'CSV'),
+        ('OFX', 'OFX'),
+        ('CAMT', 'CAMT.053'),
+        ('MT940', 'MT940'),
+    ]
+    STATUSES = [
+        ('RUNNING', 'En cours'),
+        ('DONE', 'Terminé'),
+        ('FAILED', 'Échec'),
+    ]
+
+    file_name = models.CharField(max_length=255)
+    file_format = models.CharField(max_length=10, choices=FORMATS)
+    status = models.CharField(max_length=10, choices=STATUSES, default='RUNNING')
+    imported_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='bank_imports')
+    row_count = models.PositiveIntegerField(default=0)
+    matched_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    duplicate_count = models.PositiveIntegerField(default=0)
+    ignored_count = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Import de relevé bancaire"
+        verbose_name_plural = "Imports de relevés bancaires"
+
+    def __str__(self):
+        return f"{self.file_name} ({self.get_file_format_display()}) - {self.started_at:%d/%m/%Y}"
+
+    @property
+    def match_rate(self):
+        """Pourcentage de lignes créditrices rapprochées automatiquement"""
+        credits = self.matched_count + self.review_count
+        return round(self.matched_count * 100 / credits, 1) if credits else 0
+
+    @property
+    def rows_per_second(self):
+        return round(self.row_count * 1000 / self.duration_ms) if self.duration_ms else 0
+
+
+class BankTransaction(models.Model):
+    """Ligne de relevé bancaire ; les lignes non rapprochées forment la file de revue"""
+    STATUSES = [
+        ('MATCHED', 'Rapprochée'),
+        ('REVIEW', 'À vérifier'),
+        ('IGNORED', 'Ignorée'),
+    ]
+    MATCH_METHODS = [
+        ('PAYMENT_REFERENCE', 'Paiement (référence)'),
+        ('PAYMENT_AMOUNT', 'Paiement (montant et date)'),
+        ('DOCUMENT_REFERENCE', 'Document (référence)'),
+        ('DOCUMENT_RESIDENT', 'Document (montant et nom)'),
+        ('MANUAL', 'Manuel'),
+    ]
+
+    statement_import = models.ForeignKey(BankStatementImport, on_delete=models.CASCADE, related_name='transactions')
+    account = models.CharField(max_length=64, blank=True)
+    booking_date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2, help_text="Positif = crédit")
+    currency = models.CharField(max_length=3, blank=True)
+    reference = models.CharField(max_length=140, blank=True)
+    counterparty = models.CharField(max_length=140, blank=True)
+    description = models.CharField(max_length=255, blank=True)
+    fingerprint = models.CharField(max_length=64, unique=True, help_text="Empreinte pour ignorer les lignes déjà importées")
+    status = models.CharField(max_length=10, choices=STATUSES, default='REVIEW')
+    match_method = models.CharField(max_length=20, choices=MATCH_METHODS, blank=True)
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='bank_transactions')
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='bank_transactions')
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='reviewed_bank_transactions')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-booking_date', '-pk']
+        verbose_name = "Ligne de relevé bancaire"
+        verbose_name_plural = "Lignes de relevés bancaires"
+        indexes = [
+            models.Index(fields=['status', 'booking_date'], name='banktx_status_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.booking_date} {self.amount} {self.reference or self.description}"
+
+
 class OverdueNotificationLog(models.Model):
     """Log des notifications d'impayés envoyées pour éviter les doublons"""
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='overdue_notifications')
@@ -455,6 +841,8 @@ class ChatbotFAQ(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORIES, default='GENERAL')
     is_active = models.BooleanField(default=True)
     usage_count = models.PositiveIntegerField(default=0, help_text="Nombre d'utilisations")
+    helpful_count = models.PositiveIntegerField(default=0, help_text="Réponses jugées utiles")
+    not_helpful_count = models.PositiveIntegerField(default=0, help_text="Réponses jugées inutiles")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_faqs',
                                   limit_choices_to={'role__in': ['SUPERADMIN', 'SYNDIC']})
     created_at = models.DateTimeField(auto_now_add=True)
@@ -464,14 +852,17 @@ class ChatbotFAQ(models.Model):
         ordering = ['-usage_count', '-created_at']
         verbose_name = "Question Fréquente"
         verbose_name_plural = "Questions Fréquentes"
+        indexes = [
+            models.Index(fields=['-usage_count', '-created_at'], name='chatbotfaq_usage_idx'),
+        ]
     
     def __str__(self):
         return f"{self.question[:50]}... ({self.get_category_display()})"
     
     def increment_usage(self):
-        """Incrémenter le compteur d'utilisation"""
-        self.usage_count += 1
-        self.save(update_fields=['usage_count'])
+        """Compter une utilisation (écrite directement ou reportée par lots selon le cache, voir finance/faq_counters.py)"""
+        from .faq_counters import record
+        record(self.pk, 'usage_count')
 
 
 class ChatbotConversation(models.Model):
@@ -513,6 +904,242 @@ class ChatbotMessage(models.Model):
         return f"{self.get_message_type_display()} - {self.content[:50]}..."
 
 
+class QueuedEmail(models.Model):
+    """File d'attente des emails envoyés en différé par send_queued_emails"""
+    STATUS = [
+        ('PENDING', 'En attente'),
+        ('SENT', 'Envoyé'),
+        ('FAILED', 'Échec'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='queuedemail_status_idx'),
+        ]
+        verbose_name = "Email en attente"
+        verbose_name_plural = "Emails en attente"
+
+    def __str__(self):
+        return f"{self.subject} → {self.to_email} ({self.get_status_display()})"
+
+
+class ImageDerivative(models.Model):
+    """Variantes réduites (miniature, moyenne) d'une image stockée, produites par build_image_derivatives"""
+    STATUS = [
+        ('PENDING', 'En attente'),
+        ('READY', 'Prête'),
+        ('FAILED', 'Échec'),
+    ]
+
+    source = models.CharField(max_length=255, unique=True, help_text="Nom de stockage de l'image originale")
+    status = models.CharField(max_length=10, choices=STATUS, default='PENDING')
+    # {variante: {"width", "height", "webp", "jpeg"}}
+    variants = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='imagederivative_status_idx'),
+        ]
+        verbose_name = "Variante d'image"
+        verbose_name_plural = "Variantes d'images"
+
+    def __str__(self):
+        return f"{self.source} ({self.get_status_display()})"
+
+
+class StoredBlob(models.Model):
+    """Fichier du stockage adressé par contenu et son nombre de références"""
+    name = models.CharField(max_length=100, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now, help_text="Dernière variation du nombre de références")
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Fichier stocké"
+        verbose_name_plural = "Fichiers stockés"
+        indexes = [
+            # Ramassage : fichiers sans référence depuis le délai de grâce
+            models.Index(fields=['ref_count', 'updated_at'], name='storedblob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} réf.)"
+
+
+class SearchEntry(models.Model):
+    """Ligne de l'index de recherche plein texte (une par objet indexé, voir ``finance/search.py``)"""
+    KINDS = [
+        ('DOCUMENT', 'Document'),
+        ('REPORT', 'Rapport'),
+        ('NOTIFICATION', 'Notification'),
+        ('FAQ', 'Question fréquente'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                              help_text="Résident propriétaire (documents, rapports)")
+    is_active = models.BooleanField(default=True)
+    title = models.CharField(max_length=300)
+    excerpt = models.CharField(max_length=300, blank=True)
+    content = models.TextField(help_text="Texte indexé, en minuscules et sans accents")
+    date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = "Entrée de recherche"
+        verbose_name_plural = "Index de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_object_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'kind'], name='searchentry_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} - {self.title[:50]}"
+
+
+class PDFBatch(models.Model):
+    """Lot de génération de PDF (reçus, mises en demeure) et ses mesures"""
+    KINDS = [
+        ('RECEIPT', 'Reçu de paiement'),
+        ('FORMAL_NOTICE', 'Mise en demeure'),
+    ]
+    STATUS = [
+        ('RUNNING', 'En cours'),
+        ('DONE', 'Terminé'),
+        ('FAILED', 'Échec'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    status = models.CharField(max_length=10, choices=STATUS, default='RUNNING')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='pdf_batches')
+    total_count = models.PositiveIntegerField(default=0)
+    generated_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    workers = models.PositiveSmallIntegerField(default=1)
+    duration_ms = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Lot de PDF"
+        verbose_name_plural = "Lots de PDF"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.started_at:%d/%m/%Y %H:%M} ({self.generated_count}/{self.total_count})"
+
+    @property
+    def documents_per_second(self):
+        if not self.duration_ms:
+            return 0
+        return round(self.generated_count * 1000 / self.duration_ms, 1)
+
+
+class GeneratedPDF(models.Model):
+    """PDF produit par le serveur, rattaché au document (et au paiement pour un reçu)"""
+    kind = models.CharField(max_length=20, choices=PDFBatch.KINDS)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='generated_pdfs')
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='generated_pdfs')
+    batch = models.ForeignKey(PDFBatch, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='pdfs')
+    file = models.FileField(upload_to='generated/%Y/%m/', storage=protected_storage)
+    size = models.PositiveIntegerField(default=0)
+    render_ms = models.PositiveIntegerField(default=0, help_text="Durée de rendu du PDF (ms)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "PDF généré"
+        verbose_name_plural = "PDF générés"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - document #{self.document_id}"
+
+
+class ScheduledJob(models.Model):
+    """État persistant d'une tâche périodique exécutée par run_scheduler"""
+    MISFIRE_POLICIES = [
+        ('RUN_ONCE', 'Exécuter une seule fois au rattrapage'),
+        ('SKIP', 'Ignorer les exécutions manquées'),
+    ]
+
+    STATUS = [
+        ('NEVER', 'Jamais exécutée'),
+        ('RUNNING', 'En cours'),
+        ('SUCCESS', 'Succès'),
+        ('FAILED', 'Échec'),
+        ('SKIPPED', 'Ignorée (retard)'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    interval_seconds = models.PositiveIntegerField(help_text="Intervalle entre deux exécutions")
+    misfire_policy = models.CharField(max_length=20, choices=MISFIRE_POLICIES, default='RUN_ONCE')
+    is_enabled = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(db_index=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, choices=STATUS, default='NEVER')
+    last_error = models.TextField(blank=True)
+    last_node = models.CharField(max_length=100, blank=True, help_text="Nœud ayant exécuté la dernière fois")
+    # Métriques de durée
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    last_duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    max_duration_ms = models.PositiveIntegerField(default=0)
+    total_duration_ms = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Tâche planifiée"
+        verbose_name_plural = "Tâches planifiées"
+
+    def __str__(self):
+        return f"{self.name} ({self.get_last_status_display()})"
+
+    @property
+    def avg_duration_ms(self):
+        """Durée moyenne d'exécution"""
+        if not self.run_count:
+            return 0
+        return self.total_duration_ms // self.run_count
+
+
+class SchedulerLease(models.Model):
+    """Verrou à durée limitée pour élire le nœud leader du planificateur"""
+    name = models.CharField(max_length=100, unique=True)
+    holder = models.CharField(max_length=100, blank=True)
+    expires_at = models.DateTimeField()
+    acquired_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} → {self.holder or 'libre'}"
+
+
 # Mock functions for SMS and Email
 def send_sms(phone_number, message):
     """Mock SMS sending function - logs message instead of sending"""
@@ -0,0 +1,59 @@
+"""Création groupée de notifications in-app et mise en file des emails.
+
+Utilisé par les traitements par lots (rappels d'événements, etc.) pour éviter
+une requête ``INSERT`` par destinataire et un envoi SMTP synchrone par email.
+"""
+from django.db import transaction
+
+from .bulk import bulk_insert
+from .models import Notification, QueuedEmail
+from . import stats
+from .search import index_objects
+
+
+def bulk_notify(notifications):
+    """Créer des notifications et leurs destinataires en quelques requêtes.
+
+    ``notifications`` est une liste de couples ``(Notification non sauvegardée,
+    ids des destinataires)``. Retourne la liste des notifications créées.
+    """
+    if not notifications:
+        return []
+
+    instances = [notification for notification, _ in notifications]
+    with transaction.atomic():
+        bulk_insert(instances, key=['title', 'sender'])
+
+        Recipient = Notification.recipients.through
+        Recipient.objects.bulk_create(
+            [
+                Recipient(notification_id=notification.pk, user_id=user_id)
+                for notification, user_ids in notifications
+                for user_id in set(user_ids)
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        index_objects(instances)
+        stats.invalidate('notifications')
+    return instances
+
+
+def queue_emails(messages):
+    """Mettre des emails en file d'attente.
+
+    ``messages`` est une liste de dictionnaires avec les clés ``to_email``,
+    ``subject``, ``body`` et optionnellement ``html_body``.
+    """
+    emails = [
+        QueuedEmail(
+            to_email=message['to_email'],
+            subject=message['subject'][:255],
+            body=message['body'],
+            html_body=message.get('html_body', ''),
+        )
+        for message in messages
+        if message.get('to_email')
+    ]
+    QueuedEmail.objects.bulk_create(emails, batch_size=1000)
+    return len(emails)
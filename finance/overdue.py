@@ -0,0 +1,87 @@
+"""Tranches d'ancienneté des impayés, exprimées en filtres SQL.
+
+Les tranches reprennent les seuils de ``detect_overdue_payments`` : échéance
+dans les 7 jours, puis 30-59, 60-89 et 90+ jours après l'échéance. Elles
+s'appuient sur la colonne indexée ``Document.due_date``.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Min, Q, Sum
+
+from .models import Document
+
+BUCKETS = [
+    # (clé, libellé, classe CSS)
+    ('due_soon', 'Échéances Proches (7 jours)', 'due-soon'),
+    ('overdue_30', 'Retards Modérés (30-59 jours)', 'overdue-30'),
+    ('overdue_60', 'Retards Importants (60-89 jours)', 'overdue-60'),
+    ('critical_90', 'Situations Critiques (90+ jours)', 'critical'),
+]
+
+OVERDUE_BUCKETS = ['overdue_30', 'overdue_60', 'critical_90']
+
+
+def bucket_filters(today):
+    """Filtre SQL de chaque tranche, sur la date d'échéance"""
+    def days_ago(days):
+        return today - timedelta(days=days)
+
+    return {
+        'due_soon': Q(due_date__gte=today, due_date__lte=today + timedelta(days=7)),
+        'overdue_30': Q(due_date__gt=days_ago(60), due_date__lte=days_ago(30)),
+        'overdue_60': Q(due_date__gt=days_ago(90), due_date__lte=days_ago(60)),
+        'critical_90': Q(due_date__lte=days_ago(90)),
+    }
+
+
+def unpaid_documents():
+    """Documents non payés et non archivés"""
+    return Document.objects.filter(is_paid=False, is_archived=False)
+
+
+def overdue_documents(today, queryset=None):
+    """Documents non payés dont l'échéance est dépassée"""
+    queryset = unpaid_documents() if queryset is None else queryset
+    return queryset.filter(due_date__lt=today)
+
+
+def bucket_totals(today, queryset=None):
+    """Nombre de documents et montant par tranche, en une seule requête"""
+    queryset = unpaid_documents() if queryset is None else queryset
+    aggregates = {}
+    for key, q in bucket_filters(today).items():
+        aggregates[f'{key}_count'] = Count('pk', filter=q)
+        aggregates[f'{key}_amount'] = Sum('amount', filter=q)
+    return open_bucket_documents(queryset, today).aggregate(**aggregates)
+
+
+def resident_rollup(today, queryset=None):
+    """Une ligne par résident et par tranche, calculée en une seule requête groupée.
+
+    Retourne {tranche: [{'resident_id', 'document_count', 'total_amount', 'oldest_due_date'}, ...]}.
+    """
+    queryset = unpaid_documents() if queryset is None else queryset
+    filters = bucket_filters(today)
+    aggregates = {}
+    for key, q in filters.items():
+        aggregates[f'{key}_count'] = Count('pk', filter=q)
+        aggregates[f'{key}_amount'] = Sum('amount', filter=q)
+        aggregates[f'{key}_oldest'] = Min('due_date', filter=q)
+
+    rollup = {key: [] for key in filters}
+    rows = open_bucket_documents(queryset, today).values('resident_id').annotate(**aggregates).order_by()
+    for row in rows:
+        for key in filters:
+            if row[f'{key}_count']:
+                rollup[key].append({
+                    'resident_id': row['resident_id'],
+                    'document_count': row[f'{key}_count'],
+                    'total_amount': row[f'{key}_amount'],
+                    'oldest_due_date': row[f'{key}_oldest'],
+                })
+    return rollup
+
+
+def open_bucket_documents(queryset, today):
+    """Restreindre aux documents pouvant appartenir à une tranche (plage d'index)"""
+    return queryset.filter(due_date__lte=today + timedelta(days=7))
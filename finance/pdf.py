@@ -0,0 +1,159 @@
+"""Écriture de PDF simples (texte, traits, cadres), sans dépendance externe.
+
+Suffisant pour les relevés, reçus et courriers générés par l'application :
+polices standard Helvetica / Helvetica-Bold (aucune police à embarquer),
+encodage WinAnsi pour les accents français, flux de page compressés.
+Les coordonnées sont en points, origine en haut à gauche de la page.
+"""
+import unicodedata
+import zlib
+
+A4 = (595.28, 841.89)
+
+# Chasses des caractères ASCII 32 à 126 (millièmes de corps), métriques Adobe
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+FONTS = {
+    False: ('F1', 'Helvetica', HELVETICA_WIDTHS),
+    True: ('F2', 'Helvetica-Bold', HELVETICA_BOLD_WIDTHS),
+}
+
+
+def char_width(char, widths):
+    code = ord(char)
+    if not 32 <= code <= 126:
+        # Lettre accentuée : même chasse que la lettre de base
+        base = unicodedata.normalize('NFKD', char)[:1]
+        code = ord(base) if base else 0
+    return widths[code - 32] if 32 <= code <= 126 else 556
+
+
+def text_width(text, size, bold=False):
+    widths = FONTS[bool(bold)][2]
+    return sum(char_width(char, widths) for char in text) * size / 1000
+
+
+def truncate(text, width, size, bold=False):
+    """Couper ``text`` pour qu'il tienne dans ``width`` points"""
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + '…', size, bold) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def escape(text):
+    data = text.encode('cp1252', 'replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def number(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+class Page:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.ops = []
+
+    def text(self, x, y, text, size=10, bold=False, align='left', gray=0):
+        """Écrire une ligne ; ``y`` est la ligne de base, ``x`` le bord gauche, droit ou centre"""
+        text = str(text)
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        elif align == 'center':
+            x -= text_width(text, size, bold) / 2
+        font = FONTS[bool(bold)][0]
+        self.ops.append(
+            b'BT %s g /%s %s Tf %s %s Td (%s) Tj ET' % (
+                number(gray).encode(), font.encode(), number(size).encode(),
+                number(x).encode(), number(self.height - y).encode(), escape(text),
+            )
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0):
+        self.ops.append(b'%s G %s w %s %s m %s %s l S' % tuple(
+            number(value).encode() for value in (gray, width, x1, self.height - y1, x2, self.height - y2)
+        ))
+
+    def rect(self, x, y, width, height, fill=0.92):
+        """Rectangle plein gris (``fill`` de 0 noir à 1 blanc) ; ``y`` est le bord haut"""
+        self.ops.append(b'%s g %s %s %s %s re f' % tuple(
+            number(value).encode() for value in (fill, x, self.height - y - height, width, height)
+        ))
+
+    def content(self):
+        return zlib.compress(b'\n'.join(self.ops))
+
+
+class PDFDocument:
+    def __init__(self, title='', size=A4):
+        self.title = title
+        self.size = size
+        self.pages = []
+
+    def new_page(self):
+        page = Page(*self.size)
+        self.pages.append(page)
+        return page
+
+    def render(self):
+        """Octets du fichier PDF"""
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages_id = add(None)
+        fonts = {
+            key: add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % name.encode())
+            for key, name, _ in FONTS.values()
+        }
+        resources = b'<< /Font << %s >> >>' % b' '.join(
+            b'/%s %d 0 R' % (key.encode(), object_id) for key, object_id in fonts.items()
+        )
+        page_ids = []
+        for page in self.pages or [self.new_page()]:
+            stream = page.content()
+            content_id = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            page_ids.append(add(
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Resources %s /Contents %d 0 R >>' % (
+                    pages_id, number(page.width).encode(), number(page.height).encode(), resources, content_id,
+                )
+            ))
+        objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id
+        objects[pages_id - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids)
+        )
+        info = add(b'<< /Title (%s) /Producer (Syndic Pro) >>' % escape(self.title))
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for object_id, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (object_id, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(objects) + 1, catalog, info, xref
+        )
+        return bytes(output)
@@ -0,0 +1,358 @@
+"""Génération par lots des PDF de l'application : reçus et mises en demeure.
+
+Chaque modèle de courrier est décrit une fois (liste d'éléments positionnés)
+et compilé au chargement du module : les chaînes à champs ``{...}`` sont
+analysées une seule fois puis réutilisées pour chaque PDF, dans chaque
+processus du lot. Les données sont lues dans le processus principal en une
+requête par lot ; les processus fils ne font que le rendu et l'écriture dans
+le stockage, et le processus principal rattache les fichiers aux documents
+en un ``bulk_create`` avec la durée de rendu de chacun.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from string import Formatter
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+from .models import GeneratedPDF, PDFBatch
+from .overdue import bucket_filters, unpaid_documents
+from .pdf import A4, PDFDocument, text_width
+
+# Délai laissé par une mise en demeure avant poursuites (jours)
+FORMAL_NOTICE_DAYS = 15
+
+
+def init_worker():
+    # Chaque processus ouvre ses propres connexions (y compris en mode "spawn")
+    django.setup()
+    connections.close_all()
+
+
+# ==================== MODÈLES COMPILÉS ====================
+
+def compile_format(fmt):
+    """Fonction ``contexte -> texte`` pour une chaîne à champs, analysée une fois"""
+    parts = list(Formatter().parse(fmt))
+    if all(field is None for _, field, _, _ in parts):
+        return lambda context: fmt
+
+    def render(context):
+        out = []
+        for literal, field, spec, _ in parts:
+            out.append(literal)
+            if field is not None:
+                out.append(format(context[field], spec or ''))
+        return ''.join(out)
+    return render
+
+
+def wrap(text, width, size, bold=False):
+    """Découper un paragraphe en lignes de largeur ``width`` points"""
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(candidate, size, bold) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+class CompiledTemplate:
+    """Modèle de page unique.
+
+    Éléments : ``('text', x, y, texte, options)``, ``('paragraph', x, y,
+    largeur, texte, options)``, ``('line', x1, y, x2, épaisseur)`` et
+    ``('rect', x, y, largeur, hauteur, gris)``. ``y`` est absolu (nombre) ou
+    relatif à la fin de l'élément précédent (chaîne ``'+12'``).
+    """
+
+    def __init__(self, title, elements):
+        self.title = compile_format(title)
+        self.ops = []
+        for element in elements:
+            kind = element[0]
+            if kind == 'text':
+                _, x, y, fmt, options = element
+                self.ops.append((kind, x, y, compile_format(fmt), options))
+            elif kind == 'paragraph':
+                _, x, y, width, fmt, options = element
+                self.ops.append((kind, x, y, width, compile_format(fmt), options))
+            else:
+                self.ops.append(element)
+
+    def render(self, context):
+        pdf = PDFDocument(title=self.title(context), size=A4)
+        page = pdf.new_page()
+        cursor = 0
+
+        def position(y):
+            return cursor + float(y) if isinstance(y, str) else y
+
+        for op in self.ops:
+            kind = op[0]
+            if kind == 'text':
+                _, x, y, text, options = op
+                cursor = position(y)
+                page.text(x, cursor, text(context), **options)
+            elif kind == 'paragraph':
+                _, x, y, width, text, options = op
+                size = options.get('size', 10)
+                leading = options.get('leading', size * 1.45)
+                cursor = position(y)
+                for number, line in enumerate(wrap(text(context), width, size, options.get('bold', False))):
+                    page.text(x, cursor + number * leading, line, size=size, bold=options.get('bold', False))
+                    last = cursor + number * leading
+                cursor = last
+            elif kind == 'line':
+                _, x1, y, x2, width = op
+                cursor = position(y)
+                page.line(x1, cursor, x2, cursor, width=width)
+            elif kind == 'rect':
+                _, x, y, width, height, fill = op
+                cursor = position(y)
+                page.rect(x, cursor, width, height, fill=fill)
+                cursor += height
+        return pdf.render()
+
+
+LEFT, RIGHT = 56, 539
+
+HEADER = [
+    ('text', LEFT, 64, '{syndic_name}', {'size': 14, 'bold': True}),
+    ('text', LEFT, '+15', '{syndic_address}', {'size': 9, 'gray': 0.35}),
+    ('text', RIGHT, 64, '{place_date}', {'size': 10, 'align': 'right'}),
+    ('line', LEFT, 100, RIGHT, 0.8),
+]
+
+RECEIPT = CompiledTemplate('Reçu de paiement {receipt_number}', HEADER + [
+    ('rect', LEFT, 126, RIGHT - LEFT, 34, 0.92),
+    ('text', LEFT + 12, 148, 'REÇU DE PAIEMENT', {'size': 16, 'bold': True}),
+    ('text', RIGHT - 12, 148, 'N° {receipt_number}', {'size': 11, 'bold': True, 'align': 'right'}),
+    ('text', LEFT, 200, 'Reçu de :', {'size': 10, 'gray': 0.35}),
+    ('text', LEFT + 110, 200, '{resident_name}', {'size': 11, 'bold': True}),
+    ('text', LEFT + 110, '+15', '{resident_apartment}', {'size': 10}),
+    ('text', LEFT, '+28', 'La somme de :', {'size': 10, 'gray': 0.35}),
+    ('text', LEFT + 110, '+0', '{amount} DH', {'size': 14, 'bold': True}),
+    ('text', LEFT, '+24', 'Mode de paiement :', {'size': 10, 'gray': 0.35}),
+    ('text', LEFT + 110, '+0', '{payment_method} - le {payment_date}', {'size': 10}),
+    ('text', LEFT, '+18', 'Référence :', {'size': 10, 'gray': 0.35}),
+    ('text', LEFT + 110, '+0', '{reference}', {'size': 10}),
+    ('text', LEFT, '+18', 'En règlement de :', {'size': 10, 'gray': 0.35}),
+    ('paragraph', LEFT + 110, '+0', RIGHT - LEFT - 110, '{document_title} (document n° {document_id} du {document_date})', {'size': 10}),
+    ('line', LEFT, '+22', RIGHT, 0.3),
+    ('text', LEFT, '+20', 'Montant du document : {document_amount} DH', {'size': 10}),
+    ('text', LEFT, '+15', 'Total réglé à ce jour : {paid_amount} DH', {'size': 10}),
+    ('text', LEFT, '+15', 'Reste à payer : {remaining_amount} DH', {'size': 10, 'bold': True}),
+    ('text', LEFT, '+30', 'Paiement vérifié le {verified_at} par {verified_by}.', {'size': 9, 'gray': 0.35}),
+    ('text', RIGHT, '+50', 'Le syndic', {'size': 11, 'bold': True, 'align': 'right'}),
+    ('text', LEFT, 790, 'Ce reçu est généré automatiquement et ne vaut que sous réserve d\'encaissement effectif.', {'size': 8, 'gray': 0.45}),
+])
+
+FORMAL_NOTICE = CompiledTemplate('Mise en demeure - document {document_id}', HEADER + [
+    ('text', 330, 150, '{resident_name}', {'size': 11, 'bold': True}),
+    ('text', 330, '+15', '{resident_apartment}', {'size': 10}),
+    ('text', 330, '+15', '{resident_address}', {'size': 10}),
+    ('text', LEFT, 230, 'LETTRE DE MISE EN DEMEURE', {'size': 14, 'bold': True}),
+    ('text', LEFT, '+22', 'Objet : mise en demeure de payer - {document_title}', {'size': 10, 'bold': True}),
+    ('text', LEFT, '+34', 'Madame, Monsieur,', {'size': 10}),
+    ('paragraph', LEFT, '+24', RIGHT - LEFT,
+     'Malgré nos précédents rappels, nous constatons que la somme de {remaining_amount} DH au titre de '
+     '« {document_title} » (document n° {document_id} du {document_date}, échéance du {due_date}) demeure '
+     'impayée à ce jour, soit {days_overdue} jours de retard.', {'size': 10}),
+    ('paragraph', LEFT, '+26', RIGHT - LEFT,
+     'Conformément à la loi n° 18-00 relative au statut de la copropriété des immeubles bâtis, nous vous '
+     'mettons en demeure de régler cette somme dans un délai de {notice_days} jours à compter de la '
+     'réception du présent courrier.', {'size': 10}),
+    ('paragraph', LEFT, '+26', RIGHT - LEFT,
+     'À défaut de règlement dans ce délai, le syndic se réserve le droit d\'engager, sans autre avis, '
+     'toute procédure de recouvrement, les frais correspondants restant à votre charge.', {'size': 10}),
+    ('paragraph', LEFT, '+26', RIGHT - LEFT,
+     'Si vous avez procédé au règlement entre-temps, nous vous prions de ne pas tenir compte de ce courrier.',
+     {'size': 10}),
+    ('text', LEFT, '+30', 'Veuillez agréer, Madame, Monsieur, nos salutations distinguées.', {'size': 10}),
+    ('text', RIGHT, '+50', 'Le syndic', {'size': 11, 'bold': True, 'align': 'right'}),
+    ('rect', LEFT, 700, RIGHT - LEFT, 50, 0.95),
+    ('text', LEFT + 10, 718, 'Montant dû : {remaining_amount} DH', {'size': 11, 'bold': True}),
+    ('text', LEFT + 10, 736, 'À régler au plus tard le {deadline}', {'size': 10}),
+])
+
+TEMPLATES = {
+    'RECEIPT': RECEIPT,
+    'FORMAL_NOTICE': FORMAL_NOTICE,
+}
+
+
+# ==================== DONNÉES ====================
+
+def money(value):
+    return f"{value:,.2f}".replace(',', ' ')
+
+
+def common_context():
+    today = timezone.localdate()
+    city = getattr(settings, 'SYNDIC_CITY', '')
+    return {
+        'syndic_name': getattr(settings, 'SYNDIC_NAME', 'SyndicPro'),
+        'syndic_address': getattr(settings, 'SYNDIC_ADDRESS', ''),
+        'place_date': f"{city}, le {today:%d/%m/%Y}" if city else f"Le {today:%d/%m/%Y}",
+    }
+
+
+def resident_context(resident):
+    return {
+        'resident_name': resident.get_full_name() or resident.username,
+        'resident_apartment': f"Appartement {resident.apartment}" if resident.apartment else '',
+        'resident_address': resident.address,
+    }
+
+
+def receipt_contexts(payments):
+    """Contextes des reçus, en une requête"""
+    base = common_context()
+    contexts = []
+    for payment in payments.select_related('document__resident', 'verified_by').order_by('pk'):
+        document = payment.document
+        contexts.append({
+            **base,
+            **resident_context(document.resident),
+            'key': (document.pk, payment.pk),
+            'file_name': f"recu_{payment.payment_date:%Y}_{payment.pk:06d}.pdf",
+            'receipt_number': f"R-{payment.payment_date:%Y}-{payment.pk:06d}",
+            'amount': money(payment.amount),
+            'payment_method': payment.get_payment_method_display(),
+            'payment_date': f"{payment.payment_date:%d/%m/%Y}",
+            'reference': payment.reference or '-',
+            'document_id': document.pk,
+            'document_title': document.title,
+            'document_date': f"{document.date:%d/%m/%Y}",
+            'document_amount': money(document.amount),
+            'paid_amount': money(document.paid_amount),
+            'remaining_amount': money(document.remaining_amount),
+            'verified_at': f"{timezone.localtime(payment.verified_at):%d/%m/%Y}" if payment.verified_at else '-',
+            'verified_by': (payment.verified_by.get_full_name() or payment.verified_by.username) if payment.verified_by else 'le syndic',
+        })
+    return contexts
+
+
+def notice_contexts(documents, today=None):
+    """Contextes des mises en demeure, en une requête"""
+    today = today or timezone.localdate()
+    base = common_context()
+    deadline = today + timedelta(days=FORMAL_NOTICE_DAYS)
+    contexts = []
+    for document in documents.select_related('resident').order_by('resident_id', 'pk'):
+        contexts.append({
+            **base,
+            **resident_context(document.resident),
+            'key': (document.pk, None),
+            'file_name': f"mise_en_demeure_{document.pk:06d}_{today:%Y%m%d}.pdf",
+            'document_id': document.pk,
+            'document_title': document.title,
+            'document_date': f"{document.date:%d/%m/%Y}",
+            'due_date': f"{document.due_date:%d/%m/%Y}" if document.due_date else '-',
+            'days_overdue': (today - document.due_date).days if document.due_date else 0,
+            'remaining_amount': money(document.remaining_amount),
+            'notice_days': FORMAL_NOTICE_DAYS,
+            'deadline': f"{deadline:%d/%m/%Y}",
+        })
+    return contexts
+
+
+def verified_payments_in_month(year, month):
+    from .models import Payment
+    return Payment.objects.filter(
+        is_verified=True, verified_at__year=year, verified_at__month=month, document__isnull=False
+    )
+
+
+def critical_documents(today=None):
+    """Documents impayés de la tranche 90+ jours"""
+    today = today or timezone.localdate()
+    return unpaid_documents().filter(bucket_filters(today)['critical_90'])
+
+
+# ==================== LOTS ====================
+
+def render_job(kind, context):
+    """Rendu d'un PDF et écriture dans le stockage (exécuté dans un processus du lot)"""
+    started = time.monotonic()
+    try:
+        data = TEMPLATES[kind].render(context)
+        render_ms = int((time.monotonic() - started) * 1000)
+        field = GeneratedPDF._meta.get_field('file')
+        name = field.storage.save(field.generate_filename(None, context['file_name']), ContentFile(data))
+    except Exception as e:
+        return context['key'], None, 0, 0, str(e)
+    return context['key'], name, len(data), render_ms, ''
+
+
+def run_batch(kind, contexts, user=None, workers=None):
+    """Rendre les PDF d'un lot (en parallèle si ``workers`` > 1) et les rattacher aux documents"""
+    workers = max(1, workers or getattr(settings, 'PDF_BATCH_WORKERS', os.cpu_count() or 1))
+    workers = min(workers, len(contexts)) or 1
+    batch = PDFBatch.objects.create(kind=kind, requested_by=user, total_count=len(contexts), workers=workers)
+    started = time.monotonic()
+    job = partial(render_job, kind)
+
+    try:
+        if workers > 1:
+            # Les connexions ne doivent pas être partagées avec les processus fils
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                results = list(pool.map(job, contexts, chunksize=max(1, len(contexts) // (workers * 4))))
+        else:
+            results = [job(context) for context in contexts]
+    except Exception as e:
+        PDFBatch.objects.filter(pk=batch.pk).update(
+            status='FAILED', error=str(e), finished_at=timezone.now(),
+            duration_ms=int((time.monotonic() - started) * 1000),
+        )
+        batch.refresh_from_db()
+        return batch
+
+    pdfs = []
+    errors = []
+    for (document_id, payment_id), name, size, render_ms, error in results:
+        if error:
+            errors.append(f"document #{document_id}: {error}")
+            continue
+        pdfs.append(GeneratedPDF(
+            kind=kind, document_id=document_id, payment_id=payment_id, batch=batch,
+            file=name, size=size, render_ms=render_ms,
+        ))
+    GeneratedPDF.objects.bulk_create(pdfs, batch_size=500)
+
+    PDFBatch.objects.filter(pk=batch.pk).update(
+        status='DONE',
+        generated_count=len(pdfs),
+        failed_count=len(errors),
+        error='\n'.join(errors[:50]),
+        duration_ms=int((time.monotonic() - started) * 1000),
+        finished_at=timezone.now(),
+    )
+    batch.refresh_from_db()
+    return batch
+
+
+def generate_receipts(payments, user=None, workers=None, force=False):
+    """Reçus des paiements donnés (ceux qui en ont déjà un sont ignorés sauf ``force``)"""
+    if not force:
+        payments = payments.exclude(generated_pdfs__kind='RECEIPT')
+    return run_batch('RECEIPT', receipt_contexts(payments), user=user, workers=workers)
+
+
+def generate_formal_notices(documents, user=None, workers=None):
+    """Mises en demeure des documents donnés"""
+    return run_batch('FORMAL_NOTICE', notice_contexts(documents), user=user, workers=workers)
@@ -0,0 +1,100 @@
+"""Droits d'accès aux objets, partagés par les pages de détail, les téléchargements et l'API.
+
+La règle est celle des listes : le syndic voit tout, un résident les objets
+qui le concernent (ses documents, rapports et paiements, les notifications
+qui lui sont adressées). ``OWNERS`` donne pour chaque modèle le chemin vers
+ce résident :
+
+* clé étrangère directe : comparaison des identifiants, sans requête ;
+* chemin par une relation ou plusieurs-à-plusieurs : une requête
+  ``EXISTS`` sur la clé primaire, sans charger la liste des destinataires.
+
+Un objet lu pour une requête est gardé sur celle-ci (``fetch_object``) : la
+vérification des droits et l'affichage partagent la même lecture.
+"""
+from django.contrib import messages
+from django.db.models import Exists, OuterRef
+from django.shortcuts import get_object_or_404, redirect
+
+from .models import Document, GeneratedPDF, Notification, Payment, ResidentReport
+
+STAFF_ROLES = ['SUPERADMIN', 'SYNDIC']
+
+# modèle -> chemin vers le résident qui y a accès
+OWNERS = {
+    Document: 'resident',
+    Payment: 'document__resident',
+    ResidentReport: 'resident',
+    GeneratedPDF: 'document__resident',
+    Notification: 'recipients',
+}
+
+
+def is_staff(user):
+    return user.is_authenticated and user.role in STAFF_ROLES
+
+
+def visible(user, queryset):
+    """Restreindre ``queryset`` aux objets accessibles à l'utilisateur"""
+    if is_staff(user):
+        return queryset
+    owner = OWNERS[queryset.model]
+    if queryset.model._meta.get_field(owner.split('__')[0]).many_to_many:
+        # EXISTS plutôt qu'une jointure : pas de doublons, pas de DISTINCT
+        through = queryset.model._meta.get_field(owner).remote_field.through
+        source = queryset.model._meta.model_name
+        return queryset.filter(Exists(through.objects.filter(**{source: OuterRef('pk'), 'user': user})))
+    return queryset.filter(**{owner: user})
+
+
+def can_access(user, obj):
+    if is_staff(user):
+        return True
+    if not user.is_authenticated:
+        return False
+    model = type(obj)
+    owner = OWNERS[model]
+    field = model._meta.get_field(owner.split('__')[0])
+    if field.many_to_one and '__' not in owner:
+        return getattr(obj, field.attname) == user.pk
+    return visible(user, model.objects.filter(pk=obj.pk)).exists()
+
+
+def fetch_object(request, model, pk, related=()):
+    """Objet ``pk`` du modèle, lu une seule fois par requête (404 s'il n'existe pas)"""
+    objects = request.__dict__.setdefault('_object_cache', {})
+    key = (model, str(pk))
+    if key not in objects:
+        objects[key] = get_object_or_404(model.objects.select_related(*related), pk=pk)
+    return objects[key]
+
+
+class ObjectPermissionMixin:
+    """Vue sur un objet protégé : lecture unique, puis contrôle d'accès avant tout traitement
+
+    ``protected_model`` : modèle contrôlé s'il diffère de ``model`` (commentaire
+    d'un rapport) ; ``related`` : relations chargées avec l'objet ;
+    ``object_kwarg`` : paramètre d'URL qui porte sa clé ; ``denied_url`` : page
+    de repli.
+    """
+    protected_model = None
+    related = []
+    object_kwarg = 'pk'
+    denied_url = 'finance:home'
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if not can_access(request.user, self.get_protected_object()):
+            messages.error(request, "Accès non autorisé.")
+            return redirect(self.denied_url)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_protected_object(self):
+        model = self.protected_model or self.model
+        return fetch_object(self.request, model, self.kwargs[self.object_kwarg], self.related)
+
+    def get_object(self, queryset=None):
+        if queryset is not None or self.protected_model not in (None, self.model):
+            return super().get_object(queryset)
+        return self.get_protected_object()
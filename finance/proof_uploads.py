@@ -0,0 +1,214 @@
+"""Envoi par morceaux et reprenable des justificatifs de paiement.
+
+Le client ouvre une session (taille et type déclarés, contrôlés côté serveur),
+puis envoie le fichier par morceaux à un décalage donné ; les morceaux sont
+écrits au fil de l'eau dans un fichier partiel, sans charger le fichier entier
+en mémoire. Une session interrompue reprend au dernier octet reçu.
+
+À la fin, le type réel est vérifié sur les premiers octets, l'empreinte
+SHA-256 est calculée en flux et un justificatif déjà stocké avec la même
+empreinte est réutilisé au lieu d'être copié une seconde fois.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import change_refs
+from .images import enqueue as enqueue_image
+from .models import Payment, PaymentProofUpload
+from .permissions import can_access, is_staff
+
+ALLOWED_TYPES = {
+    'image/jpeg': ('.jpg', '.jpeg'),
+    'image/png': ('.png',),
+    'image/gif': ('.gif',),
+    'image/webp': ('.webp',),
+}
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ProofUploadError(Exception):
+    """Envoi refusé ; ``status`` est le code HTTP à renvoyer"""
+
+    def __init__(self, message, status=400, discard=False, **extra):
+        super().__init__(message)
+        self.status = status
+        self.discard = discard
+        self.extra = extra
+
+
+def max_size():
+    return getattr(settings, 'PAYMENT_PROOF_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def chunk_size():
+    return getattr(settings, 'PAYMENT_PROOF_CHUNK_SIZE', 512 * 1024)
+
+
+def sniff_type(head):
+    """Type MIME d'après la signature du fichier, ou None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def part_path(upload):
+    directory = Path(getattr(settings, 'PAYMENT_PROOF_UPLOAD_DIR', Path(settings.BASE_DIR) / 'tmp' / 'proof_uploads'))
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{upload.upload_id}.part"
+
+
+def remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def can_upload(user, payment):
+    """Le syndic pour tout paiement, le résident pour ses paiements non vérifiés"""
+    return can_access(user, payment) and (is_staff(user) or not payment.is_verified)
+
+
+def start_upload(payment, user, file_name, content_type, total_size):
+    """Ouvrir une session d'envoi, ou reprendre la session en cours du même fichier"""
+    file_name = os.path.basename(file_name or '')[:255]
+    extension = os.path.splitext(file_name)[1].lower()
+    if content_type not in ALLOWED_TYPES or extension not in ALLOWED_TYPES[content_type]:
+        raise ProofUploadError("Format non accepté (JPEG, PNG, GIF ou WebP).", status=415)
+    if total_size <= 0:
+        raise ProofUploadError("Fichier vide.")
+    if total_size > max_size():
+        raise ProofUploadError(
+            f"Fichier trop volumineux (maximum {max_size() // (1024 * 1024)} Mo).", status=413
+        )
+
+    upload = PaymentProofUpload.objects.filter(
+        payment=payment, user=user, file_name=file_name, total_size=total_size, status='PENDING'
+    ).first()
+    if upload and part_path(upload).exists():
+        # Le fichier partiel peut être plus court que le compteur après un arrêt brutal
+        actual = part_path(upload).stat().st_size
+        if actual < upload.received_size:
+            PaymentProofUpload.objects.filter(pk=upload.pk).update(received_size=actual, updated_at=timezone.now())
+            upload.received_size = actual
+        return upload
+    if upload:
+        upload.delete()
+    return PaymentProofUpload.objects.create(
+        payment=payment, user=user, file_name=file_name,
+        content_type=content_type, total_size=total_size,
+    )
+
+
+def append_chunk(upload, offset, chunks):
+    """Écrire un morceau reçu à ``offset``. ``chunks`` est un itérable d'octets.
+
+    Les octets déjà reçus (renvoi après une coupure) sont ignorés. Retourne la
+    session à jour ; la session est finalisée quand le fichier est complet.
+    """
+    try:
+        with transaction.atomic():
+            return write_chunk(upload, offset, chunks)
+    except ProofUploadError as error:
+        if error.discard:
+            upload.delete()
+        raise
+
+
+def write_chunk(upload, offset, chunks):
+    # Verrou sur la session : les renvois concurrents du même morceau s'attendent
+    upload = PaymentProofUpload.objects.select_for_update().get(pk=upload.pk)
+    if upload.status != 'PENDING':
+        return upload
+    if offset > upload.received_size:
+        raise ProofUploadError(
+            "Morceau hors séquence.", status=409, offset=upload.received_size
+        )
+
+    skip = upload.received_size - offset
+    position = upload.received_size
+    path = part_path(upload)
+    with open(path, 'r+b' if path.exists() else 'wb') as part:
+        part.seek(position)
+        for data in chunks:
+            if skip:
+                dropped = min(skip, len(data))
+                data, skip = data[dropped:], skip - dropped
+            if not data:
+                continue
+            if position == 0 and sniff_type(data[:16]) is None:
+                raise ProofUploadError("Le contenu n'est pas une image valide.", status=415, discard=True)
+            if position + len(data) > upload.total_size:
+                raise ProofUploadError("Le fichier dépasse la taille annoncée.", status=413)
+            part.write(data)
+            position += len(data)
+        part.truncate(position)
+
+    upload.received_size = position
+    PaymentProofUpload.objects.filter(pk=upload.pk).update(received_size=position, updated_at=timezone.now())
+
+    if upload.is_complete:
+        upload = finalize_upload(upload)
+    return upload
+
+
+def finalize_upload(upload):
+    """Vérifier, hacher et rattacher le fichier complet au paiement (session verrouillée)"""
+    path = part_path(upload)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        head = part.read(16)
+        if sniff_type(head) != upload.content_type:
+            raise ProofUploadError("Le contenu ne correspond pas au format annoncé.", status=415, discard=True)
+        digest.update(head)
+        for block in iter(lambda: part.read(READ_BLOCK_SIZE), b''):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    payment = upload.payment
+    existing = (
+        Payment.objects.filter(payment_proof_sha256=sha256)
+        .exclude(payment_proof='')
+        .values_list('payment_proof', flat=True)
+        .first()
+    )
+    field = payment.payment_proof.field
+    if existing and field.storage.exists(existing):
+        name = existing
+    else:
+        with open(path, 'rb') as part:
+            name = field.storage.save(field.generate_filename(payment, upload.file_name), File(part))
+
+    # update() : le justificatif ne change ni le montant ni le document
+    Payment.objects.filter(pk=payment.pk).update(payment_proof=name, payment_proof_sha256=sha256)
+    if payment.payment_proof.name != name:
+        change_refs({name: 1, payment.payment_proof.name or '': -1})
+    PaymentProofUpload.objects.filter(pk=upload.pk).update(status='COMPLETE', sha256=sha256, updated_at=timezone.now())
+    transaction.on_commit(lambda: remove_part(upload))
+    enqueue_image(name)
+
+    payment.payment_proof.name = name
+    payment._loaded_file = name
+    payment.payment_proof_sha256 = sha256
+    upload.status = 'COMPLETE'
+    upload.sha256 = sha256
+    return upload
+
+
+def upload_whole_file(payment, user, uploaded_file):
+    """Envoi en une seule requête (formulaire classique), par le même chemin"""
+    upload = start_upload(payment, user, uploaded_file.name, uploaded_file.content_type, uploaded_file.size)
+    return append_chunk(upload, 0, uploaded_file.chunks())
@@ -0,0 +1,144 @@
+"""Envoi des rappels d'événements du calendrier.
+
+Chaque événement porte ``next_reminder_at`` (indexé), calculé à partir de
+``start_at - reminder_minutes_before`` et remis à zéro une fois le rappel
+envoyé. Le dispatcher ne lit donc que les rappels échus, par lots, sans
+parcourir toute la table ``Event``.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Event, Notification
+from .notifications import bulk_notify, queue_emails
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def get_system_user():
+    """Expéditeur par défaut des rappels automatiques"""
+    return (
+        User.objects.filter(role='SUPERADMIN').first()
+        or User.objects.filter(role='SYNDIC').first()
+    )
+
+
+def resolve_audiences(events):
+    """Destinataires de chaque événement : {event_id: [(id, email, prénom, nom, identifiant), ...]}"""
+    audiences = defaultdict(list)
+
+    if any(event.audience == 'ALL_RESIDENTS' for event in events):
+        residents = list(
+            User.objects.filter(role='RESIDENT', is_active=True)
+            .values_list('id', 'email', 'first_name', 'last_name', 'username')
+        )
+        for event in events:
+            if event.audience == 'ALL_RESIDENTS':
+                audiences[event.pk] = residents
+
+    specific_ids = [event.pk for event in events if event.audience != 'ALL_RESIDENTS']
+    if specific_ids:
+        Participant = Event.participants.through
+        rows = Participant.objects.filter(
+            event_id__in=specific_ids, user__is_active=True
+        ).values_list(
+            'event_id', 'user_id', 'user__email', 'user__first_name', 'user__last_name', 'user__username'
+        )
+        for event_id, *user in rows:
+            audiences[event_id].append(tuple(user))
+
+    return audiences
+
+
+def build_reminder(event):
+    """Titre et message du rappel"""
+    start = timezone.localtime(event.start_at)
+    title = f"Rappel: {event.title}"
+    message = (
+        f"{event.get_event_type_display()} le {start:%d/%m/%Y} à {start:%H:%M}."
+        + (f"\n\n{event.description}" if event.description else "")
+    )
+    return title, message
+
+
+def process_batch(events, now, sender):
+    """Envoyer les rappels d'un lot d'événements échus"""
+    upcoming = [event for event in events if event.start_at > now]
+    audiences = resolve_audiences(upcoming)
+
+    notifications = []
+    emails = []
+    for event in upcoming:
+        recipients = audiences.get(event.pk, [])
+        if not recipients:
+            continue
+        title, message = build_reminder(event)
+        event_sender = event.created_by_id or (sender.pk if sender else None)
+        if event_sender:
+            notifications.append((
+                Notification(
+                    title=title,
+                    message=message,
+                    notification_type='MEETING_NOTICE' if event.event_type == 'MEETING' else 'OTHER',
+                    priority='MEDIUM',
+                    sender_id=event_sender,
+                    is_active=True,
+                ),
+                [user_id for user_id, *_ in recipients],
+            ))
+        for user_id, email, first_name, last_name, username in recipients:
+            if not email:
+                continue
+            name = f"{first_name} {last_name}".strip() or username
+            emails.append({
+                'to_email': email,
+                'subject': title,
+                'body': f"Bonjour {name},\n\n{message}\n\nConnectez-vous pour consulter le calendrier.",
+            })
+
+    bulk_notify(notifications)
+    queue_emails(emails)
+    return len(notifications), len(emails)
+
+
+def dispatch_due_reminders(now=None, batch_size=BATCH_SIZE):
+    """Traiter tous les rappels échus. Retourne (événements, notifications, emails)."""
+    now = now or timezone.now()
+    sender = get_system_user()
+    totals = [0, 0, 0]
+
+    while True:
+        with transaction.atomic():
+            events = list(
+                Event.objects.select_for_update(skip_locked=True)
+                .filter(next_reminder_at__lte=now)
+                .order_by('next_reminder_at')
+                .only('id', 'title', 'description', 'event_type', 'start_at', 'audience', 'created_by')
+                [:batch_size]
+            )
+            if not events:
+                break
+
+            notified, emailed = process_batch(events, now, sender)
+
+            # Les événements déjà commencés sont simplement retirés de la file
+            sent_ids = [event.pk for event in events if event.start_at > now]
+            stale_ids = [event.pk for event in events if event.start_at <= now]
+            Event.objects.filter(pk__in=sent_ids, next_reminder_at__lte=now).update(
+                next_reminder_at=None, reminder_sent_at=now
+            )
+            Event.objects.filter(pk__in=stale_ids, next_reminder_at__lte=now).update(
+                next_reminder_at=None
+            )
+
+        totals[0] += len(events)
+        totals[1] += notified
+        totals[2] += emailed
+        if len(events) < batch_size:
+            break
+
+    return tuple(totals)
@@ -0,0 +1,219 @@
+"""Planificateur interne des tâches périodiques (remplace la crontab).
+
+Chaque tâche est enregistrée dans ``JOBS`` et son état (dernière exécution,
+prochaine exécution, politique de rattrapage, durées) est stocké dans
+``ScheduledJob``. Plusieurs nœuds peuvent lancer ``run_scheduler`` : un seul
+détient le bail ``SchedulerLease`` à un instant donné et exécute les tâches.
+"""
+import logging
+import os
+import random
+import socket
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import faq_counters
+from .models import ScheduledJob, SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_NAME = 'scheduler-leader'
+
+
+class Job:
+    """Définition d'une tâche périodique"""
+
+    def __init__(self, name, func, interval_seconds, misfire_policy='RUN_ONCE'):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.misfire_policy = misfire_policy
+
+    def __repr__(self):
+        return f"<Job {self.name} every {self.interval_seconds}s>"
+
+
+JOBS = {}
+
+
+def register_job(name, func, interval_seconds, misfire_policy='RUN_ONCE'):
+    """Enregistrer une tâche dans le planificateur"""
+    JOBS[name] = Job(name, func, interval_seconds, misfire_policy)
+    return JOBS[name]
+
+
+def command_job(command_name, *args, **options):
+    """Construire une tâche qui exécute une commande de gestion"""
+    def run():
+        output = StringIO()
+        call_command(command_name, *args, stdout=output, **options)
+        return output.getvalue()
+    run.__name__ = command_name
+    return run
+
+
+def get_setting(name):
+    """Réglage du planificateur ; les valeurs par défaut sont dans settings.py"""
+    return getattr(settings, name)
+
+
+def get_node_id():
+    """Identifiant de ce nœud (hôte + pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def jitter_delta():
+    """Décalage aléatoire pour éviter que toutes les tâches partent en même temps"""
+    jitter = get_setting('SCHEDULER_JITTER_SECONDS')
+    if jitter <= 0:
+        return timedelta(0)
+    return timedelta(seconds=random.uniform(0, jitter))
+
+
+def acquire_leadership(node_id, now=None):
+    """Prendre ou renouveler le bail de leader. Retourne True si ce nœud est leader."""
+    now = now or timezone.now()
+    ttl = timedelta(seconds=get_setting('SCHEDULER_LEASE_SECONDS'))
+
+    try:
+        with transaction.atomic():
+            SchedulerLease.objects.get_or_create(
+                name=LEADER_LEASE_NAME,
+                defaults={'holder': '', 'expires_at': now},
+            )
+    except IntegrityError:
+        # Un autre nœud vient de créer la ligne
+        pass
+
+    # UPDATE conditionnel : un seul nœud peut gagner le bail
+    updated = SchedulerLease.objects.filter(name=LEADER_LEASE_NAME).filter(
+        Q(holder=node_id) | Q(expires_at__lte=now)
+    ).update(holder=node_id, expires_at=now + ttl, acquired_at=now)
+    return updated == 1
+
+
+def release_leadership(node_id):
+    """Libérer le bail si ce nœud le détient"""
+    SchedulerLease.objects.filter(name=LEADER_LEASE_NAME, holder=node_id).update(
+        holder='', expires_at=timezone.now()
+    )
+
+
+def sync_jobs(now=None):
+    """Créer en base les tâches enregistrées qui n'existent pas encore"""
+    now = now or timezone.now()
+    existing = set(ScheduledJob.objects.filter(name__in=JOBS.keys()).values_list('name', flat=True))
+    for job in JOBS.values():
+        if job.name in existing:
+            continue
+        try:
+            with transaction.atomic():
+                ScheduledJob.objects.create(
+                    name=job.name,
+                    interval_seconds=job.interval_seconds,
+                    misfire_policy=job.misfire_policy,
+                    next_run_at=now + jitter_delta(),
+                )
+        except IntegrityError:
+            pass
+
+
+def compute_next_run(scheduled, now):
+    """Prochaine échéance alignée sur la grille d'exécution, strictement dans le futur"""
+    interval = timedelta(seconds=scheduled.interval_seconds)
+    next_run = scheduled.next_run_at
+    if next_run <= now:
+        missed = (now - next_run) // interval + 1
+        next_run = next_run + missed * interval
+    return next_run + jitter_delta()
+
+
+def run_job(scheduled, node_id, now=None):
+    """Exécuter une tâche échue si ce nœud parvient à la réserver.
+
+    Retourne le statut final, ou None si la tâche a été prise par un autre nœud.
+    """
+    now = now or timezone.now()
+    job = JOBS.get(scheduled.name)
+    if job is None:
+        return None
+
+    grace = timedelta(seconds=get_setting('SCHEDULER_MISFIRE_GRACE_SECONDS'))
+    misfired = now - scheduled.next_run_at > grace
+    next_run_at = compute_next_run(scheduled, now)
+
+    # Réservation optimiste : seul le nœud qui déplace next_run_at exécute la tâche
+    status = 'SKIPPED' if misfired and scheduled.misfire_policy == 'SKIP' else 'RUNNING'
+    claimed = ScheduledJob.objects.filter(
+        pk=scheduled.pk, next_run_at=scheduled.next_run_at
+    ).update(next_run_at=next_run_at, last_status=status, last_node=node_id)
+    if not claimed:
+        return None
+    if status == 'SKIPPED':
+        logger.info("Tâche %s ignorée (retard de %s)", job.name, now - scheduled.next_run_at)
+        return status
+
+    started = time.monotonic()
+    error = ''
+    try:
+        job.func()
+        status = 'SUCCESS'
+    except Exception as e:
+        status = 'FAILED'
+        error = str(e)
+        logger.exception("Échec de la tâche planifiée %s", job.name)
+    duration_ms = int((time.monotonic() - started) * 1000)
+
+    ScheduledJob.objects.filter(pk=scheduled.pk).update(
+        last_run_at=now,
+        last_status=status,
+        last_error=error,
+        last_duration_ms=duration_ms,
+        run_count=F('run_count') + 1,
+        failure_count=F('failure_count') + (1 if status == 'FAILED' else 0),
+        total_duration_ms=F('total_duration_ms') + duration_ms,
+    )
+    ScheduledJob.objects.filter(pk=scheduled.pk, max_duration_ms__lt=duration_ms).update(
+        max_duration_ms=duration_ms
+    )
+    logger.info("Tâche %s terminée: %s en %d ms", job.name, status, duration_ms)
+    return status
+
+
+def run_pending(node_id, now=None):
+    """Exécuter toutes les tâches échues. Retourne {nom: statut}."""
+    now = now or timezone.now()
+    results = {}
+    due_jobs = ScheduledJob.objects.filter(
+        is_enabled=True, next_run_at__lte=now, name__in=JOBS.keys()
+    ).order_by('next_run_at')
+    for scheduled in due_jobs:
+        status = run_job(scheduled, node_id)
+        if status:
+            results[scheduled.name] = status
+    return results
+
+
+# ==================== TÂCHES PAR DÉFAUT ====================
+
+register_job('detect_overdue_payments', command_job('detect_overdue_payments'), 24 * 3600)
+register_job('send_notification_digest', command_job('send_notification_digest'), 24 * 3600, 'SKIP')
+register_job('purge_expired_data', command_job('purge_expired_data'), 24 * 3600)
+register_job('refresh_resident_status', command_job('refresh_resident_status'), 3600, 'SKIP')
+register_job('send_event_reminders', command_job('send_event_reminders'), 60)
+register_job('send_queued_emails', command_job('send_queued_emails'), 60)
+register_job('reconcile_paid_amounts', command_job('reconcile_paid_amounts'), 24 * 3600, 'SKIP')
+register_job('build_ledger_checkpoints', command_job('build_ledger_checkpoints'), 24 * 3600)
+register_job('build_image_derivatives', command_job('build_image_derivatives'), 60)
+register_job('collect_blobs', command_job('collect_blobs'), 24 * 3600)
+register_job('archive_documents', command_job('archive_documents'), 24 * 3600)
+if faq_counters.buffered():
+    # Sans cache partagé, les compteurs des FAQ sont écrits directement en base
+    register_job('flush_faq_counters', command_job('flush_faq_counters'), 60)
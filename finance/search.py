@@ -0,0 +1,288 @@
+"""Recherche plein texte dans les documents, rapports, notifications et FAQ.
+
+Chaque objet indexé a une ligne ``SearchEntry`` (titre, extrait, texte en
+minuscules et sans accents, propriétaire) tenue à jour par les signaux et
+par les traitements par lots. L'index inversé dépend de la base :
+
+* SQLite : table virtuelle FTS5 ``finance_searchentry_fts`` alimentée par
+  triggers, classement ``bm25`` (le titre pèse plus que le texte) ;
+* PostgreSQL : colonne ``tsvector`` générée et index GIN, classement
+  ``ts_rank`` ;
+* autres moteurs : filtre par sous-chaîne, du plus récent au plus ancien.
+
+Au-delà de ``MAX_RANKED`` résultats, les plus récents passent d'abord : le
+score de dizaines de milliers de lignes coûte plus qu'il n'apporte.
+
+Les droits sont ceux des listes existantes : le syndic voit tout (sauf les
+notifications désactivées), un résident ses documents et rapports, les
+notifications qui lui sont adressées et les FAQ actives. Ils sont appliqués
+dans la requête, avant la pagination.
+"""
+import re
+import unicodedata
+from urllib.parse import urlencode
+
+from django.core.exceptions import FullResultSet
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import ChatbotFAQ, Document, Notification, ResidentReport, SearchEntry
+
+STAFF_ROLES = ['SUPERADMIN', 'SYNDIC']
+
+BATCH_SIZE = 1000
+EXCERPT_LENGTH = 300
+MAX_TERMS = 8
+MAX_RANKED = 2000
+
+TERM = re.compile(r'[^\W_]+')
+
+
+def fold(text):
+    """Minuscules sans accents ni ligatures : « Fenêtre cœur » -> « fenetre coeur »"""
+    text = str(text or '').lower().replace('œ', 'oe').replace('æ', 'ae')
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def excerpt(text):
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= EXCERPT_LENGTH else text[:EXCERPT_LENGTH - 1] + '…'
+
+
+# ==================== INDEXATION ====================
+
+def document_entry(document):
+    resident = document.resident
+    return SearchEntry(
+        kind='DOCUMENT',
+        object_id=document.pk,
+        owner_id=document.resident_id,
+        title=document.title,
+        excerpt=excerpt(document.description),
+        content=fold(' '.join([
+            document.title, document.description or '', document.get_document_type_display(),
+            resident.get_full_name(), resident.apartment or '',
+        ])),
+        date=document.date,
+    )
+
+
+def report_entry(report):
+    return SearchEntry(
+        kind='REPORT',
+        object_id=report.pk,
+        owner_id=report.resident_id,
+        title=report.title,
+        excerpt=excerpt(report.description),
+        content=fold(' '.join([
+            report.title, report.description or '', report.location or '', report.get_category_display(),
+        ])),
+        date=report.created_at.date() if report.created_at else None,
+    )
+
+
+def notification_entry(notification):
+    return SearchEntry(
+        kind='NOTIFICATION',
+        object_id=notification.pk,
+        is_active=notification.is_active,
+        title=notification.title,
+        excerpt=excerpt(notification.message),
+        content=fold(' '.join([notification.title, notification.message])),
+        date=notification.created_at.date() if notification.created_at else None,
+    )
+
+
+def faq_entry(faq):
+    return SearchEntry(
+        kind='FAQ',
+        object_id=faq.pk,
+        is_active=faq.is_active,
+        title=faq.question,
+        excerpt=excerpt(faq.answer),
+        content=fold(' '.join([faq.question, faq.keywords.replace(',', ' '), faq.answer])),
+        date=faq.created_at.date() if faq.created_at else None,
+    )
+
+
+# modèle -> (type d'entrée, constructeur, relations à charger pour la reconstruction)
+INDEXED = {
+    Document: ('DOCUMENT', document_entry, ['resident']),
+    ResidentReport: ('REPORT', report_entry, []),
+    Notification: ('NOTIFICATION', notification_entry, []),
+    ChatbotFAQ: ('FAQ', faq_entry, []),
+}
+
+
+def index_objects(instances):
+    """Créer ou remplacer les entrées des objets donnés (un ``INSERT … ON CONFLICT`` par lot)"""
+    entries = [INDEXED[type(instance)][1](instance) for instance in instances]
+    if entries:
+        SearchEntry.objects.bulk_create(
+            entries,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['owner', 'is_active', 'title', 'excerpt', 'content', 'date', 'updated_at'],
+        )
+
+
+def unindex_objects(model, ids):
+    SearchEntry.objects.filter(kind=INDEXED[model][0], object_id__in=list(ids)).delete()
+
+
+def rebuild(models=None):
+    """Réindexer tous les objets et retirer les entrées d'objets disparus. Retourne {type: nombre}."""
+    counts = {}
+    for model in models or INDEXED:
+        kind, _, related = INDEXED[model]
+        queryset = model.objects.select_related(*related).order_by('pk')
+        batch, counts[kind] = [], 0
+        for instance in queryset.iterator(chunk_size=BATCH_SIZE):
+            batch.append(instance)
+            if len(batch) == BATCH_SIZE:
+                index_objects(batch)
+                counts[kind] += len(batch)
+                batch = []
+        index_objects(batch)
+        counts[kind] += len(batch)
+        SearchEntry.objects.filter(kind=kind).exclude(object_id__in=model.objects.values('pk')).delete()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # Fusion des segments FTS5 après un chargement massif
+            cursor.execute("INSERT INTO finance_searchentry_fts(finance_searchentry_fts) VALUES ('optimize')")
+    return counts
+
+
+# ==================== RECHERCHE ====================
+
+def parse_terms(query):
+    return TERM.findall(fold(query))[:MAX_TERMS]
+
+
+def visible_entries(user, kinds=None):
+    """Entrées que l'utilisateur a le droit de voir"""
+    entries = SearchEntry.objects.all()
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    if user.role in STAFF_ROLES:
+        return entries.exclude(kind='NOTIFICATION', is_active=False)
+    received = Notification.recipients.through.objects.filter(user=user).values('notification_id')
+    return entries.filter(
+        Q(owner=user)
+        | Q(kind='FAQ', is_active=True)
+        | Q(kind='NOTIFICATION', is_active=True, object_id__in=received)
+    )
+
+
+def result_url(entry, user):
+    if entry.kind == 'DOCUMENT':
+        return reverse('finance:document_detail', args=[entry.object_id])
+    if entry.kind == 'REPORT':
+        return reverse('finance:report_detail', args=[entry.object_id])
+    if entry.kind == 'NOTIFICATION':
+        return reverse('finance:notification_detail', args=[entry.object_id])
+    if user.role in STAFF_ROLES:
+        return reverse('finance:chatbot_faq_management') + '?' + urlencode({'search': entry.title[:80]})
+    return reverse('finance:chatbot')
+
+
+class SearchResults:
+    """Résultats classés d'une recherche, découpables par ``Paginator``.
+
+    Seule la page demandée est lue : la requête plein texte renvoie les
+    identifiants classés avec ``LIMIT``/``OFFSET``, puis les entrées sont
+    chargées en une requête.
+    """
+
+    def __init__(self, user, query, kinds=None):
+        self.user = user
+        self.terms = parse_terms(query)
+        self.visible = visible_entries(user, kinds)
+        self._count = None
+
+    def _source(self):
+        """(FROM ... WHERE ..., paramètres) selon la base, None sans index plein texte"""
+        # Les droits sont repris comme conditions sur la table d'entrées, sans sous-requête IN
+        compiler = self.visible.query.get_compiler(connection=connection)
+        try:
+            visible_sql, visible_params = compiler.compile(self.visible.query.where)
+        except FullResultSet:
+            visible_sql, visible_params = '1 = 1', []
+        if connection.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in self.terms)
+            return (
+                "FROM finance_searchentry_fts "
+                "JOIN finance_searchentry ON finance_searchentry.id = finance_searchentry_fts.rowid "
+                f"WHERE finance_searchentry_fts MATCH %s AND {visible_sql}",
+                [match, *visible_params],
+            )
+        if connection.vendor == 'postgresql':
+            tsquery = ' & '.join(f"{term}:*" for term in self.terms)
+            return (
+                "FROM finance_searchentry, to_tsquery('french'::regconfig, %s) query "
+                f"WHERE finance_searchentry.search_vector @@ query AND {visible_sql}",
+                [tsquery, *visible_params],
+            )
+        return None
+
+    def _ordering(self):
+        if connection.vendor == 'sqlite':
+            if self.count() > MAX_RANKED:
+                # Terme présent presque partout : les plus récents d'abord, lus à rebours dans l'index FTS5
+                return "finance_searchentry_fts.rowid DESC"
+            return "bm25(finance_searchentry_fts, 5.0, 1.0), finance_searchentry.id DESC"
+        if self.count() > MAX_RANKED:
+            return "finance_searchentry.id DESC"
+        return "ts_rank(finance_searchentry.search_vector, query) DESC, finance_searchentry.id DESC"
+
+    def _fallback(self):
+        entries = self.visible
+        for term in self.terms:
+            entries = entries.filter(content__contains=term)
+        return entries.order_by('-date', '-pk')
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif (source := self._source()) is None:
+                self._count = self._fallback().count()
+            else:
+                sql, params = source
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SELECT COUNT(*) {sql}", params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if not isinstance(page, slice):
+            return self[page:page + 1][0]
+        if not self.terms:
+            return []
+        start = page.start or 0
+        limit = (page.stop if page.stop is not None else self.count()) - start
+        if limit <= 0:
+            return []
+        source = self._source()
+        if source is None:
+            entries = list(self._fallback()[start:start + limit])
+        else:
+            sql, params = source
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT finance_searchentry.id {sql} ORDER BY {self._ordering()} LIMIT %s OFFSET %s",
+                               [*params, limit, start])
+                ids = [row[0] for row in cursor.fetchall()]
+            by_id = SearchEntry.objects.in_bulk(ids)
+            entries = [by_id[pk] for pk in ids if pk in by_id]
+        for entry in entries:
+            entry.url = result_url(entry, self.user)
+        return entries
+
+    def object_ids(self, limit=1000):
+        """Identifiants des objets trouvés, les mieux classés d'abord"""
+        return [entry.object_id for entry in self[:limit]]
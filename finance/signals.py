@@ -1,6 +1,13 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Document, Payment, Notification, OperationLog, Depense
+from .models import ChatbotFAQ, Document, LedgerEntry, Payment, PaymentProofUpload, Notification, OperationLog, Depense, ResidentReport
+from .blobs import sync_file_refs
+from .ledger import sync_document, sync_payment
+from .proof_uploads import remove_part
+from .images import enqueue as enqueue_image
+from .search import index_objects, unindex_objects
+from .faq_matcher import invalidate as invalidate_faq_matcher
+from .stats import MODEL_FAMILIES, invalidate as invalidate_stats
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
@@ -99,6 +106,133 @@ def create_in_app_notification_for_document(sender, instance: Document, created:
         pass
 
 
+@receiver(post_save, sender=Document)
+def record_document_in_ledger(sender, instance: Document, created: bool, **kwargs):
+    """Débiter le compte du résident à l'émission d'un document (ou ajuster après modification)."""
+    if not created and getattr(instance, '_loaded_ledger', None) == instance.ledger_key:
+        return
+    sync_document(instance)
+    instance._loaded_ledger = instance.ledger_key
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def drop_resident_ledger(sender, instance, **kwargs):
+    """Supprimer d'abord le grand livre d'un utilisateur supprimé.
+
+    Ses documents et paiements partent en cascade : sans écriture comptabilisée,
+    leur suppression n'extourne rien au nom d'un compte qui disparaît.
+    """
+    LedgerEntry.objects.filter(resident=instance).delete()
+
+
+@receiver(post_delete, sender=Document)
+def reverse_document_in_ledger(sender, instance: Document, **kwargs):
+    """Extourner l'écriture d'un document supprimé."""
+    sync_document(instance, deleted=True)
+
+
+@receiver(post_save, sender=Payment)
+def record_payment_in_ledger(sender, instance: Payment, created: bool, **kwargs):
+    """Créditer le compte du résident pour un paiement (ou ajuster après modification)."""
+    if not created and getattr(instance, '_loaded_document', None) == instance.settlement:
+        return
+    sync_payment(instance)
+
+
+@receiver(post_delete, sender=Payment)
+def reverse_payment_in_ledger(sender, instance: Payment, **kwargs):
+    """Extourner l'écriture d'un paiement supprimé."""
+    sync_payment(instance, deleted=True)
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_document(sender, instance: Payment, **kwargs):
+    """Retirer le montant d'un paiement supprimé du total payé du document."""
+    if not instance.is_rejected:
+        Document.apply_payment_delta(instance.document_id, -instance.amount)
+
+
+@receiver(post_delete, sender=PaymentProofUpload)
+def remove_proof_upload_part(sender, instance: PaymentProofUpload, **kwargs):
+    """Supprimer le fichier partiel d'un envoi abandonné ou purgé."""
+    remove_part(instance)
+
+
+@receiver(post_save, sender=Payment)
+def queue_payment_proof_variants(sender, instance: Payment, **kwargs):
+    """Mettre en file les variantes réduites du justificatif."""
+    if instance.payment_proof:
+        enqueue_image(instance.payment_proof.name)
+
+
+@receiver(post_save, sender=ResidentReport)
+def queue_report_photo_variants(sender, instance: ResidentReport, **kwargs):
+    """Mettre en file les variantes réduites de la photo du signalement."""
+    if instance.photo:
+        enqueue_image(instance.photo.name)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=ResidentReport)
+def retain_stored_files(sender, instance, **kwargs):
+    """Compter les références au fichier joint (stockage adressé par contenu)."""
+    sync_file_refs(instance)
+
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=ResidentReport)
+def release_stored_files(sender, instance, **kwargs):
+    """Libérer la référence au fichier joint ; le fichier est ramassé plus tard s'il n'est plus utilisé."""
+    sync_file_refs(instance, deleted=True)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=ResidentReport)
+@receiver(post_save, sender=Notification)
+@receiver(post_save, sender=ChatbotFAQ)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Réindexer l'objet pour la recherche plein texte."""
+    if update_fields and set(update_fields) <= {'usage_count', 'updated_at'}:
+        # Compteur d'utilisation de la FAQ : rien d'indexé n'a changé
+        return
+    index_objects([instance])
+
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=ResidentReport)
+@receiver(post_delete, sender=Notification)
+@receiver(post_delete, sender=ChatbotFAQ)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Retirer l'objet supprimé de l'index de recherche."""
+    unindex_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=ChatbotFAQ)
+@receiver(post_delete, sender=ChatbotFAQ)
+def rebuild_faq_matcher(sender, instance, update_fields=None, **kwargs):
+    """Faire reconstruire l'automate des mots-clés de l'assistant."""
+    if update_fields and set(update_fields) <= {'usage_count', 'updated_at'}:
+        return
+    invalidate_faq_matcher()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def expire_cached_stats(sender, **kwargs):
+    """Rendre obsolètes les compteurs en cache des familles concernées par le modèle."""
+    families = MODEL_FAMILIES.get(sender)
+    if families:
+        invalidate_stats(*families)
+
+
+@receiver(m2m_changed, sender=Notification.recipients.through)
+def expire_notification_stats(sender, **kwargs):
+    """Les compteurs de notifications dépendent des destinataires."""
+    invalidate_stats('notifications')
+
+
 @receiver(post_save, sender=Payment)
 def notify_syndic_on_payment(sender, instance: Payment, created: bool, **kwargs):
     """When a resident records a payment, notify syndic via in-app (and email if available)."""
@@ -0,0 +1,167 @@
+"""Relevés de compte des résidents en PDF, avec cache disque.
+
+Le relevé d'une période est construit à partir d'une seule requête ordonnée
+sur le grand livre (émissions de documents, paiements, ajustements et
+extournes, avec leurs pièces en jointure) et d'un solde d'ouverture lu
+depuis les arrêtés mensuels. Le PDF est mis en cache sur disque sous une clé
+(résident, période, version des données) : la version change dès qu'une
+écriture de la période est passée, sinon le téléchargement relit le fichier.
+"""
+import hashlib
+import os
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .ledger import RECEIVABLE, balance_as_of
+from .models import LedgerEntry, User
+from .pdf import PDFDocument, truncate
+
+# À incrémenter quand la mise en page change, pour invalider le cache
+LAYOUT_VERSION = 1
+
+MARGIN = 40
+ROW_HEIGHT = 16
+COLUMNS = [
+    # (titre, bord gauche ou droit, alignement)
+    ('Date', MARGIN, 'left'),
+    ('Libellé', MARGIN + 62, 'left'),
+    ('Débit', 400, 'right'),
+    ('Crédit', 475, 'right'),
+    ('Solde', 555, 'right'),
+]
+
+
+def cache_dir():
+    return Path(getattr(settings, 'STATEMENT_CACHE_DIR', Path(settings.BASE_DIR) / 'tmp' / 'statements'))
+
+
+def data_version(resident_id, end):
+    """Version des données de la période : le grand livre n'est qu'en ajout"""
+    stats = LedgerEntry.objects.filter(resident_id=resident_id, entry_date__lte=end).aggregate(
+        count=Count('id'), last=Max('id')
+    )
+    return f"{LAYOUT_VERSION}-{stats['count']}-{stats['last'] or 0}"
+
+
+def cache_path(resident_id, start, end, version):
+    key = hashlib.sha1(version.encode()).hexdigest()[:12]
+    return cache_dir() / str(resident_id) / f"{start:%Y%m%d}_{end:%Y%m%d}_{key}.pdf"
+
+
+def entry_label(entry):
+    if entry.kind == 'DOCUMENT' and entry.document_id and entry.document:
+        return f"{entry.document.get_document_type_display()} n° {entry.document_id} - {entry.document.title}"
+    if entry.kind == 'PAYMENT' and entry.payment_id and entry.payment:
+        label = f"Paiement ({entry.payment.get_payment_method_display()})"
+        return f"{label} réf. {entry.payment.reference}" if entry.payment.reference else label
+    return entry.description
+
+
+def statement_lines(resident_id, start, end):
+    """Solde d'ouverture, lignes (date, libellé, débit, crédit, solde) et solde de clôture"""
+    opening = balance_as_of(resident_id, start - timedelta(days=1))
+    entries = (
+        LedgerEntry.objects.filter(resident_id=resident_id, entry_date__gte=start, entry_date__lte=end)
+        .filter(Q(debit_account=RECEIVABLE) | Q(credit_account=RECEIVABLE))
+        .select_related('document', 'payment')
+        .order_by('entry_date', 'pk')
+    )
+
+    balance = opening
+    lines = []
+    for entry in entries:
+        debit = entry.amount if entry.debit_account == RECEIVABLE else Decimal('0')
+        credit = entry.amount if entry.credit_account == RECEIVABLE else Decimal('0')
+        balance += debit - credit
+        lines.append((entry.entry_date, entry_label(entry), debit, credit, balance))
+    return opening, lines, balance
+
+
+def money(value):
+    return f"{value:,.2f}".replace(',', ' ') if value else ''
+
+
+def render_statement(resident, start, end):
+    """PDF du relevé (octets)"""
+    opening, lines, closing = statement_lines(resident.pk, start, end)
+    pdf = PDFDocument(title=f"Relevé de compte {resident.get_full_name() or resident.username}")
+    total_debit = sum((line[2] for line in lines), Decimal('0'))
+    total_credit = sum((line[3] for line in lines), Decimal('0'))
+
+    def new_page():
+        page = pdf.new_page()
+        page.text(MARGIN, 60, "Relevé de compte", size=18, bold=True)
+        page.text(MARGIN, 80, f"{resident.get_full_name() or resident.username}"
+                              f"{' - Appartement ' + resident.apartment if resident.apartment else ''}", size=11)
+        page.text(MARGIN, 96, f"Période du {start:%d/%m/%Y} au {end:%d/%m/%Y}", size=10, gray=0.35)
+        page.text(555, 60, f"Édité le {timezone.localdate():%d/%m/%Y}", size=9, align='right', gray=0.35)
+        page.text(555, 74, f"Page {len(pdf.pages)}", size=9, align='right', gray=0.35)
+        page.rect(MARGIN - 4, 112, 555 - MARGIN + 8, ROW_HEIGHT + 2)
+        for title, x, align in COLUMNS:
+            page.text(x, 124, title, size=9, bold=True, align=align)
+        return page, 124 + ROW_HEIGHT + 4
+
+    def row(page, y, cells, bold=False):
+        for (title, x, align), value in zip(COLUMNS, cells):
+            if title == 'Libellé':
+                value = truncate(value, 400 - 60 - x, 9, bold)
+            page.text(x, y, value, size=9, bold=bold, align=align)
+
+    page, y = new_page()
+    row(page, y, ['', 'Solde au ' + (start - timedelta(days=1)).strftime('%d/%m/%Y'), '', '', money(opening) or '0.00'], bold=True)
+    y += ROW_HEIGHT
+    for entry_date, label, debit, credit, balance in lines:
+        if y > pdf.size[1] - 70:
+            page, y = new_page()
+        row(page, y, [f"{entry_date:%d/%m/%Y}", label, money(debit), money(credit), money(balance) or '0.00'])
+        page.line(MARGIN - 4, y + 5, 559, y + 5, width=0.3, gray=0.85)
+        y += ROW_HEIGHT
+    if y > pdf.size[1] - 90:
+        page, y = new_page()
+    page.line(MARGIN - 4, y - 8, 559, y - 8, width=0.8)
+    row(page, y + 4, ['', 'Totaux de la période', money(total_debit), money(total_credit), ''], bold=True)
+    row(page, y + 4 + ROW_HEIGHT, ['', f"Solde au {end:%d/%m/%Y}", '', '', money(closing) or '0.00'], bold=True)
+    page.text(MARGIN, y + 4 + 3 * ROW_HEIGHT,
+              "Solde positif : montant restant dû au syndic. Solde négatif : avance en votre faveur.",
+              size=8, gray=0.4)
+    return pdf.render()
+
+
+def get_statement(resident, start, end):
+    """Chemin du PDF en cache, généré si la version des données a changé.
+
+    Retourne ``(chemin, depuis_le_cache, durée_ms)``.
+    """
+    started = time.monotonic()
+    path = cache_path(resident.pk, start, end, data_version(resident.pk, end))
+    if path.exists():
+        return path, True, int((time.monotonic() - started) * 1000)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = render_statement(resident, start, end)
+    # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+    # Les versions précédentes de la même période ne servent plus
+    for stale in path.parent.glob(f"{start:%Y%m%d}_{end:%Y%m%d}_*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path, False, int((time.monotonic() - started) * 1000)
+
+
+def year_bounds(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def generate_for_resident(resident_id, start, end):
+    """Tâche d'un processus du lot : (resident_id, chemin, depuis_le_cache, durée_ms)"""
+    resident = User.objects.get(pk=resident_id)
+    path, cached, elapsed = get_statement(resident, start, end)
+    return resident_id, str(path), cached, elapsed
@@ -0,0 +1,184 @@
+"""Compteurs des listes et tableaux de bord, partagés par les vues et l'API de navigation.
+
+Chaque famille de compteurs (résidents, syndics, documents, rapports,
+paiements, dépenses, notifications d'un utilisateur) est calculée en un seul
+``aggregate()`` avec des ``Count`` / ``Sum`` filtrés, puis mise en cache sous
+une clé formée de la famille, de sa version et de la signature des filtres
+(date du jour, filtres de la liste, utilisateur).
+
+Les signaux incrémentent la version d'une famille à chaque enregistrement ou
+suppression ; les traitements par lots (``bulk_create``, ``update``)
+l'incrémentent eux-mêmes. ``STATS_CACHE_SECONDS`` borne la durée de vie des
+valeurs en cas d'écriture qui ne passe par aucun des deux.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from .models import Depense, Document, Notification, Payment, ResidentReport
+
+User = get_user_model()
+
+# Modèle -> familles de compteurs à invalider quand il change
+MODEL_FAMILIES = {
+    User: ['residents', 'syndics'],
+    Document: ['documents'],
+    # Un paiement met à jour le document (is_paid, paid_amount) par UPDATE
+    Payment: ['payments', 'documents'],
+    ResidentReport: ['reports'],
+    Depense: ['expenses'],
+    Notification: ['notifications'],
+}
+
+
+def cache_seconds():
+    return getattr(settings, 'STATS_CACHE_SECONDS', 60)
+
+
+def version_key(family):
+    return f"stats:{family}:version"
+
+
+def invalidate(*families):
+    """Rendre obsolètes les compteurs des familles données (après validation de la transaction)"""
+    def bump():
+        for family in families:
+            try:
+                cache.incr(version_key(family))
+            except ValueError:
+                cache.set(version_key(family), 1, None)
+    transaction.on_commit(bump)
+
+
+def cached(family, compute, *signature):
+    version = cache.get(version_key(family), 0)
+    digest = hashlib.md5(repr(signature).encode()).hexdigest()
+    key = f"stats:{family}:{version}:{digest}"
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, cache_seconds())
+    return result
+
+
+def start_of(day):
+    """Début de journée, comparable aux champs date-heure"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_starts(today, months):
+    """Premiers jours des ``months`` derniers mois, du plus ancien au mois courant"""
+    starts = [today.replace(day=1)]
+    for _ in range(months - 1):
+        starts.append((starts[-1] - timedelta(days=1)).replace(day=1))
+    return starts[::-1]
+
+
+def zero_if_none(values):
+    return {key: value or 0 for key, value in values.items()}
+
+
+# ==================== FAMILLES ====================
+
+def resident_counts(today=None):
+    today = today or timezone.localdate()
+
+    def compute():
+        return User.objects.filter(role='RESIDENT').aggregate(
+            total=Count('pk'),
+            with_apartment=Count('pk', filter=Q(apartment__isnull=False) & ~Q(apartment='')),
+            active=Count('pk', filter=Q(is_active=True)),
+            recent=Count('pk', filter=Q(date_joined__gte=start_of(today - timedelta(days=30)))),
+            this_month=Count('pk', filter=Q(date_joined__gte=start_of(today.replace(day=1)))),
+        )
+    return cached('residents', compute, today)
+
+
+def syndic_counts():
+    def compute():
+        return User.objects.filter(role='SYNDIC').aggregate(
+            total=Count('pk'),
+            active=Count('pk', filter=Q(is_active=True)),
+        )
+    return cached('syndics', compute)
+
+
+def document_counts(today=None):
+    """Documents non archivés ; ``overdue`` reprend la règle de ``overdue_documents``"""
+    today = today or timezone.localdate()
+
+    def compute():
+        return zero_if_none(Document.objects.filter(is_archived=False).aggregate(
+            total=Count('pk'),
+            paid=Count('pk', filter=Q(is_paid=True)),
+            unpaid=Count('pk', filter=Q(is_paid=False)),
+            overdue=Count('pk', filter=Q(is_paid=False, due_date__lt=today)),
+            total_amount=Sum('amount'),
+            paid_amount=Sum('amount', filter=Q(is_paid=True)),
+            this_month=Count('pk', filter=Q(created_at__gte=start_of(today.replace(day=1)))),
+        ))
+    return cached('documents', compute, today)
+
+
+def report_counts(today=None):
+    today = today or timezone.localdate()
+
+    def compute():
+        return ResidentReport.objects.aggregate(
+            total=Count('pk'),
+            new=Count('pk', filter=Q(status='NEW')),
+            in_progress=Count('pk', filter=Q(status='IN_PROGRESS')),
+            resolved=Count('pk', filter=Q(status='RESOLVED')),
+            recent=Count('pk', filter=Q(created_at__gte=start_of(today - timedelta(days=7)))),
+        )
+    return cached('reports', compute, today)
+
+
+def payment_totals(today=None, months=6):
+    """Encaissements du mois et des ``months`` derniers mois (ordre chronologique)"""
+    today = today or timezone.localdate()
+
+    def compute():
+        starts = month_starts(today, months)
+        ends = starts[1:] + [None]
+        sums = {
+            f'month_{index}': Sum('amount', filter=Q(payment_date__gte=start, **({'payment_date__lt': end} if end else {})))
+            for index, (start, end) in enumerate(zip(starts, ends))
+        }
+        values = zero_if_none(Payment.objects.filter(payment_date__gte=starts[0]).aggregate(**sums))
+        monthly = [
+            {'month': date_format(start, 'M Y'), 'amount': float(values[f'month_{index}'])}
+            for index, start in enumerate(starts)
+        ]
+        return {'this_month': values[f'month_{months - 1}'], 'monthly': monthly}
+    return cached('payments', compute, today, months)
+
+
+def expense_totals(filters=None, today=None):
+    """Nombre, total et total du mois des dépenses ; ``filters`` : mêmes lookups que la liste"""
+    today = today or timezone.localdate()
+    filters = filters or {}
+
+    def compute():
+        return zero_if_none(Depense.objects.filter(**filters).aggregate(
+            count=Count('pk'),
+            total=Sum('montant'),
+            this_month=Sum('montant', filter=Q(date_depense__gte=today.replace(day=1))),
+        ))
+    return cached('expenses', compute, today, sorted(filters.items()))
+
+
+def notification_counts(user):
+    def compute():
+        return Notification.objects.filter(recipients=user).aggregate(
+            received=Count('pk'),
+            unread=Count('pk', filter=Q(is_read=False, is_active=True)),
+        )
+    return cached('notifications', compute, user.pk)
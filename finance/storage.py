@@ -0,0 +1,118 @@
+"""Stockage adressé par contenu des fichiers déposés (documents, justificatifs, photos).
+
+Le fichier reçu est haché (SHA-256) pendant sa copie dans un fichier
+temporaire, puis rangé sous ``blobs/ab/cd/<sha256><extension>`` : un même
+PDF envoyé à 500 résidents n'est écrit qu'une fois et tous les documents
+pointent vers le même nom. Les compteurs de références et le ramassage des
+fichiers orphelins sont dans ``finance/blobs.py``.
+
+Les fichiers de ces stockages ne sont pas publics : leur URL pointe vers la
+vue de téléchargement contrôlé (``finance/media.py``).
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]{1,10})?$')
+
+
+def protected_media_url():
+    return getattr(settings, 'PROTECTED_MEDIA_URL', '/fichiers/')
+
+
+def blob_prefix():
+    return getattr(settings, 'BLOB_STORAGE_PREFIX', 'blobs').strip('/')
+
+
+def archive_prefix():
+    return getattr(settings, 'ARCHIVE_STORAGE_PREFIX', 'archive').strip('/')
+
+
+def blob_name(sha256, extension=''):
+    return f"{blob_prefix()}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def is_blob(name):
+    """Nom produit par ce stockage (les anciens fichiers gardent leur chemin d'origine)"""
+    if name and name.startswith(archive_prefix() + '/'):
+        # Fichier déplacé au préfixe froid par l'archivage
+        name = name[len(archive_prefix()) + 1:]
+    if not name or not name.startswith(blob_prefix() + '/'):
+        return False
+    return bool(BLOB_NAME.match(os.path.basename(name)))
+
+
+def sha256_of(name):
+    return os.path.basename(name)[:64]
+
+
+def clean_extension(name):
+    extension = os.path.splitext(name)[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+@deconstructible
+class ProtectedStorage(FileSystemStorage):
+    """Fichiers de ``MEDIA_ROOT`` servis seulement après contrôle d'accès"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('base_url', protected_media_url())
+        super().__init__(**kwargs)
+
+
+@deconstructible
+class ContentAddressedStorage(ProtectedStorage):
+    """Stockage protégé dont le nom enregistré dépend du contenu, pas du nom envoyé"""
+
+    def get_available_name(self, name, max_length=None):
+        # Pas de suffixe anti-collision : un même nom désigne un même contenu
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(os.path.join(blob_prefix(), 'tmp'))
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)():
+            content.seek(0)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                for block in content.chunks(READ_BLOCK_SIZE):
+                    if isinstance(block, str):
+                        block = block.encode()
+                    digest.update(block)
+                    output.write(block)
+            name = blob_name(digest.hexdigest(), clean_extension(name))
+            target = self.path(name)
+            if os.path.exists(target):
+                # Contenu déjà stocké : seul le fichier temporaire est jeté. La date du
+                # fichier est rafraîchie pour que le ramassage ne le supprime pas avant
+                # l'enregistrement de l'objet qui le réutilise.
+                os.remove(temporary)
+                os.utime(target)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                # Renommage atomique : deux envois simultanés du même contenu aboutissent au même fichier
+                os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+def blob_storage():
+    return ContentAddressedStorage()
+
+
+def protected_storage():
+    return ProtectedStorage()
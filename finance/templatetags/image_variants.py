@@ -0,0 +1,53 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from finance.images import variants_for
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(file, variant='thumb', sizes=None, **attrs):
+    """Image servie dans la variante réduite, avec repli sur l'original.
+
+    Usage : {% load image_variants %}{% picture report.photo 'thumb' sizes='150px' alt='Photo' class='rounded' %}
+    ``sizes`` est la largeur d'affichage, qui laisse le navigateur choisir la
+    variante (miniature ou moyenne) selon la densité de l'écran.
+    """
+    if not file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    variants = variants_for(file)
+    if not variants or variant not in variants:
+        extra = format_html_join(' ', '{}="{}"', attrs.items())
+        return format_html('<img src="{}" {}>', file.url, extra)
+
+    chosen = variants[variant]
+    candidates = sorted(variants.values(), key=lambda entry: entry['width'])
+
+    def srcset(extension):
+        return ', '.join(
+            f"{file.storage.url(entry[extension])} {entry['width']}w" for entry in candidates
+        )
+
+    attrs.setdefault('sizes', sizes or f"{chosen['width']}px")
+    extra = format_html_join(' ', '{}="{}"', attrs.items())
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" width="{}" height="{}" {}></picture>',
+        srcset('webp'), attrs['sizes'],
+        file.storage.url(chosen['jpeg']), srcset('jpeg'), chosen['width'], chosen['height'], extra,
+    )
+
+
+@register.simple_tag
+def variant_url(file, variant='medium'):
+    """URL JPEG d'une variante, ou de l'original si elle n'est pas prête"""
+    if not file:
+        return ''
+    variants = variants_for(file)
+    if not variants or variant not in variants:
+        return file.url
+    return file.storage.url(variants[variant]['jpeg'])
@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from .models import Document, GeneratedPDF, LedgerEntry, Payment, ResidentStatus
+from .permissions import can_access
+from .proof_uploads import can_upload
+
+User = get_user_model()
+
+
+class ResidentDeletionTests(TestCase):
+    """Suppression d'un résident qui a des documents et des paiements"""
+
+    def setUp(self):
+        self.syndic = User.objects.create_user('test_syndic', password='x', role='SYNDIC')
+        self.resident = User.objects.create_user('test_resident', password='x', role='RESIDENT', apartment='T-101')
+        self.document = Document.objects.create(
+            title='Charges T1', amount=Decimal('500'), resident=self.resident, uploaded_by=self.syndic,
+        )
+        Payment.objects.create(document=self.document, amount=Decimal('200'))
+
+    def test_delete_resident_with_documents_and_payments(self):
+        self.assertTrue(LedgerEntry.objects.filter(resident=self.resident).exists())
+        resident_id = self.resident.pk
+
+        self.resident.delete()
+        connection.check_constraints()
+
+        self.assertFalse(User.objects.filter(pk=resident_id).exists())
+        self.assertFalse(Document.objects.filter(resident_id=resident_id).exists())
+        self.assertFalse(LedgerEntry.objects.filter(resident_id=resident_id).exists())
+        self.assertFalse(ResidentStatus.objects.filter(resident_id=resident_id).exists())
+
+
+class ObjectAccessTests(TestCase):
+    """Droits d'un résident sur les objets reliés à ses documents"""
+
+    def setUp(self):
+        self.syndic = User.objects.create_user('test_syndic', password='x', role='SYNDIC')
+        self.resident = User.objects.create_user('test_resident', password='x', role='RESIDENT', apartment='T-101')
+        self.other = User.objects.create_user('test_other', password='x', role='RESIDENT', apartment='T-102')
+        document = Document.objects.create(
+            title='Charges T1', amount=Decimal('500'), resident=self.resident, uploaded_by=self.syndic,
+        )
+        self.payment = Payment.objects.create(document=document, amount=Decimal('200'))
+        self.pdf = GeneratedPDF.objects.create(kind='RECEIPT', document=document, file='generated/test.pdf')
+
+    def test_payment_and_generated_pdf(self):
+        for obj in [self.payment, self.pdf]:
+            self.assertTrue(can_access(self.syndic, obj))
+            self.assertTrue(can_access(self.resident, obj))
+            self.assertFalse(can_access(self.other, obj))
+
+    def test_proof_upload(self):
+        self.assertTrue(can_upload(self.resident, self.payment))
+        self.assertFalse(can_upload(self.other, self.payment))
+        self.payment.is_verified = True
+        self.assertFalse(can_upload(self.resident, self.payment))
+        self.assertTrue(can_upload(self.syndic, self.payment))
@@ -39,6 +39,9 @@ urlpatterns = [
     # Payment management
     path('payments/create/<int:document_id>/', views.PaymentCreateView.as_view(), name='payment_create'),
     
+    # Search
+    path('search/', views.SearchView.as_view(), name='search'),
+
     # Notifications
     path('notifications/', views.NotificationListView.as_view(), name='notification_list'),
     path('notifications/create/', views.NotificationCreateView.as_view(), name='notification_create'),
@@ -65,13 +68,30 @@ urlpatterns = [
     path('depenses/<int:pk>/edit/', views.DepenseUpdateView.as_view(), name='depense_update'),
     path('depenses/<int:pk>/delete/', views.DepenseDeleteView.as_view(), name='depense_delete'),
     
+    # Streaming CSV / XLSX exports
+    path('exports/<slug:name>/', views.ExportView.as_view(), name='export'),
+    
     # Overdue payments management
     path('impayes/', views.OverduePaymentsDashboardView.as_view(), name='overdue_dashboard'),
     path('api/run-overdue-detection/', views.RunOverdueDetectionView.as_view(), name='run_overdue_detection'),
     
+    # Bank statement import / reconciliation
+    path('import-bancaire/', views.BankImportView.as_view(), name='bank_import'),
+    path('import-bancaire/lignes/<int:pk>/', views.BankTransactionReviewView.as_view(), name='bank_transaction_review'),
+    
+    # Staff bulk payment entry
+    path('paiements/saisie-groupee/', views.BulkPaymentView.as_view(), name='bulk_payment_entry'),
+    path('api/payments/bulk/', api_views.BulkPaymentAPI.as_view(), name='bulk_payment_api'),
+    path('documents/appel-de-fonds/', views.ChargeIssuanceView.as_view(), name='charge_issuance'),
+    path('api/payments/upload/', api_views.PaymentUploadAPI.as_view(), name='payment_upload_api'),
+    path('paiements/verification/', views.PaymentVerificationView.as_view(), name='payment_verification'),
+    path('releve/', views.ResidentStatementView.as_view(), name='resident_statement'),
+    path('fichiers/<path:name>', views.ProtectedMediaView.as_view(), name='protected_media'),
+    
     # Chatbot / Assistant virtuel
     path('assistant/', chatbot_views.ChatbotView.as_view(), name='chatbot'),
     path('api/chatbot/message/', chatbot_views.ChatbotMessageAPI.as_view(), name='chatbot_message_api'),
+    path('api/chatbot/feedback/', chatbot_views.ChatbotFeedbackAPI.as_view(), name='chatbot_feedback_api'),
     path('assistant/faq/', chatbot_views.ChatbotFAQManagementView.as_view(), name='chatbot_faq_management'),
     path('assistant/faq/create/', chatbot_views.ChatbotFAQCreateView.as_view(), name='chatbot_faq_create'),
     
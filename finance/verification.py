@@ -0,0 +1,93 @@
+"""Vérification des paiements par le syndic, par lots.
+
+Les paiements choisis sont verrouillés (``select_for_update``, en sautant
+ceux qu'un autre syndic est en train de traiter) puis validés ou refusés en
+un seul ``UPDATE ... WHERE id IN``. Un refus retire les montants des
+documents en un ``UPDATE`` groupé et passe les extournes au grand livre.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import stats
+from .ledger import record_payments
+from .models import Document, Notification, Payment
+from .notifications import bulk_notify
+
+MAX_BATCH = 500
+
+
+def pending_payments():
+    return Payment.objects.filter(is_verified=False, is_rejected=False)
+
+
+def verify_payments(payment_ids, user, approve=True, reason=''):
+    """Valider (ou refuser) des paiements en attente.
+
+    Retourne la liste des ids effectivement traités : les paiements déjà
+    traités ou verrouillés par un autre syndic sont ignorés.
+    """
+    payment_ids = list(payment_ids)[:MAX_BATCH]
+    if not payment_ids:
+        return []
+    skip_locked = connection.features.has_select_for_update_skip_locked
+
+    with transaction.atomic():
+        rows = list(
+            pending_payments()
+            .filter(pk__in=payment_ids)
+            .select_for_update(skip_locked=skip_locked)
+            .order_by()
+            .values_list('pk', 'document_id', 'amount', 'payment_date')
+        )
+        if not rows:
+            return []
+        ids = [pk for pk, _, _, _ in rows]
+        Payment.objects.filter(pk__in=ids).update(
+            is_verified=approve,
+            is_rejected=not approve,
+            rejection_reason='' if approve else reason[:255],
+            verified_by=user,
+            verified_at=timezone.now(),
+        )
+        if not approve:
+            reject_settlements(rows, user, reason)
+        stats.invalidate('payments', 'documents')
+    return ids
+
+
+def reject_settlements(rows, user, reason):
+    """Retirer les paiements refusés des documents et du grand livre, prévenir les résidents"""
+    deltas = defaultdict(Decimal)
+    payments = []
+    for pk, document_id, amount, payment_date in rows:
+        if document_id is None:
+            continue
+        deltas[document_id] -= amount
+        payments.append(Payment(pk=pk, document_id=document_id, amount=amount, payment_date=payment_date))
+    Document.apply_payment_deltas(deltas)
+    record_payments(payments, reverse=True)
+
+    titles = defaultdict(list)
+    for resident_id, title in Document.objects.filter(pk__in=list(deltas)).values_list('resident_id', 'title'):
+        titles[resident_id].append(title)
+    message_reason = f" Motif : {reason}" if reason else ''
+    bulk_notify([
+        (
+            Notification(
+                title="Paiement refusé",
+                message=(
+                    f"Votre paiement pour {', '.join(documents[:3])}"
+                    f"{' ...' if len(documents) > 3 else ''} n'a pas été validé par le syndic.{message_reason}"
+                ),
+                notification_type='PAYMENT_REMINDER',
+                priority='HIGH',
+                sender=user,
+                is_active=True,
+            ),
+            [resident_id],
+        )
+        for resident_id, documents in titles.items()
+    ])
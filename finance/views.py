@@ -1,12 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.generic import ListView, CreateView, UpdateView, DetailView, View, TemplateView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.contrib.auth import get_user_model, logout, authenticate, login
-from django.db.models import Sum, Q, Count
+from django.db.models import Sum, Q, Count, F
 from django.utils import timezone
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.files.storage import default_storage
@@ -17,7 +17,13 @@ from django.core.exceptions import ValidationError
 from decimal import Decimal
 import json
 
-from .models import Document, Notification, Payment, ResidentStatus, ResidentReport, ReportComment, Event, Depense, ChatbotFAQ, ChatbotConversation, ChatbotMessage, send_sms, send_email
+from .models import Document, Notification, Payment, ResidentStatus, ResidentReport, ReportComment, Event, Depense, ChatbotFAQ, ChatbotConversation, ChatbotMessage, SearchEntry, send_sms, send_email
+from . import stats
+from .exports import COLUMNS as EXPORT_COLUMNS, export_response
+from .images import attach_variants
+from .search import SearchResults
+from .permissions import ObjectPermissionMixin
+from .overdue import BUCKETS, OVERDUE_BUCKETS, bucket_filters, bucket_totals, overdue_documents, resident_rollup, unpaid_documents
 
 User = get_user_model()
 
@@ -37,6 +43,18 @@ def role_required(allowed_roles):
     return decorator
 
 
+def export_actions(request, name):
+    """Boutons d'export CSV / Excel de la page, avec ses filtres courants"""
+    params = request.GET.copy()
+    params.pop('page', None)
+    url = reverse('finance:export', args=[name])
+    actions = []
+    for file_format, label, icon in [('csv', 'Export CSV', 'fas fa-file-csv'), ('xlsx', 'Export Excel', 'fas fa-file-excel')]:
+        params['format'] = file_format
+        actions.append({'label': label, 'url': f"{url}?{params.urlencode()}", 'icon': icon, 'type': 'outline'})
+    return actions
+
+
 class HomeView(TemplateView):
     """Home page - redirects authenticated users to their dashboard"""
     template_name = 'finance/home.html'
@@ -81,13 +99,12 @@ class SyndicDashboardView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get all residents with their status
-        residents = User.objects.filter(role='RESIDENT').prefetch_related('status')
-        
-        # Update status for all residents
-        for resident in residents:
-            status, created = ResidentStatus.objects.get_or_create(resident=resident)
-            status.update_totals()
+        # Soldes courants tenus par le grand livre (aucun recalcul ici)
+        missing = User.objects.filter(role='RESIDENT', status__isnull=True).values_list('pk', flat=True)
+        ResidentStatus.objects.bulk_create(
+            [ResidentStatus(resident_id=pk) for pk in missing], ignore_conflicts=True
+        )
+        residents = User.objects.filter(role='RESIDENT').select_related('status')
         
         # Group residents by status
         up_to_date = []
@@ -108,50 +125,18 @@ class SyndicDashboardView(TemplateView):
                     critical.append(resident)
         
         # Statistics principales
-        total_residents = residents.count()
-        total_due = sum(r.status.total_due for r in residents if hasattr(r, 'status'))
-        total_paid = sum(r.status.total_paid for r in residents if hasattr(r, 'status'))
-        
-        # Statistiques avancées
-        from django.utils import timezone
-        today = timezone.now().date()
-        current_month = today.replace(day=1)
-        
-        # Documents ce mois
-        documents_this_month = Document.objects.filter(
-            created_at__gte=current_month,
-            is_archived=False
-        ).count()
-        
-        # Paiements ce mois
-        payments_this_month = Payment.objects.filter(
-            payment_date__gte=current_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Dépenses ce mois
-        expenses_this_month = Depense.objects.filter(
-            date_depense__gte=current_month
-        ).aggregate(total=Sum('montant'))['total'] or 0
-        
-        # Nouveaux résidents ce mois
-        recent_residents = User.objects.filter(
-            role='RESIDENT',
-            date_joined__gte=current_month
-        ).count()
-        
-        # Documents en retard
-        overdue_documents = Document.objects.filter(
-            is_paid=False,
-            is_archived=False
+        total_residents = len(residents)
+        totals = ResidentStatus.objects.filter(resident__role='RESIDENT').aggregate(
+            total_due=Sum(F('total_due') - F('total_paid'), filter=Q(total_due__gt=F('total_paid'))),
+            total_paid=Sum('total_paid'),
         )
-        overdue_count = sum(1 for doc in overdue_documents if doc.is_overdue)
+        total_due = totals['total_due'] or 0
+        total_paid = totals['total_paid'] or 0
         
-        # Notifications non lues
-        unread_notifications = Notification.objects.filter(
-            is_read=False,
-            is_active=True,
-            recipients=self.request.user
-        ).count()
+        # Statistiques avancées (une requête par famille, en cache)
+        today = timezone.localdate()
+        documents = stats.document_counts(today)
+        payments = stats.payment_totals(today)
         
         # Recent activities
         recent_documents = Document.objects.select_related('resident').order_by('-created_at')[:5]
@@ -159,27 +144,8 @@ class SyndicDashboardView(TemplateView):
         recent_reports = ResidentReport.objects.select_related('resident').order_by('-created_at')[:8]
         recent_payments = Payment.objects.select_related('document__resident').order_by('-payment_date')[:5]
         
-        # Évolution mensuelle des paiements (6 derniers mois)
-        monthly_payments = []
-        for i in range(6):
-            month_start = (today.replace(day=1) - timezone.timedelta(days=30*i)).replace(day=1)
-            month_end = (month_start.replace(day=28) + timezone.timedelta(days=4)).replace(day=1) - timezone.timedelta(days=1)
-            
-            month_total = Payment.objects.filter(
-                payment_date__gte=month_start,
-                payment_date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_payments.append({
-                'month': month_start.strftime('%b %Y'),
-                'amount': float(month_total)
-            })
-        
-        monthly_payments.reverse()  # Ordre chronologique
-        
-        # Sérialiser les données pour JavaScript
-        import json
-        context['monthly_payments_json'] = json.dumps(monthly_payments)
+        # Évolution mensuelle des paiements (6 derniers mois), sérialisée pour JavaScript
+        context['monthly_payments_json'] = json.dumps(payments['monthly'])
         
         context.update({
             'up_to_date': up_to_date,
@@ -189,17 +155,17 @@ class SyndicDashboardView(TemplateView):
             'total_residents': total_residents,
             'total_due': total_due,
             'total_paid': total_paid,
-            'recent_residents': recent_residents,
-            'documents_this_month': documents_this_month,
-            'payments_this_month': payments_this_month,
-            'expenses_this_month': expenses_this_month,
-            'overdue_count': overdue_count,
-            'unread_notifications': unread_notifications,
+            'recent_residents': stats.resident_counts(today)['this_month'],
+            'documents_this_month': documents['this_month'],
+            'payments_this_month': payments['this_month'],
+            'expenses_this_month': stats.expense_totals(today=today)['this_month'],
+            'overdue_count': documents['overdue'],
+            'unread_notifications': stats.notification_counts(self.request.user)['unread'],
             'recent_documents': recent_documents,
             'recent_notifications': recent_notifications,
             'recent_reports': recent_reports,
             'recent_payments': recent_payments,
-            'monthly_payments': monthly_payments,
+            'monthly_payments': payments['monthly'],
         })
         return context
 
@@ -220,9 +186,8 @@ class ResidentDashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         
-        # Get or create resident status
+        # Solde courant tenu par le grand livre
         status, created = ResidentStatus.objects.get_or_create(resident=user)
-        status.update_totals()
         
         # Get resident's documents
         documents = user.documents.all().order_by('-date')
@@ -284,34 +249,16 @@ class ResidentManagementView(ListView):
                 'url': reverse_lazy('finance:resident_create'),
                 'icon': 'fas fa-plus',
                 'type': 'primary'
-            }
+            },
+            *export_actions(self.request, 'residents'),
         ]
         
         # Statistiques des résidents
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # Total des résidents
-        context['total_residents'] = User.objects.filter(role='RESIDENT').count()
-        
-        # Résidents avec appartement
-        context['residents_with_apartment'] = User.objects.filter(
-            role='RESIDENT', 
-            apartment__isnull=False
-        ).exclude(apartment='').count()
-        
-        # Nouveaux résidents (30 derniers jours)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        context['recent_residents'] = User.objects.filter(
-            role='RESIDENT',
-            date_joined__gte=thirty_days_ago
-        ).count()
-        
-        # Résidents actifs
-        context['active_residents'] = User.objects.filter(
-            role='RESIDENT',
-            is_active=True
-        ).count()
+        residents = stats.resident_counts()
+        context['total_residents'] = residents['total']
+        context['residents_with_apartment'] = residents['with_apartment']
+        context['recent_residents'] = residents['recent']
+        context['active_residents'] = residents['active']
         
         return context
 
@@ -440,8 +387,9 @@ class SyndicManagementView(ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_syndics'] = User.objects.filter(role='SYNDIC').count()
-        context['active_syndics'] = User.objects.filter(role='SYNDIC', is_active=True).count()
+        syndics = stats.syndic_counts()
+        context['total_syndics'] = syndics['total']
+        context['active_syndics'] = syndics['active']
         return context
 
 
@@ -632,11 +580,13 @@ class ResidentReportListView(ListView):
         
         # Statistiques pour les syndics
         if self.request.user.role in ['SYNDIC', 'SUPERADMIN']:
-            context['total_reports'] = ResidentReport.objects.count()
-            context['new_reports'] = ResidentReport.objects.filter(status='NEW').count()
-            context['in_progress_reports'] = ResidentReport.objects.filter(status='IN_PROGRESS').count()
-            context['resolved_reports'] = ResidentReport.objects.filter(status='RESOLVED').count()
+            reports = stats.report_counts()
+            context['total_reports'] = reports['total']
+            context['new_reports'] = reports['new']
+            context['in_progress_reports'] = reports['in_progress']
+            context['resolved_reports'] = reports['resolved']
         
+        attach_variants(context['reports'], 'photo')
         return context
 
 
@@ -683,14 +633,15 @@ class ReportManagementView(ListView):
         context = super().get_context_data(**kwargs)
         
         # Statistiques des rapports
-        context['total_reports'] = ResidentReport.objects.count()
-        context['new_reports'] = ResidentReport.objects.filter(status='NEW').count()
-        context['in_progress_reports'] = ResidentReport.objects.filter(status='IN_PROGRESS').count()
-        context['resolved_reports'] = ResidentReport.objects.filter(status='RESOLVED').count()
-        context['recent_reports'] = ResidentReport.objects.filter(
-            created_at__gte=timezone.now() - timezone.timedelta(days=7)
-        ).count()
-        
+        reports = stats.report_counts()
+        context['total_reports'] = reports['total']
+        context['new_reports'] = reports['new']
+        context['in_progress_reports'] = reports['in_progress']
+        context['resolved_reports'] = reports['resolved']
+        context['recent_reports'] = reports['recent']
+        context['page_actions'] = export_actions(self.request, 'rapports')
+        
+        attach_variants(context['reports'], 'photo')
         return context
 
 
@@ -721,20 +672,17 @@ class ReportUpdateView(UpdateView):
         return context
 
 
-class ReportCommentCreateView(CreateView):
-    """Add comment to a report."""
+class ReportCommentCreateView(ObjectPermissionMixin, CreateView):
+    """Add comment to a report the user can see."""
     model = ReportComment
     template_name = 'finance/report_comment_form.html'
     fields = ['comment', 'is_internal']
     success_url = reverse_lazy('finance:report_management')
-
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            return redirect('finance:login')
-        return super().dispatch(request, *args, **kwargs)
+    protected_model = ResidentReport
+    object_kwarg = 'report_id'
 
     def form_valid(self, form):
-        form.instance.report = get_object_or_404(ResidentReport, pk=self.kwargs['report_id'])
+        form.instance.report = self.get_protected_object()
         form.instance.author = self.request.user
         
         # Seuls les syndics peuvent ajouter des commentaires internes
@@ -747,32 +695,20 @@ class ReportCommentCreateView(CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Expose report_id and report to the template for links
-        report_id = self.kwargs.get('report_id')
-        context['report_id'] = report_id
-        if report_id:
-            context['report'] = get_object_or_404(ResidentReport, pk=report_id)
+        context['report_id'] = self.kwargs['report_id']
+        context['report'] = self.get_protected_object()
         return context
 
     def get_success_url(self):
         return reverse_lazy('finance:report_detail', kwargs={'pk': self.kwargs['report_id']})
 
 
-class ResidentReportDetailView(DetailView):
+class ResidentReportDetailView(ObjectPermissionMixin, DetailView):
     """Show details of a resident report. Residents can view only their own."""
     model = ResidentReport
     template_name = 'finance/report_detail.html'
     context_object_name = 'report'
-
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            return redirect('finance:login')
-        return super().dispatch(request, *args, **kwargs)
-
-    def get_queryset(self):
-        qs = ResidentReport.objects.select_related('resident', 'reviewed_by')
-        if self.request.user.role == 'RESIDENT':
-            return qs.filter(resident=self.request.user)
-        return qs
+    related = ['resident', 'reviewed_by']
 
 
 class DocumentListView(ListView):
@@ -804,9 +740,7 @@ class DocumentListView(ListView):
             elif payment_status == 'unpaid':
                 qs = qs.filter(is_paid=False)
             elif payment_status == 'overdue':
-                from django.utils import timezone
-                thirty_days_ago = timezone.now().date() - timezone.timedelta(days=30)
-                qs = qs.filter(is_paid=False, date__lt=thirty_days_ago)
+                qs = overdue_documents(timezone.now().date(), qs)
             
             # Filtre par dates
             date_start = self.request.GET.get('date_start')
@@ -831,18 +765,11 @@ class DocumentListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_resident_view'] = (self.request.user.role == 'RESIDENT')
+        context['export_actions'] = export_actions(self.request, 'documents')
         
         # Statistiques pour les syndics
         if self.request.user.role in ['SUPERADMIN', 'SYNDIC']:
-            all_docs = Document.objects.filter(is_archived=False)
-            context['stats'] = {
-                'total': all_docs.count(),
-                'paid': all_docs.filter(is_paid=True).count(),
-                'unpaid': all_docs.filter(is_paid=False).count(),
-                'overdue': sum(1 for doc in all_docs if doc.is_overdue),
-                'total_amount': all_docs.aggregate(total=Sum('amount'))['total'] or 0,
-                'paid_amount': all_docs.filter(is_paid=True).aggregate(total=Sum('amount'))['total'] or 0,
-            }
+            context['stats'] = stats.document_counts()
         
         return context
 
@@ -873,24 +800,37 @@ class DocumentCreateView(CreateView):
         return super().form_valid(form)
 
 
-class DocumentDetailView(DetailView):
-    """View document details"""
+class DocumentDetailView(ObjectPermissionMixin, DetailView):
+    """View document details - the document owner or syndic/admin"""
     model = Document
     template_name = 'finance/document_detail.html'
     context_object_name = 'document'
-    
+    related = ['resident', 'uploaded_by']
+
+
+class SearchView(ListView):
+    """Recherche plein texte dans les documents, rapports, notifications et FAQ visibles par l'utilisateur"""
+    template_name = 'finance/search.html'
+    context_object_name = 'results'
+    paginate_by = 20
+
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('finance:login')
-        
-        document = self.get_object()
-        # Only the document owner or syndic/admin can view
-        if document.resident != request.user and request.user.role not in ['SUPERADMIN', 'SYNDIC']:
-            messages.error(request, "Accès non autorisé.")
-            return redirect('finance:home')
-        
         return super().dispatch(request, *args, **kwargs)
 
+    def get_queryset(self):
+        kind = self.request.GET.get('type')
+        kinds = [kind] if kind in dict(SearchEntry.KINDS) else None
+        return SearchResults(self.request.user, self.request.GET.get('q', ''), kinds)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '').strip()
+        context['current_type'] = self.request.GET.get('type', '')
+        context['kinds'] = SearchEntry.KINDS
+        return context
+
 
 class NotificationListView(ListView):
     """List notifications - filtered by role"""
@@ -1037,28 +977,22 @@ class NotificationCreateView(CreateView):
         return response
 
 
-class NotificationDetailView(DetailView):
-    """View a single notification"""
+class NotificationDetailView(ObjectPermissionMixin, DetailView):
+    """View a single notification - residents only those that include them"""
     model = Notification
     template_name = 'finance/notification_detail.html'
     context_object_name = 'notification'
+    related = ['sender']
+    denied_url = 'finance:notification_list'
 
-    def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
-            return redirect('finance:login')
-        notification = self.get_object()
-        # Residents can only view notifications that include them
-        if request.user.role == 'RESIDENT' and request.user not in notification.recipients.all():
-            messages.error(request, "Accès non autorisé.")
-            return redirect('finance:notification_list')
-        return super().dispatch(request, *args, **kwargs)
-
-class PaymentCreateView(CreateView):
-    """Create payment for a document - residents only"""
+class PaymentCreateView(ObjectPermissionMixin, CreateView):
+    """Create payment for a document - residents only, for their own documents"""
     model = Payment
     template_name = 'finance/payment_form.html'
     fields = ['amount', 'payment_method', 'payment_date', 'reference', 'notes', 'payment_proof']
     success_url = reverse_lazy('finance:document_list')
+    protected_model = Document
+    object_kwarg = 'document_id'
     
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -1070,14 +1004,11 @@ class PaymentCreateView(CreateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        document_id = self.kwargs.get('document_id')
-        context['document'] = get_object_or_404(Document, id=document_id, resident=self.request.user)
+        context['document'] = self.get_protected_object()
         return context
     
     def form_valid(self, form):
-        document_id = self.kwargs.get('document_id')
-        document = get_object_or_404(Document, id=document_id, resident=self.request.user)
-        form.instance.document = document
+        form.instance.document = self.get_protected_object()
         messages.success(self.request, "Paiement enregistré avec succès. Il sera vérifié par le syndic.")
         return super().form_valid(form)
 
@@ -1178,49 +1109,42 @@ class DepenseListView(ListView):
             return redirect('finance:login')
         return super().dispatch(request, *args, **kwargs)
     
+    def get_filters(self):
+        """Filtres de la liste, repris tels quels pour les totaux"""
+        filters = {}
+        lookups = [('categorie', 'categorie'), ('date_debut', 'date_depense__gte'), ('date_fin', 'date_depense__lte')]
+        for param, lookup in lookups:
+            value = self.request.GET.get(param)
+            if value:
+                filters[lookup] = value
+        return filters
+    
     def get_queryset(self):
-        queryset = Depense.objects.all()
-        
-        # Filtres
-        categorie = self.request.GET.get('categorie')
-        if categorie:
-            queryset = queryset.filter(categorie=categorie)
-        
-        date_debut = self.request.GET.get('date_debut')
-        if date_debut:
-            queryset = queryset.filter(date_depense__gte=date_debut)
-        
-        date_fin = self.request.GET.get('date_fin')
-        if date_fin:
-            queryset = queryset.filter(date_depense__lte=date_fin)
-        
-        return queryset
+        return Depense.objects.filter(**self.get_filters())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
+        totals = stats.expense_totals(self.get_filters())
         
         context['categories'] = Depense.CATEGORIES
-        context['total_depenses'] = queryset.aggregate(total=Sum('montant'))['total'] or 0
+        context['total_depenses'] = totals['total']
         context['can_manage'] = self.request.user.role in ['SUPERADMIN', 'SYNDIC']
         
         # Calcul de la dépense moyenne
-        depense_count = queryset.count()
-        if depense_count > 0 and context['total_depenses'] > 0:
-            context['depense_moyenne'] = context['total_depenses'] / depense_count
+        if totals['count'] > 0 and totals['total'] > 0:
+            context['depense_moyenne'] = totals['total'] / totals['count']
         else:
             context['depense_moyenne'] = 0
         
         # Actions de page pour l'en-tête
+        context['page_actions'] = export_actions(self.request, 'depenses')
         if context['can_manage']:
-            context['page_actions'] = [
-                {
-                    'label': 'Nouvelle Dépense',
-                    'url': reverse_lazy('finance:depense_create'),
-                    'icon': 'fas fa-plus',
-                    'type': 'success'
-                }
-            ]
+            context['page_actions'].insert(0, {
+                'label': 'Nouvelle Dépense',
+                'url': reverse_lazy('finance:depense_create'),
+                'icon': 'fas fa-plus',
+                'type': 'success'
+            })
         
         # Données pour les graphiques
         if self.request.user.role == 'RESIDENT':
@@ -1362,6 +1286,46 @@ class DepenseDeleteView(View):
 
 # ==================== SYSTÈME DE DÉTECTION DES IMPAYÉS ====================
 
+class ExportView(View):
+    """Export CSV / XLSX en flux. Documents et dépenses reprennent les filtres de leur liste."""
+    STAFF_ONLY = ['residents']
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if kwargs['name'] in self.STAFF_ONLY and request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        return super().dispatch(request, *args, **kwargs)
+
+    def list_queryset(self, view_class):
+        """Queryset de la liste, avec les filtres et restrictions de la page"""
+        view = view_class()
+        view.setup(self.request)
+        return view.get_queryset()
+
+    def get_queryset(self, name):
+        user = self.request.user
+        is_resident = user.role == 'RESIDENT'
+        if name == 'documents':
+            return self.list_queryset(DocumentListView)
+        if name == 'depenses':
+            return self.list_queryset(DepenseListView).order_by('-date_depense')
+        if name == 'paiements':
+            payments = Payment.objects.order_by('-payment_date', '-pk')
+            return payments.filter(document__resident=user) if is_resident else payments
+        if name == 'rapports':
+            reports = ResidentReport.objects.order_by('-created_at')
+            return reports.filter(resident=user) if is_resident else reports
+        return User.objects.filter(role='RESIDENT').order_by('username')
+
+    def get(self, request, name):
+        if name not in EXPORT_COLUMNS:
+            raise Http404
+        file_format = 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+        return export_response(self.get_queryset(name), EXPORT_COLUMNS[name], name, file_format)
+
+
 class OverduePaymentsDashboardView(TemplateView):
     """Tableau de bord des impayés - syndics seulement"""
     template_name = 'finance/overdue_dashboard.html'
@@ -1374,63 +1338,101 @@ class OverduePaymentsDashboardView(TemplateView):
             return redirect('finance:home')
         return super().dispatch(request, *args, **kwargs)
     
+    paginate_by = 10
+    SORT_ORDERS = {
+        'age': ('due_date', 'pk'),
+        'amount': ('-amount', 'due_date'),
+    }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Documents impayés par catégorie
+        # Documents impayés par catégorie (agrégats SQL, une seule requête)
         from django.utils import timezone
+        from django.core.paginator import Paginator
         today = timezone.now().date()
         
-        unpaid_docs = Document.objects.filter(is_paid=False, is_archived=False).select_related('resident')
-        
-        # Catégoriser les impayés
-        due_soon = []      # Échéance dans 7 jours
-        overdue_30 = []    # 30-59 jours de retard
-        overdue_60 = []    # 60-89 jours de retard
-        critical_90 = []   # 90+ jours de retard
+        sort = self.request.GET.get('sort', 'age')
+        if sort not in self.SORT_ORDERS:
+            sort = 'age'
+        rollup = self.request.GET.get('group') == 'resident'
+        
+        totals = bucket_totals(today)
+        filters = bucket_filters(today)
+        unpaid_docs = unpaid_documents()
+        if rollup:
+            # Une ligne par résident : une requête groupée pour toutes les tranches
+            rollup_rows = resident_rollup(today)
+        
+        buckets = []
+        for key, label, css_class in BUCKETS:
+            if rollup:
+                sort_key, reverse = {
+                    'age': (lambda row: row['oldest_due_date'], False),
+                    'amount': (lambda row: row['total_amount'], True),
+                }[sort]
+                rows = sorted(rollup_rows[key], key=sort_key, reverse=reverse)
+                paginator = Paginator(rows, self.paginate_by)
+            else:
+                rows = unpaid_docs.filter(filters[key]).select_related('resident').order_by(*self.SORT_ORDERS[sort])
+                paginator = Paginator(rows, self.paginate_by)
+                paginator.count = totals[f'{key}_count']  # déjà connu grâce à l'agrégat
+            
+            page_param = f'{key}_page'
+            page_obj = paginator.get_page(self.request.GET.get(page_param))
+            
+            buckets.append({
+                'key': key,
+                'label': label,
+                'css_class': css_class,
+                'count': totals[f'{key}_count'],
+                'amount': totals[f'{key}_amount'] or Decimal('0'),
+                'page_obj': page_obj,
+                'previous_url': self.page_url(page_param, page_obj.previous_page_number()) if page_obj.has_previous() else None,
+                'next_url': self.page_url(page_param, page_obj.next_page_number()) if page_obj.has_next() else None,
+            })
         
-        total_overdue_amount = Decimal('0')
+        if rollup:
+            # Charger uniquement les résidents des pages affichées
+            page_rows = [row for bucket in buckets for row in bucket['page_obj'].object_list]
+            residents = User.objects.in_bulk({row['resident_id'] for row in page_rows})
+            for row in page_rows:
+                row['resident'] = residents.get(row['resident_id'])
+                row['days_overdue'] = max(0, (today - row['oldest_due_date']).days)
         
-        for doc in unpaid_docs:
-            days_until_due = (doc.due_date - today).days
-            days_overdue = doc.days_overdue
-            
-            if 0 <= days_until_due <= 7:
-                due_soon.append(doc)
-            elif 30 <= days_overdue < 60:
-                overdue_30.append(doc)
-                total_overdue_amount += doc.amount
-            elif 60 <= days_overdue < 90:
-                overdue_60.append(doc)
-                total_overdue_amount += doc.amount
-            elif days_overdue >= 90:
-                critical_90.append(doc)
-                total_overdue_amount += doc.amount
+        total_overdue_amount = sum(
+            (totals[f'{key}_amount'] or Decimal('0') for key in OVERDUE_BUCKETS), Decimal('0')
+        )
         
         # Statistiques des notifications envoyées
         from .models import OverdueNotificationLog
         recent_notifications = OverdueNotificationLog.objects.filter(
-            created_at__gte=today - timezone.timedelta(days=30)
-        ).select_related('document__resident')
+            created_at__gte=timezone.now() - timezone.timedelta(days=30)
+        )
         
         context.update({
-            'due_soon': due_soon,
-            'overdue_30': overdue_30,
-            'overdue_60': overdue_60,
-            'critical_90': critical_90,
+            'buckets': buckets,
+            'sort': sort,
+            'rollup': rollup,
             'total_overdue_amount': total_overdue_amount,
-            'recent_notifications': recent_notifications[:10],
+            'recent_notifications': recent_notifications.select_related('document__resident')[:10],
             'stats': {
-                'due_soon_count': len(due_soon),
-                'overdue_30_count': len(overdue_30),
-                'overdue_60_count': len(overdue_60),
-                'critical_90_count': len(critical_90),
+                'due_soon_count': totals['due_soon_count'],
+                'overdue_30_count': totals['overdue_30_count'],
+                'overdue_60_count': totals['overdue_60_count'],
+                'critical_90_count': totals['critical_90_count'],
                 'total_notifications': recent_notifications.count(),
             }
         })
         
         return context
 
+    def page_url(self, page_param, page_number):
+        """Lien de pagination d'une tranche, en conservant les autres paramètres"""
+        params = self.request.GET.copy()
+        params[page_param] = page_number
+        return f"?{params.urlencode()}"
+
 
 class RunOverdueDetectionView(View):
     """Exécuter manuellement la détection des impayés"""
@@ -1458,6 +1460,369 @@ class RunOverdueDetectionView(View):
             return JsonResponse({'error': str(e)}, status=500)
 
 
+class BankImportView(TemplateView):
+    """Import des relevés bancaires et file de revue des lignes non rapprochées"""
+    template_name = 'finance/bank_import.html'
+    paginate_by = 25
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def post(self, request, *args, **kwargs):
+        from .bank_import import BankStatementImporter, READERS
+        
+        statement = request.FILES.get('statement')
+        if not statement:
+            messages.error(request, "Veuillez sélectionner un fichier de relevé.")
+            return redirect('finance:bank_import')
+        file_format = request.POST.get('file_format') or None
+        if file_format and file_format not in READERS:
+            file_format = None
+        
+        record = BankStatementImporter(user=request.user).run(statement.file, statement.name, file_format)
+        if record.status == 'FAILED':
+            messages.error(request, f"Import impossible : {record.error}")
+        else:
+            messages.success(
+                request,
+                f"{record.row_count} lignes importées : {record.matched_count} rapprochées "
+                f"({record.match_rate}%), {record.review_count} à vérifier, "
+                f"{record.duplicate_count} déjà importées — {record.rows_per_second} lignes/s."
+            )
+        return redirect('finance:bank_import')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from django.core.paginator import Paginator
+        from .models import BankStatementImport, BankTransaction
+        
+        review_queue = BankTransaction.objects.filter(status='REVIEW').order_by('booking_date', 'pk')
+        page_obj = Paginator(review_queue, self.paginate_by).get_page(self.request.GET.get('page'))
+        
+        context.update({
+            'imports': BankStatementImport.objects.select_related('imported_by')[:10],
+            'page_obj': page_obj,
+            'review_queue': page_obj.object_list,
+            'formats': BankStatementImport.FORMATS,
+        })
+        return context
+
+
+class BankTransactionReviewView(View):
+    """Traiter une ligne de la file de revue : l'affecter à un document ou l'ignorer"""
+    
+    def post(self, request, pk):
+        if not request.user.is_authenticated or request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        from .models import BankTransaction
+        
+        bank_transaction = get_object_or_404(BankTransaction, pk=pk, status='REVIEW')
+        action = request.POST.get('action')
+        now = timezone.now()
+        
+        if action == 'ignore':
+            bank_transaction.status = 'IGNORED'
+        elif action == 'assign':
+            document = Document.objects.filter(
+                pk=request.POST.get('document_id') or 0, is_archived=False
+            ).first()
+            if document is None:
+                messages.error(request, "Document introuvable.")
+                return redirect('finance:bank_import')
+            payment = Payment.objects.create(
+                document=document,
+                amount=bank_transaction.amount,
+                payment_method='BANK_TRANSFER',
+                payment_date=bank_transaction.booking_date,
+                reference=(bank_transaction.reference or bank_transaction.description)[:100],
+                notes="Rapprochement bancaire manuel",
+                is_verified=True,
+                verified_by=request.user,
+                verified_at=now,
+            )
+            bank_transaction.status = 'MATCHED'
+            bank_transaction.match_method = 'MANUAL'
+            bank_transaction.document = document
+            bank_transaction.payment = payment
+        else:
+            messages.error(request, "Action inconnue.")
+            return redirect('finance:bank_import')
+        
+        bank_transaction.reviewed_by = request.user
+        bank_transaction.reviewed_at = now
+        bank_transaction.save()
+        messages.success(request, "Ligne de relevé traitée.")
+        return redirect(f"{reverse_lazy('finance:bank_import')}?page={request.POST.get('page', 1)}")
+
+
+class BulkPaymentView(TemplateView):
+    """Saisie groupée des paiements encaissés par le syndic"""
+    template_name = 'finance/bulk_payment_form.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def post(self, request, *args, **kwargs):
+        from .bulk_payments import parse_text, submit_payments
+        
+        text = request.POST.get('payments', '')
+        rows = parse_text(text)
+        payments, errors = submit_payments(rows, request.user)
+        if errors:
+            for error in errors[:20]:
+                line = f"Ligne {rows[error['index']]['line']} : " if error['index'] is not None else ''
+                messages.error(request, f"{line}{error['message']}")
+            if len(errors) > 20:
+                messages.error(request, f"... et {len(errors) - 20} autres erreurs.")
+            return self.render_to_response(self.get_context_data(payments_text=text))
+        
+        total = sum(payment.amount for payment in payments)
+        messages.success(request, f"{len(payments)} paiements enregistrés pour un total de {total} DH.")
+        return redirect('finance:bulk_payment_entry')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from .bulk_payments import MAX_BULK_PAYMENTS
+        context['max_payments'] = MAX_BULK_PAYMENTS
+        context['payment_methods'] = Payment.PAYMENT_METHODS
+        return context
+
+
+class ChargeIssuanceView(TemplateView):
+    """Appel de fonds : un document par résident, émis en une fois"""
+    template_name = 'finance/charge_issuance_form.html'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def post(self, request, *args, **kwargs):
+        from .bulk_payments import clean_amount, clean_date
+        from .charges import issue_charges, parse_overrides
+        
+        data = request.POST
+        errors = []
+        title = data.get('title', '').strip()[:200]
+        if not title:
+            errors.append("Le titre est obligatoire.")
+        amount = clean_amount(data.get('amount', ''))
+        if amount is None or amount <= 0:
+            errors.append("Montant invalide.")
+        date = clean_date(data.get('date'), timezone.localdate())
+        if date is None:
+            errors.append("Date invalide.")
+        document_type = data.get('document_type', 'INVOICE')
+        if document_type not in dict(Document.DOCUMENT_TYPES):
+            errors.append("Type de document invalide.")
+        overrides, override_errors = parse_overrides(data.get('overrides', ''))
+        errors.extend(override_errors)
+        
+        residents = User.objects.filter(role='RESIDENT', is_active=True)
+        if data.get('scope') == 'selected':
+            residents = residents.filter(pk__in=[pk for pk in data.getlist('residents') if pk.isdigit()])
+        if not residents.exists():
+            errors.append("Aucun résident sélectionné.")
+        
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return self.render_to_response(self.get_context_data(form_data=data))
+        
+        documents, skipped = issue_charges(
+            residents,
+            title=title,
+            amount=amount,
+            date=date,
+            user=request.user,
+            document_type=document_type,
+            description=data.get('description', ''),
+            file=request.FILES.get('file'),
+            overrides=overrides,
+        )
+        if documents:
+            total = sum(document.amount for document in documents)
+            messages.success(request, f"{len(documents)} documents émis pour un total de {total} DH.")
+        if skipped:
+            messages.warning(request, f"{skipped} résident(s) ignoré(s) : document « {title} » déjà émis à cette date.")
+        return redirect('finance:charge_issuance')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        today = timezone.localdate()
+        context['residents'] = User.objects.filter(role='RESIDENT', is_active=True).order_by('apartment', 'last_name')
+        context['document_types'] = Document.DOCUMENT_TYPES
+        context['default_title'] = f"Appel de fonds - {today:%m/%Y}"
+        context['today'] = today
+        return context
+
+
+class PaymentVerificationView(TemplateView):
+    """File de vérification des paiements (validation / refus par lots, au clavier)"""
+    template_name = 'finance/payment_verification.html'
+    paginate_by = 50
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        if request.user.role not in ['SUPERADMIN', 'SYNDIC']:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def post(self, request, *args, **kwargs):
+        from .verification import verify_payments
+        
+        action = request.POST.get('action')
+        ids = [int(pk) for pk in request.POST.getlist('payment_ids') if pk.isdigit()]
+        wants_json = request.headers.get('Accept') == 'application/json'
+        if action not in ['approve', 'reject'] or not ids:
+            if wants_json:
+                return JsonResponse({'success': False, 'error': 'Sélection ou action invalide'}, status=400)
+            messages.error(request, "Sélectionnez au moins un paiement.")
+            return redirect('finance:payment_verification')
+        
+        processed = verify_payments(ids, request.user, approve=action == 'approve',
+                                    reason=request.POST.get('reason', '').strip())
+        if wants_json:
+            return JsonResponse({'success': True, 'processed': processed, 'skipped': len(ids) - len(processed)})
+        
+        label = "validé(s)" if action == 'approve' else "refusé(s)"
+        messages.success(request, f"{len(processed)} paiement(s) {label}.")
+        if len(processed) < len(ids):
+            messages.warning(request, f"{len(ids) - len(processed)} paiement(s) déjà traité(s) par ailleurs.")
+        url = reverse_lazy('finance:payment_verification')
+        after = request.POST.get('after', '')
+        if after.isdigit():
+            url = f"{url}?after={after}"
+        return redirect(url)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from .verification import pending_payments
+        
+        queue = pending_payments().select_related('document__resident')
+        method = self.request.GET.get('method', '')
+        if method:
+            queue = queue.filter(payment_method=method)
+        
+        # Pagination par curseur sur l'id : coût constant quelle que soit la page
+        after = self.request.GET.get('after', '')
+        before = self.request.GET.get('before', '')
+        if before.isdigit():
+            payments = list(queue.filter(pk__lt=int(before)).order_by('-pk')[:self.paginate_by + 1])
+            has_previous = len(payments) > self.paginate_by
+            payments = payments[:self.paginate_by][::-1]
+            has_next = True
+        else:
+            if after.isdigit():
+                queue = queue.filter(pk__gt=int(after))
+            payments = list(queue.order_by('pk')[:self.paginate_by + 1])
+            has_next = len(payments) > self.paginate_by
+            payments = payments[:self.paginate_by]
+            has_previous = after.isdigit()
+        attach_variants(payments, 'payment_proof')
+        
+        context.update({
+            'payments': payments,
+            'pending_count': pending_payments().count(),
+            'method': method,
+            'payment_methods': Payment.PAYMENT_METHODS,
+            'first_id': payments[0].pk if payments else None,
+            'last_id': payments[-1].pk if payments else None,
+            'after': after if after.isdigit() else '',
+            'has_previous': has_previous and bool(payments),
+            'has_next': has_next and bool(payments),
+        })
+        return context
+
+
+class ResidentStatementView(View):
+    """Relevé de compte PDF d'un résident (le sien, ou n'importe lequel pour le syndic)"""
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, *args, **kwargs):
+        from datetime import date, datetime
+        from django.http import FileResponse
+        from .statements import get_statement
+        
+        if request.user.role in ['SUPERADMIN', 'SYNDIC']:
+            resident = get_object_or_404(User, pk=request.GET.get('resident') or 0, role='RESIDENT')
+        elif request.user.role == 'RESIDENT':
+            resident = request.user
+        else:
+            messages.error(request, "Accès non autorisé.")
+            return redirect('finance:home')
+        
+        today = timezone.localdate()
+        try:
+            start = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+        except ValueError:
+            start = date(today.year, 1, 1)
+        try:
+            end = datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+        except ValueError:
+            end = today
+        if start > end:
+            start, end = end, start
+        
+        path, cached, elapsed = get_statement(resident, start, end)
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=f"releve_{resident.username}_{start:%Y%m%d}_{end:%Y%m%d}.pdf",
+            content_type='application/pdf',
+        )
+
+
+class ProtectedMediaView(View):
+    """Téléchargement d'un fichier déposé, réservé au résident concerné et au syndic"""
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('finance:login')
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, name, *args, **kwargs):
+        from django.http import Http404
+        from .media import accessible_object, download_name, serve, variant_source
+        from .storage import protected_storage
+        
+        obj = accessible_object(request.user, name)
+        if obj is None:
+            # Variante réduite : mêmes droits que l'image d'origine
+            source = variant_source(name)
+            obj = accessible_object(request.user, source) if source else None
+        if obj is None:
+            raise Http404("Fichier introuvable")
+        
+        response = serve(
+            request, protected_storage(), name, download_name(obj, name),
+            as_attachment='download' in request.GET,
+        )
+        if response is None:
+            raise Http404("Fichier introuvable")
+        return response
+
+
 # ===== VUE DE TEST POUR LES COMPOSANTS =====
 class TestComponentsView(TemplateView):
     """Vue de test pour vérifier le fonctionnement des composants"""
@@ -1581,27 +1946,20 @@ class UserProfileView(TemplateView):
         }
         
         # Statistiques selon le rôle
+        notifications = stats.notification_counts(user)
         if user.role in ['SYNDIC', 'SUPERADMIN']:
             context['stats'] = {
-                'total_residents': User.objects.filter(role='RESIDENT').count(),
-                'total_documents': Document.objects.count(),
-                'total_expenses': Depense.objects.count(),
-                'unread_notifications': Notification.objects.filter(
-                    recipients=user, 
-                    is_read=False
-                ).count(),
+                'total_residents': stats.resident_counts()['total'],
+                'total_documents': stats.document_counts()['total'],
+                'total_expenses': stats.expense_totals()['count'],
+                'unread_notifications': notifications['unread'],
             }
         elif user.role == 'RESIDENT':
             context['stats'] = {
                 'my_documents': Document.objects.filter(resident=user).count(),
                 'my_payments': Payment.objects.filter(document__resident=user).count(),
-                'my_notifications': Notification.objects.filter(
-                    recipients=user
-                ).count(),
-                'unread_notifications': Notification.objects.filter(
-                    recipients=user, 
-                    is_read=False
-                ).count(),
+                'my_notifications': notifications['received'],
+                'unread_notifications': notifications['unread'],
             }
         
         return context
\ No newline at end of file
@@ -148,3 +148,73 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@syndic.local')
+
+# Planificateur interne (python manage.py run_scheduler)
+SCHEDULER_TICK_SECONDS = int(os.getenv('SCHEDULER_TICK_SECONDS', '30'))
+SCHEDULER_JITTER_SECONDS = int(os.getenv('SCHEDULER_JITTER_SECONDS', '60'))
+SCHEDULER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEASE_SECONDS', '120'))
+SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', '3600'))
+
+# Durées de conservation (en jours) utilisées par purge_expired_data
+DATA_RETENTION_DAYS = {
+    'chatbot_conversations': int(os.getenv('RETENTION_CHATBOT_DAYS', '180')),
+    'inactive_notifications': int(os.getenv('RETENTION_NOTIFICATIONS_DAYS', '365')),
+    'proof_uploads': int(os.getenv('RETENTION_PROOF_UPLOADS_DAYS', '2')),
+}
+
+# Délai de paiement (jours) par type de document, pour le calcul de Document.due_date.
+# None = pas d'échéance. Les types absents gardent la valeur par défaut du modèle.
+DOCUMENT_PAYMENT_TERMS_DAYS = {}
+
+# Justificatifs de paiement envoyés par morceaux (payment_upload_api)
+PAYMENT_PROOF_MAX_SIZE = int(os.getenv('PAYMENT_PROOF_MAX_SIZE', str(10 * 1024 * 1024)))
+PAYMENT_PROOF_CHUNK_SIZE = int(os.getenv('PAYMENT_PROOF_CHUNK_SIZE', str(512 * 1024)))
+PAYMENT_PROOF_UPLOAD_DIR = os.getenv('PAYMENT_PROOF_UPLOAD_DIR', str(BASE_DIR / 'tmp' / 'proof_uploads'))
+
+# Cache disque des relevés de compte PDF (finance/statements.py)
+STATEMENT_CACHE_DIR = os.getenv('STATEMENT_CACHE_DIR', str(BASE_DIR / 'tmp' / 'statements'))
+
+# En-tête des reçus et mises en demeure (finance/pdf_engine.py)
+SYNDIC_NAME = os.getenv('SYNDIC_NAME', 'SyndicPro')
+SYNDIC_ADDRESS = os.getenv('SYNDIC_ADDRESS', '')
+SYNDIC_CITY = os.getenv('SYNDIC_CITY', '')
+
+# Stockage adressé par contenu des fichiers déposés (finance/storage.py, finance/blobs.py)
+BLOB_STORAGE_PREFIX = os.getenv('BLOB_STORAGE_PREFIX', 'blobs')
+BLOB_GC_GRACE_HOURS = int(os.getenv('BLOB_GC_GRACE_HOURS', '24'))
+
+# Téléchargement contrôlé des fichiers déposés (finance/media.py).
+# MEDIA_SENDFILE : '' (Django sert le fichier), 'nginx' (X-Accel-Redirect vers
+# MEDIA_ACCEL_PREFIX, location "internal" qui pointe sur MEDIA_ROOT) ou
+# 'sendfile' (X-Sendfile, Apache mod_xsendfile / lighttpd).
+PROTECTED_MEDIA_URL = '/fichiers/'
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Archivage des documents soldés (finance/archive.py)
+DOCUMENT_ARCHIVE_AFTER_DAYS = int(os.getenv('DOCUMENT_ARCHIVE_AFTER_DAYS', '730'))
+ARCHIVE_STORAGE_PREFIX = os.getenv('ARCHIVE_STORAGE_PREFIX', 'archive')
+
+# Durée de vie maximale des compteurs des tableaux de bord en cache (finance/stats.py)
+STATS_CACHE_SECONDS = int(os.getenv('STATS_CACHE_SECONDS', '60'))
+
+# Recherche approchée des FAQ de l'assistant (finance/faq_retrieval.py, NumPy requis) :
+# utilisée quand aucun mot-clé ne correspond, réponse à partir de ce score (cosinus, 0 à 1)
+CHATBOT_FAQ_RETRIEVAL = os.getenv('CHATBOT_FAQ_RETRIEVAL', 'true').lower() == 'true'
+CHATBOT_FAQ_MIN_SCORE = float(os.getenv('CHATBOT_FAQ_MIN_SCORE', '0.2'))
+
+# Délai maximal avant qu'un processus voie une FAQ créée, modifiée ou supprimée par un autre
+# (finance/faq_matcher.py, version des FAQ relue en base)
+CHATBOT_FAQ_REFRESH_SECONDS = int(os.getenv('CHATBOT_FAQ_REFRESH_SECONDS', '10'))
+
+# Report en base des compteurs d'utilisation et d'avis des FAQ (finance/faq_counters.py).
+# Les compteurs ne sont tenus dans le cache, puis reportés par lots, qu'avec un cache partagé
+# entre processus ; avec le cache par défaut (LocMemCache, propre à chaque processus), chaque
+# événement est écrit directement en base. Exemple de cache partagé :
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+#     }
+# }
+CHATBOT_FAQ_COUNTER_FLUSH_SECONDS = int(os.getenv('CHATBOT_FAQ_COUNTER_FLUSH_SECONDS', '60'))